@@ -0,0 +1 @@
+""" Benchmarks for pyrefchecker, run with 'python -m benchmarks' """
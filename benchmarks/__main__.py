@@ -0,0 +1,136 @@
+"""
+Benchmark pyrefchecker on synthetic and real-world corpora.
+
+Example:
+
+    python -m benchmarks --output before.json
+    git checkout my-branch
+    python -m benchmarks --baseline before.json
+"""
+
+import sys
+import tempfile
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+import click
+
+from pyrefchecker import ENGINES
+
+from .corpora import GENERATORS, Corpus
+from .harness import (
+    Results,
+    benchmark_corpus,
+    current_commit,
+    find_regressions,
+    python_version,
+)
+
+
+@click.command()
+@click.option(
+    "--corpus",
+    "corpora",
+    type=click.Choice(sorted(GENERATORS)),
+    multiple=True,
+    help="Synthetic corpora to benchmark  [default: all of them]",
+)
+@click.option(
+    "--real",
+    type=click.Path(exists=True, file_okay=False, dir_okay=True),
+    multiple=True,
+    help="Directories of real-world code to benchmark, e.g. a checkout of a project",
+)
+@click.option(
+    "--scale",
+    type=click.IntRange(min=1),
+    default=4,
+    help="Size of the synthetic corpora",
+    show_default=True,
+)
+@click.option(
+    "--engine",
+    "engines",
+    type=click.Choice(ENGINES),
+    multiple=True,
+    help="Engines to benchmark  [default: all of them]",
+)
+@click.option(
+    "--repeat",
+    type=click.IntRange(min=1),
+    default=3,
+    help="Number of timings of each benchmark, of which the fastest is kept",
+    show_default=True,
+)
+@click.option(
+    "--workers",
+    type=click.IntRange(min=0),
+    default=None,
+    help="Number of worker processes for end to end runs  [default: number of CPUs]",
+)
+@click.option(
+    "--output",
+    type=click.Path(dir_okay=False, writable=True),
+    default=None,
+    help="File to write the results to, as JSON",
+)
+@click.option(
+    "--baseline",
+    type=click.Path(exists=True, dir_okay=False),
+    default=None,
+    help="Results to compare against, failing if any benchmark regressed",
+)
+@click.option(
+    "--threshold",
+    type=float,
+    default=0.1,
+    help="Slowdown relative to the baseline which counts as a regression",
+    show_default=True,
+)
+def main(
+    corpora: Tuple[str, ...],
+    real: Tuple[str, ...],
+    scale: int,
+    engines: Tuple[str, ...],
+    repeat: int,
+    workers: Optional[int],
+    output: Optional[str],
+    baseline: Optional[str],
+    threshold: float,
+) -> None:
+    """ Time each stage of pyrefchecker, and optionally compare against a baseline """
+
+    selected: List[Corpus] = [
+        GENERATORS[x](scale) for x in corpora or ([] if real else GENERATORS)
+    ]
+    selected += [Corpus.from_directory(Path(x)) for x in real]
+
+    results = Results(commit=current_commit(), python=python_version(), scale=scale)
+    with tempfile.TemporaryDirectory() as root:
+        for corpus in selected:
+            click.echo(f"⏱️  {corpus.name} ({len(corpus.files)} files)", err=True)
+            timings = benchmark_corpus(
+                corpus,
+                Path(root),
+                engines=engines or ENGINES,
+                repeat=repeat,
+                workers=workers,
+            )
+            for key, seconds in timings.items():
+                click.echo(f"{key:<40} {seconds * 1000:>10.1f}ms")
+            results.timings.update(timings)
+
+    if output is not None:
+        results.dump(Path(output))
+
+    if baseline is not None:
+        regressions = find_regressions(Results.load(Path(baseline)), results, threshold)
+        for regression in regressions:
+            click.echo(f"🐢 {regression}")
+        if regressions:
+            sys.exit(1)
+        click.echo(f"✨ no regressions!")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""
+Generators for synthetic corpora, each of which stresses a different part of pyrefchecker.
+
+Every generator takes a scale, and produces roughly proportionally more work as it grows.
+"""
+
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Dict, List
+
+
+@dataclass(frozen=True)
+class Corpus:
+    """ A set of files to benchmark, by their path relative to the corpus root """
+
+    name: str
+    files: Dict[str, str]
+
+    def write(self, root: Path) -> Path:
+        """ Write the files of the corpus into a new directory under root """
+        directory = root / self.name
+        for name, code in self.files.items():
+            path = directory / name
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_text(code)
+        return directory
+
+    @classmethod
+    def from_directory(cls, path: Path) -> "Corpus":
+        """ Load a real-world corpus, e.g. a checkout of some project """
+        files = {}
+        for file in sorted(path.rglob("*.py")):
+            try:
+                files[str(file.relative_to(path))] = file.read_text()
+            except (OSError, UnicodeDecodeError):
+                continue
+        return cls(name=path.name, files=files)
+
+
+def _indent(lines: List[str], depth: int) -> List[str]:
+    return ["    " * depth + line for line in lines]
+
+
+def nested(scale: int) -> Corpus:
+    """ Deeply nested if/try/for blocks, where block scopes multiply """
+    depth = 4 + 3 * scale
+    lines: List[str] = ["import sys", ""]
+    for i in range(depth):
+        kind = i % 3
+        if kind == 0:
+            lines += _indent([f"if len(sys.argv) > {i}:", f"    a{i} = {i}"], i)
+        elif kind == 1:
+            lines += _indent(["try:", f"    a{i} = a{i - 1}"], i)
+        else:
+            lines += _indent([f"for a{i} in range(a{i - 1}):", f"    b{i} = a{i}"], i)
+    lines += _indent(["print(a0)"], depth)
+    for i in reversed(range(depth)):
+        if i % 3 == 1:
+            lines += _indent(
+                ["except ValueError:", "    pass", "else:", f"    print(a{i})"], i
+            )
+    return Corpus(name="nested", files={"nested.py": "\n".join(lines) + "\n"})
+
+
+def flat(scale: int) -> Corpus:
+    """ One very large module, with many top level statements and functions """
+    lines: List[str] = ["import os", "from typing import List", ""]
+    for i in range(250 * scale):
+        lines += [
+            f"def function_{i}(items: List[int]) -> int:",
+            f"    total = {i}",
+            "    for item in items:",
+            "        total += item",
+            "    return total + len(os.sep)",
+            "",
+            f"value_{i} = function_{i}([value_{i - 1}])" if i else "value_0 = 0",
+            "",
+        ]
+    return Corpus(name="flat", files={"flat.py": "\n".join(lines)})
+
+
+def tiny_files(scale: int) -> Corpus:
+    """ Many small files, where per-file overhead dominates """
+    files = {}
+    for i in range(100 * scale):
+        files[
+            f"package_{i % 10}/module_{i}.py"
+        ] = f"import sys\n\nVALUE = {i}\n\nif sys.argv:\n    print(VALUE)\n"
+    return Corpus(name="tiny_files", files=files)
+
+
+def type_checking(scale: int) -> Corpus:
+    """ Modules whose names are mostly imported for type checking only """
+    lines: List[str] = [
+        "import typing",
+        "from typing import TYPE_CHECKING",
+        "from typing import TYPE_CHECKING as is_type_checking",
+        "",
+    ]
+    for i in range(50 * scale):
+        test = ("TYPE_CHECKING", "typing.TYPE_CHECKING", "is_type_checking")[i % 3]
+        lines += [
+            f"if {test}:",
+            f"    from module_{i} import Type{i}",
+            "",
+            f'def use_{i}(value: "Type{i}") -> typing.List["Type{i}"]:',
+            "    return [value]",
+            "",
+        ]
+    return Corpus(name="type_checking", files={"type_checking.py": "\n".join(lines)})
+
+
+def noreturn(scale: int) -> Corpus:
+    """ Modules which call chains of functions that never return """
+    lines: List[str] = ["import sys", "from typing import NoReturn", ""]
+    count = 25 * scale
+    for i in range(count):
+        if i == 0:
+            lines += ["def fail_0() -> NoReturn:", "    sys.exit(1)", ""]
+        else:
+            lines += [f"def fail_{i}():", f"    fail_{i - 1}()", ""]
+    for i in range(count):
+        lines += [
+            "try:",
+            f"    import module_{i}",
+            "except ImportError:",
+            f"    fail_{count - 1 - i}()",
+            "",
+            f"print(module_{i})",
+            "",
+        ]
+    return Corpus(name="noreturn", files={"noreturn.py": "\n".join(lines)})
+
+
+GENERATORS: Dict[str, Callable[[int], Corpus]] = {
+    "nested": nested,
+    "flat": flat,
+    "tiny_files": tiny_files,
+    "type_checking": type_checking,
+    "noreturn": noreturn,
+}
@@ -0,0 +1,175 @@
+"""
+Time the stages of pyrefchecker on a corpus, and compare the results between commits.
+"""
+
+import io
+import json
+import platform
+import subprocess
+import time
+from contextlib import redirect_stdout
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence
+
+from pyrefchecker import ENGINES, check, monkeypatch_nameutil
+from pyrefchecker.bin.bin import run
+from pyrefchecker.bin.find_files import find_files
+from pyrefchecker.libcst_engine import get_metadata
+from pyrefchecker.parsers import available_parsers, parse_with
+
+from .corpora import Corpus
+
+# Result files with a different version can't be compared
+VERSION = 1
+
+
+@dataclass
+class Results:
+    """ The best time for each benchmark, in seconds, keyed on 'corpus.stage[.engine]' """
+
+    commit: Optional[str]
+    python: str
+    scale: int
+    timings: Dict[str, float] = field(default_factory=dict)
+    version: int = VERSION
+
+    def dump(self, path: Path) -> None:
+        path.write_text(json.dumps(asdict(self), indent=2, sort_keys=True) + "\n")
+
+    @classmethod
+    def load(cls, path: Path) -> "Results":
+        data = json.loads(path.read_text())
+        if data.get("version") != VERSION:
+            raise ValueError(f"{path} has unsupported version {data.get('version')}")
+        return cls(**data)
+
+
+@dataclass(frozen=True)
+class Regression:
+    """ A benchmark which got slower than its baseline by more than the threshold """
+
+    key: str
+    before: float
+    after: float
+
+    @property
+    def ratio(self) -> float:
+        return self.after / self.before
+
+    def __str__(self) -> str:
+        return (
+            f"{self.key}: {self.before * 1000:.1f}ms -> {self.after * 1000:.1f}ms "
+            f"({self.ratio - 1:+.0%})"
+        )
+
+
+def current_commit() -> Optional[str]:
+    """ The commit being benchmarked, if this is a git checkout """
+    try:
+        proc = subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            universal_newlines=True,
+        )
+    except OSError:
+        return None
+    return proc.stdout.strip() if proc.returncode == 0 else None
+
+
+def best_time(func: Callable[[], object], repeat: int) -> float:
+    """ Return the fastest of several timings of a function, which is the least noisy """
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def benchmark_corpus(
+    corpus: Corpus,
+    root: Path,
+    engines: Sequence[str] = ENGINES,
+    repeat: int = 3,
+    workers: Optional[int] = None,
+) -> Dict[str, float]:
+    """
+    Time each stage of checking a corpus: parsing metadata (and parsing alone, with
+    each of libCST's parser backends), checking each file, finding files, and the end
+    to end run (without a cache).
+    """
+    directory = corpus.write(root)
+    codes = list(corpus.files.values())
+    timings: Dict[str, float] = {}
+
+    def find() -> List[Path]:
+        return list(find_files([directory], include=None, excludes=None))
+
+    timings[f"{corpus.name}.find_files"] = best_time(find, repeat)
+
+    if "libcst" in engines:
+
+        def metadata() -> None:
+            with monkeypatch_nameutil():
+                for code in codes:
+                    get_metadata(code)
+
+        timings[f"{corpus.name}.get_metadata"] = best_time(metadata, repeat)
+
+        for backend in available_parsers():
+
+            def parse() -> None:
+                for code in codes:
+                    parse_with(backend, code)
+
+            try:
+                timings[f"{corpus.name}.parse.{backend}"] = best_time(parse, repeat)
+            except Exception:
+                # The backend can't parse this corpus, e.g. newer syntax than it knows
+                continue
+
+    for engine in engines:
+
+        def check_all() -> None:
+            for code in codes:
+                check(code, engine=engine)
+
+        def run_all() -> None:
+            # Warnings are expected, and aren't interesting here
+            with redirect_stdout(io.StringIO()):
+                run(
+                    find(),
+                    timeout=600,
+                    allow_import_star=True,
+                    show_successes=False,
+                    workers=workers,
+                    engine=engine,
+                )
+
+        timings[f"{corpus.name}.check.{engine}"] = best_time(check_all, repeat)
+        timings[f"{corpus.name}.run.{engine}"] = best_time(run_all, repeat)
+
+    return timings
+
+
+def find_regressions(
+    baseline: Results, current: Results, threshold: float, min_time: float = 0.001
+) -> List[Regression]:
+    """
+    Return the benchmarks which are slower than the baseline by more than a fraction of
+    its time. Benchmarks faster than 'min_time' are too noisy to compare.
+    """
+    regressions = []
+    for key, before in sorted(baseline.timings.items()):
+        after = current.timings.get(key)
+        if after is None or before < min_time:
+            continue
+        if after > before * (1 + threshold):
+            regressions.append(Regression(key=key, before=before, after=after))
+    return regressions
+
+
+def python_version() -> str:
+    return f"{platform.python_implementation()} {platform.python_version()}"
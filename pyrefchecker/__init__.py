@@ -1,11 +1,27 @@
-from .block_scope_provider import monkeypatch_nameutil
-from .check import (
+from typing import TYPE_CHECKING, Any
+
+from .check import ENGINES, PARSERS, check
+from .checker import Checker, CheckResult, check_many
+from .warnings import (
     BaseRefWarning,
     BaseWarning,
     ImportStarWarning,
     NoLocationRefWarning,
     RefWarning,
-    check,
 )
 
 __version__ = "1.0.0"
+
+
+def __getattr__(name: str) -> Any:
+    # libCST is only imported when it's needed, so that commands which don't use it
+    # (like the daemon client) start quickly
+    if name == "monkeypatch_nameutil":
+        from .block_scope_provider import monkeypatch_nameutil
+
+        return monkeypatch_nameutil
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+if TYPE_CHECKING:
+    from .block_scope_provider import monkeypatch_nameutil
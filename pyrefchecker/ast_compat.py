@@ -0,0 +1,52 @@
+"""
+Parsing with the stdlib 'ast' module, into the same shape of tree on every supported
+version of Python.
+
+Before Python 3.8, literals are parsed as Str, Bytes, Num, NameConstant and Ellipsis
+nodes rather than Constant, and functions have no positional-only arguments. Trees
+parsed with 'parse' use Constant and always have 'posonlyargs', as on later versions.
+"""
+
+import ast
+import sys
+from typing import TypeVar
+
+# The nodes which Constant replaced, and the field which holds each one's value
+_LEGACY_CONSTANTS = {
+    "Str": "s",
+    "Bytes": "s",
+    "Num": "n",
+    "NameConstant": "value",
+}
+
+
+def parse(source: str) -> ast.Module:
+    """ Parse the source code of a module, like ast.parse """
+    return _modernize(ast.parse(source))
+
+
+def parse_expression(source: str) -> ast.Expression:
+    """ Parse an expression, like ast.parse in "eval" mode """
+    return _modernize(ast.parse(source, mode="eval"))
+
+
+T = TypeVar("T", bound=ast.AST)
+
+
+def _modernize(tree: T) -> T:
+    if sys.version_info < (3, 8):
+        _Modernize().visit(tree)
+    return tree
+
+
+class _Modernize(ast.NodeTransformer):
+    def visit(self, node: ast.AST) -> ast.AST:
+        name = type(node).__name__
+        if name in _LEGACY_CONSTANTS or name == "Ellipsis":
+            value = (
+                getattr(node, _LEGACY_CONSTANTS[name]) if name != "Ellipsis" else ...
+            )
+            return ast.copy_location(ast.Constant(value=value, kind=None), node)
+        if isinstance(node, ast.arguments) and not hasattr(node, "posonlyargs"):
+            node.posonlyargs = []  # type: ignore
+        return self.generic_visit(node)
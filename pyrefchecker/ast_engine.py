@@ -0,0 +1,964 @@
+"""
+An analysis engine built on the stdlib 'ast' module.
+
+This reimplements the scope analysis of libCST's ScopeProvider, together with the block
+scoping rules of BlockScopeVisitor and the helpers in ast_utils, so that it produces the
+same warnings as the libCST engine, but without the cost of building a concrete syntax tree.
+"""
+
+import ast
+import builtins
+import re
+from contextlib import contextmanager
+from typing import (
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+    Union,
+)
+
+from .ast_compat import parse
+from .exits import is_exit_function
+from .prescan import prescan
+from .profiling import phase
+from .warnings import BaseWarning, ImportStarWarning, NoLocationRefWarning, RefWarning
+
+EXCEPTIONS = {"__file__", "__name__", "__doc__", "__package__"}
+
+EXIT_NODES = (ast.Raise, ast.Return, ast.Continue, ast.Break)
+
+IMPORT = "import"
+BUILTIN = "builtin"
+LOCAL = "local"
+
+# A qualified name, and where it came from
+QualifiedName = Tuple[str, str]
+
+QualifiedNoReturn = ("typing.NoReturn", IMPORT)
+QualifiedTypeCheckingFlag = ("typing.TYPE_CHECKING", IMPORT)
+QualifiedTrue = ("builtins.True", BUILTIN)
+
+# Nodes which, like libCST's assignment-like nodes, advance the assignment index of
+# the scope they are left in
+_ASSIGNMENT_LIKE_NODES = (
+    ast.AnnAssign,
+    ast.Assign,
+    ast.AugAssign,
+    ast.ClassDef,
+    ast.FunctionDef,
+    ast.AsyncFunctionDef,
+    ast.Global,
+    ast.Nonlocal,
+    ast.Import,
+    ast.ImportFrom,
+    ast.arguments,
+    ast.withitem,
+    # Python 3.8+
+    *([ast.NamedExpr] if hasattr(ast, "NamedExpr") else []),
+)
+
+_FunctionNode = Union[ast.FunctionDef, ast.AsyncFunctionDef]
+
+_NEWLINE = re.compile(r"\r\n|\r|\n")
+
+
+class Assignment:
+    """ An assignment of a name in a scope """
+
+    def __init__(
+        self, name: str, scope: "Scope", node: Optional[ast.AST], index: int
+    ) -> None:
+        self.name = name
+        self.scope = scope
+        self.node = node
+        self.index = index
+
+    def get_qualified_names_for(self, full_name: str) -> Set[QualifiedName]:
+        prefix = self.scope.name_prefix
+        return {(f"{prefix}.{full_name}" if prefix else full_name, LOCAL)}
+
+
+class BuiltinAssignment(Assignment):
+    """ A name provided by Python as a builtin """
+
+    def get_qualified_names_for(self, full_name: str) -> Set[QualifiedName]:
+        return {(f"builtins.{self.name}", BUILTIN)}
+
+
+class ImportAssignment(Assignment):
+    """ A name assigned by an import statement """
+
+    node: Union[ast.Import, ast.ImportFrom]
+
+    def get_qualified_names_for(self, full_name: str) -> Set[QualifiedName]:
+        module = ""
+        if isinstance(self.node, ast.ImportFrom):
+            module = "." * self.node.level + (self.node.module or "")
+
+        results = set()
+        for alias in self.node.names:
+            parts = alias.name.split(".")
+            for real_name in [".".join(parts[:i]) for i in range(len(parts), 0, -1)]:
+                as_name = real_name
+                if module.endswith("."):
+                    real_name = f"{module}{real_name}"
+                elif module:
+                    real_name = f"{module}.{real_name}"
+                if alias.asname:
+                    as_name = alias.asname
+                if full_name.startswith(as_name):
+                    remaining_name = full_name.split(as_name, 1)[1]
+                    if remaining_name and not remaining_name.startswith("."):
+                        continue
+                    remaining_name = remaining_name.lstrip(".")
+                    results.add(
+                        (
+                            f"{real_name}.{remaining_name}"
+                            if remaining_name
+                            else real_name,
+                            IMPORT,
+                        )
+                    )
+                    break
+        return results
+
+
+class Access:
+    """ An access of a name in a scope """
+
+    def __init__(
+        self,
+        node: ast.Name,
+        scope: "Scope",
+        enclosing_attribute: Optional[ast.Attribute],
+        in_string_annotation: bool,
+    ) -> None:
+        self.node = node
+        self.scope = scope
+        self.index = scope.count
+        self.enclosing_attribute = enclosing_attribute
+        self.in_string_annotation = in_string_annotation
+
+
+class Scope:
+    """ A scope, mirroring the semantics of libCST's scopes """
+
+    def __init__(self, parent: Optional["Scope"], name: Optional[str] = None):
+        self.parent: Scope = parent or self
+        self.globals: Scope = parent.globals if parent else self
+        self.name = name
+        self.assignments: Dict[str, List[Assignment]] = {}
+        self.accesses: List[Access] = []
+        self.overwrites: Dict[str, Scope] = {}
+        self.count = 0
+        self.name_prefix = self._make_name_prefix()
+
+    def _make_name_prefix(self) -> str:
+        return ".".join(filter(None, [self.parent.name_prefix, self.name, "<locals>"]))
+
+    def record_assignment(self, name: str, node: ast.AST) -> None:
+        target = self.find_assignment_target(name)
+        target.assignments.setdefault(name, []).append(
+            Assignment(name, target, node, target.count)
+        )
+
+    def record_import_assignment(
+        self, name: str, node: Union[ast.Import, ast.ImportFrom]
+    ) -> None:
+        target = self.find_assignment_target(name)
+        target.assignments.setdefault(name, []).append(
+            ImportAssignment(name, target, node, target.count)
+        )
+
+    def record_global_overwrite(self, name: str) -> None:
+        self.overwrites[name] = self.globals
+
+    def record_nonlocal_overwrite(self, name: str) -> None:
+        self.overwrites[name] = self.parent
+
+    def find_assignment_target(self, name: str) -> "Scope":
+        if name in self.overwrites:
+            return self.overwrites[name].find_assignment_target_from_child(name)
+        return self
+
+    def find_assignment_target_from_child(self, name: str) -> "Scope":
+        return self
+
+    def __contains__(self, name: str) -> bool:
+        if name in self.overwrites:
+            return name in self.overwrites[name]
+        if name in self.assignments:
+            return True
+        return self.parent.contains_from_child(name)
+
+    def __getitem__(self, name: str) -> Sequence[Assignment]:
+        if name in self.overwrites:
+            return self.overwrites[name].getitem_from_child(name)
+        if name in self.assignments:
+            return self.assignments[name]
+        return self.parent.getitem_from_child(name)
+
+    def contains_from_child(self, name: str) -> bool:
+        return name in self
+
+    def getitem_from_child(self, name: str) -> Sequence[Assignment]:
+        return self[name]
+
+    def get_qualified_names_for(self, node: ast.AST) -> Set[QualifiedName]:
+        full_name = get_full_name_for_node(node)
+        if full_name is None:
+            return set()
+
+        assignments: Sequence[Assignment] = []
+        prefix: Optional[str] = full_name
+        while prefix:
+            if prefix in self:
+                assignments = self[prefix]
+                break
+            idx = prefix.rfind(".")
+            prefix = None if idx == -1 else prefix[:idx]
+
+        results: Set[QualifiedName] = set()
+        for assignment in assignments:
+            results |= assignment.get_qualified_names_for(full_name)
+        return results
+
+
+class BuiltinScope(Scope):
+    def __init__(self, globals: "GlobalScope"):
+        self.name_prefix = ""
+        super().__init__(None)
+        self.globals = globals
+        self._builtins: Dict[str, List[Assignment]] = {}
+
+    def __contains__(self, name: str) -> bool:
+        return hasattr(builtins, name)
+
+    def __getitem__(self, name: str) -> Sequence[Assignment]:
+        if not hasattr(builtins, name):
+            return []
+        if name not in self._builtins:
+            self._builtins[name] = [BuiltinAssignment(name, self, None, -1)]
+        return self._builtins[name]
+
+
+class GlobalScope(Scope):
+    def __init__(self) -> None:
+        self.name_prefix = ""
+        super().__init__(BuiltinScope(self))
+        self.globals = self
+
+    def _make_name_prefix(self) -> str:
+        return ""
+
+    def record_global_overwrite(self, name: str) -> None:
+        pass
+
+    def record_nonlocal_overwrite(self, name: str) -> None:
+        raise SyntaxError("nonlocal declaration not allowed at module level")
+
+    def __contains__(self, name: str) -> bool:
+        if name in self.assignments:
+            return True
+        return self.parent.contains_from_child(name)
+
+    def __getitem__(self, name: str) -> Sequence[Assignment]:
+        if name in self.assignments:
+            return self.assignments[name]
+        return self.parent.getitem_from_child(name)
+
+
+class FunctionScope(Scope):
+    pass
+
+
+class BlockScope(Scope):
+    """ A Block scope, e.g. for If, Try """
+
+
+class ComprehensionScope(Scope):
+    def _make_name_prefix(self) -> str:
+        return ".".join(filter(None, [self.parent.name_prefix, "<comprehension>"]))
+
+
+class ClassScope(Scope):
+    def _make_name_prefix(self) -> str:
+        return ".".join(filter(None, [self.parent.name_prefix, self.name]))
+
+    def find_assignment_target_from_child(self, name: str) -> "Scope":
+        return self.parent.find_assignment_target_from_child(name)
+
+    def contains_from_child(self, name: str) -> bool:
+        # Class variables can't be accessed by their bare names in child scopes
+        return self.parent.contains_from_child(name)
+
+    def getitem_from_child(self, name: str) -> Sequence[Assignment]:
+        return self.parent.getitem_from_child(name)
+
+
+def get_full_name_for_node(node: ast.AST) -> Optional[str]:
+    """ Return the dotted name of a Name, Attribute, Call or Subscript """
+    if isinstance(node, ast.Name):
+        return node.id
+    if isinstance(node, ast.Attribute):
+        value = get_full_name_for_node(node.value)
+        return None if value is None else f"{value}.{node.attr}"
+    if isinstance(node, ast.Call):
+        return get_full_name_for_node(node.func)
+    if isinstance(node, ast.Subscript):
+        return get_full_name_for_node(node.value)
+    if isinstance(node, ast.Constant) and any(
+        node.value is x for x in (True, False, None)
+    ):
+        # These are Names in libCST
+        return str(node.value)
+    return None
+
+
+def get_name_for(node: ast.AST) -> Optional[str]:
+    """ Return the simple name of a Name, Call or Subscript """
+    if isinstance(node, ast.Name):
+        return node.id
+    if isinstance(node, ast.Call):
+        return get_name_for(node.func)
+    if isinstance(node, ast.Subscript):
+        return get_name_for(node.value)
+    return None
+
+
+def gen_dotted_names(node: ast.AST) -> List[str]:
+    """ Return the dotted names of an attribute, from most to least specific """
+    if isinstance(node, ast.Name):
+        return [node.id]
+    if not isinstance(node, ast.Attribute):
+        return []
+
+    value = node.value
+    if isinstance(value, ast.Call):
+        return gen_dotted_names(value.func)
+    if isinstance(value, (ast.Attribute, ast.Name)):
+        names = gen_dotted_names(value)
+        if names:
+            return [f"{names[0]}.{node.attr}", *names]
+    return []
+
+
+class BlockScopeVisitor(ast.NodeVisitor):
+    """ Records the assignments and accesses of each scope, including block scopes """
+
+    def __init__(self, lines: List[bytes]) -> None:
+        self.lines = lines
+        self.scope: Scope = GlobalScope()
+        self.scopes: List[Scope] = [self.scope]
+        self.import_star = False
+
+        # The scope each node was last visited in. Like libCST, we only report on scopes
+        # which are still the scope of some node, e.g. not on a try block's scope once its
+        # body has been revisited in the scope of its else block.
+        self.node_scopes: Dict[ast.AST, Scope] = {}
+
+        self._attribute_stack: List[Optional[ast.Attribute]] = [None]
+        self._annotation_stack: List[bool] = [False]
+        self._type_hint_stack: List[bool] = [False]
+        self._ignored_subscripts: Set[ast.Subscript] = set()
+        self._in_string_annotation = False
+
+        # Memoized for the module, see ast_utils.FunctionIndex
+        self._qualified_names: Dict[
+            Tuple[Scope, ast.AST], Tuple[int, Set[QualifiedName]]
+        ] = {}
+        self._terminal_functions: Dict[_FunctionNode, Tuple[int, bool]] = {}
+        self._in_progress: List[_FunctionNode] = []
+        self._depends_on = 0
+
+    def visit(self, node: ast.AST) -> None:
+        super().visit(node)
+        self.node_scopes[node] = self.scope
+        if isinstance(node, _ASSIGNMENT_LIKE_NODES):
+            self.scope.count += 1
+
+    def visit_all(self, nodes: Sequence[ast.AST]) -> None:
+        for node in nodes:
+            self.visit(node)
+
+    @contextmanager
+    def _new_scope(self, scope: Scope) -> Iterator[None]:
+        parent = self.scope
+        self.scope = scope
+        self.scopes.append(scope)
+        try:
+            yield
+        finally:
+            self.scope = parent
+
+    @contextmanager
+    def _switch_scope(self, scope: Scope) -> Iterator[None]:
+        current = self.scope
+        self.scope = scope
+        try:
+            yield
+        finally:
+            self.scope = current
+
+    @contextmanager
+    def _annotation(self) -> Iterator[None]:
+        self._annotation_stack.append(True)
+        try:
+            yield
+        finally:
+            self._annotation_stack.pop()
+
+    # Names and attributes
+
+    def visit_Name(self, node: ast.Name) -> None:
+        if isinstance(node.ctx, ast.Store):
+            self.scope.record_assignment(node.id, node)
+        else:
+            self.scope.accesses.append(
+                Access(
+                    node,
+                    self.scope,
+                    self._attribute_stack[-1],
+                    self._in_string_annotation,
+                )
+            )
+
+    def visit_Attribute(self, node: ast.Attribute) -> None:
+        top_level = self._attribute_stack[-1] is None
+        if top_level:
+            self._attribute_stack[-1] = node
+        self.visit(node.value)
+        if top_level:
+            self._attribute_stack[-1] = None
+
+    def visit_Call(self, node: ast.Call) -> None:
+        self._attribute_stack.append(None)
+        self._type_hint_stack.append(False)
+
+        # libCST keeps positional and keyword arguments together, in source order
+        args: List[ast.expr] = sorted(
+            [*node.args, *(x.value for x in node.keywords)],
+            key=lambda x: (x.lineno, x.col_offset),
+        )
+        qnames = {name for name, _ in self.scope.get_qualified_names_for(node)}
+        if "typing.NewType" in qnames or "typing.TypeVar" in qnames:
+            self.visit(node.func)
+            self._type_hint_stack[-1] = True
+            self.visit_all(args[1:])
+        elif "typing.cast" in qnames:
+            self.visit(node.func)
+            if args:
+                self._type_hint_stack.append(True)
+                self.visit(args[0])
+                self._type_hint_stack.pop()
+                self.visit_all(args[1:])
+        else:
+            self.visit(node.func)
+            self.visit_all(args)
+
+        self._attribute_stack.pop()
+        self._type_hint_stack.pop()
+
+    # Annotations and type hints
+
+    def visit_Subscript(self, node: ast.Subscript) -> None:
+        in_type_hint = False
+        if isinstance(node.value, ast.Name):
+            qnames = {
+                name for name, _ in self.scope.get_qualified_names_for(node.value)
+            }
+            if any(x.startswith(("typing.", "typing_extensions.")) for x in qnames):
+                in_type_hint = True
+            if "typing.Literal" in qnames or "typing_extensions.Literal" in qnames:
+                self._ignored_subscripts.add(node)
+
+        self._type_hint_stack.append(in_type_hint)
+        self.generic_visit(node)
+        self._type_hint_stack.pop()
+        self._ignored_subscripts.discard(node)
+
+    def visit_Constant(self, node: ast.Constant) -> None:
+        if (
+            isinstance(node.value, str)
+            and node.value
+            and (self._type_hint_stack[-1] or self._annotation_stack[-1])
+            and not self._ignored_subscripts
+        ):
+            try:
+                parsed = parse(node.value)
+            except (SyntaxError, ValueError):
+                # Unparseable string annotations are ignored, as they are by CPython
+                return
+
+            in_string_annotation = self._in_string_annotation
+            self._in_string_annotation = True
+            self.visit_all(parsed.body)
+            self._in_string_annotation = in_string_annotation
+
+    def visit_JoinedStr(self, node: ast.JoinedStr) -> None:
+        # Only the expressions in an f-string can contain accesses
+        for value in node.values:
+            if isinstance(value, ast.FormattedValue):
+                self.visit(value.value)
+                if value.format_spec is not None:
+                    self.visit(value.format_spec)
+
+    def visit_AnnAssign(self, node: ast.AnnAssign) -> None:
+        self.visit(node.target)
+        with self._annotation():
+            self.visit(node.annotation)
+        if node.value is not None:
+            self.visit(node.value)
+
+    # Definitions
+
+    def _visit_function(self, node: _FunctionNode) -> None:
+        self.scope.record_assignment(node.name, node)
+
+        with self._new_scope(FunctionScope(self.scope, node.name)):
+            self.visit(node.args)
+            self.visit_all(node.body)
+
+        self.visit_all(node.decorator_list)
+        if node.returns is not None:
+            with self._annotation():
+                self.visit(node.returns)
+
+    def visit_FunctionDef(self, node: ast.FunctionDef) -> None:
+        self._visit_function(node)
+
+    def visit_AsyncFunctionDef(self, node: ast.AsyncFunctionDef) -> None:
+        self._visit_function(node)
+
+    def visit_Lambda(self, node: ast.Lambda) -> None:
+        with self._new_scope(FunctionScope(self.scope)):
+            self.visit(node.args)
+            self.visit(node.body)
+
+    def visit_arguments(self, node: ast.arguments) -> None:
+        positional = [*node.posonlyargs, *node.args]
+        defaults: List[Optional[ast.expr]] = [
+            *([None] * (len(positional) - len(node.defaults))),
+            *node.defaults,
+        ]
+        params: List[Tuple[ast.arg, Optional[ast.expr]]] = list(
+            zip(positional, defaults)
+        )
+        if node.vararg:
+            params.append((node.vararg, None))
+        params.extend(zip(node.kwonlyargs, node.kw_defaults))
+        if node.kwarg:
+            params.append((node.kwarg, None))
+
+        for param, default in params:
+            self.scope.record_assignment(param.arg, param)
+            # Defaults and annotations are evaluated in the enclosing scope
+            with self._switch_scope(self.scope.parent):
+                if default is not None:
+                    self.visit(default)
+                if param.annotation is not None:
+                    with self._annotation():
+                        self.visit(param.annotation)
+
+    def visit_ClassDef(self, node: ast.ClassDef) -> None:
+        self.scope.record_assignment(node.name, node)
+        self.visit_all(node.decorator_list)
+        self.visit_all(node.bases)
+        self.visit_all([x.value for x in node.keywords])
+
+        with self._new_scope(ClassScope(self.scope, node.name)):
+            self.visit_all(node.body)
+
+    def visit_Global(self, node: ast.Global) -> None:
+        for name in node.names:
+            self.scope.record_global_overwrite(name)
+
+    def visit_Nonlocal(self, node: ast.Nonlocal) -> None:
+        for name in node.names:
+            self.scope.record_nonlocal_overwrite(name)
+
+    def visit_Import(self, node: ast.Import) -> None:
+        self._visit_import_alike(node)
+
+    def visit_ImportFrom(self, node: ast.ImportFrom) -> None:
+        self._visit_import_alike(node)
+
+    def _visit_import_alike(self, node: Union[ast.Import, ast.ImportFrom]) -> None:
+        for alias in node.names:
+            if alias.name == "*":
+                self.import_star = True
+                return
+
+            names = [alias.asname] if alias.asname else dotted_prefixes(alias.name)
+            for name in names:
+                self.scope.record_import_assignment(name, node)
+
+    def visit_ExceptHandler(self, node: ast.ExceptHandler) -> None:
+        if node.type is not None:
+            self.visit(node.type)
+        if node.name is not None:
+            self.scope.record_assignment(node.name, node)
+            self.scope.count += 1
+        self.visit_all(node.body)
+
+    def visit_match_case(self, node: "ast.match_case") -> None:
+        self.visit(node.pattern)
+        # Names captured by the pattern are visible to the guard and the body
+        self.scope.count += 1
+        if node.guard is not None:
+            self.visit(node.guard)
+        self.visit_all(node.body)
+
+    def visit_MatchAs(self, node: "ast.MatchAs") -> None:
+        if node.pattern is not None:
+            self.visit(node.pattern)
+        if node.name is not None:
+            self.scope.record_assignment(node.name, node)
+
+    def visit_MatchStar(self, node: "ast.MatchStar") -> None:
+        if node.name is not None:
+            self.scope.record_assignment(node.name, node)
+
+    def visit_MatchMapping(self, node: "ast.MatchMapping") -> None:
+        self.visit_all(node.keys)
+        self.visit_all(node.patterns)
+        if node.rest is not None:
+            self.scope.record_assignment(node.rest, node)
+
+    # Comprehensions
+
+    def _visit_comp_alike(
+        self,
+        node: Union[ast.ListComp, ast.SetComp, ast.GeneratorExp, ast.DictComp],
+        elts: Sequence[ast.AST],
+    ) -> None:
+        first, *rest = node.generators
+
+        # The first iterable is evaluated outside of the comprehension's scope
+        self.visit(first.iter)
+        with self._new_scope(ComprehensionScope(self.scope)):
+            self.visit(first.target)
+            self.scope.count += 1
+            self.visit_all(first.ifs)
+            for generator in rest:
+                self.visit(generator.target)
+                self.visit(generator.iter)
+                self.visit_all(generator.ifs)
+            self.scope.count += len(rest)
+            self.visit_all(elts)
+
+    def visit_ListComp(self, node: ast.ListComp) -> None:
+        self._visit_comp_alike(node, [node.elt])
+
+    def visit_SetComp(self, node: ast.SetComp) -> None:
+        self._visit_comp_alike(node, [node.elt])
+
+    def visit_GeneratorExp(self, node: ast.GeneratorExp) -> None:
+        self._visit_comp_alike(node, [node.elt])
+
+    def visit_DictComp(self, node: ast.DictComp) -> None:
+        self._visit_comp_alike(node, [node.key, node.value])
+
+    # Blocks
+
+    def _visit_for(self, node: Union[ast.For, ast.AsyncFor]) -> None:
+        self.visit(node.target)
+        self.visit(node.iter)
+
+        with self._new_scope(BlockScope(self.scope)):
+            self.visit_all(node.body)
+
+        if node.orelse:
+            with self._new_scope(BlockScope(self.scope)):
+                self.visit_all(node.orelse)
+
+    def visit_For(self, node: ast.For) -> None:
+        self._visit_for(node)
+
+    def visit_AsyncFor(self, node: ast.AsyncFor) -> None:
+        self._visit_for(node)
+
+    def visit_If(self, node: ast.If) -> None:
+        """ Create a new scope for if """
+        self.visit(node.test)
+
+        if self.is_conditional_typing_import(node):
+            self.visit_all(node.body)
+            return
+
+        terminal_else = False
+        orelse = node.orelse
+        while orelse:
+            elif_ = self._elif(orelse)
+            if elif_ is not None:
+                orelse = elif_.orelse
+            else:
+                terminal_else = self.is_terminal(orelse)
+                break
+
+        if terminal_else:
+            # If the last else includes a bare 'raise' or 'return',
+            # we just assume that variables defined in the if/else statements
+            # *will be* accessible after the If statement.
+            # (Just like the libCST engine, the tests of elif blocks are not visited.)
+            self.visit_all(node.body)
+            orelse = node.orelse
+            while orelse:
+                elif_ = self._elif(orelse)
+                if elif_ is None:
+                    self.visit_all(orelse)
+                    break
+                self.visit_all(elif_.body)
+                orelse = elif_.orelse
+        else:
+            with self._new_scope(BlockScope(self.scope)):
+                self.visit_all(node.body)
+
+            elif_ = self._elif(node.orelse)
+            if elif_ is not None:
+                self.visit(elif_)
+            else:
+                self.visit_all(node.orelse)
+
+    def visit_Try(self, node: ast.Try) -> None:
+        """ Deal with the complexities of try/except/else/finally """
+
+        all_terminal_handlers = all(
+            self.is_terminal(handler.body) for handler in node.handlers
+        )
+
+        if all_terminal_handlers:
+            # If all except handlers are terminal, assume that anything defined in the body WILL be seen
+            # if we make it past the try block
+            self.visit_all(node.body)
+        else:
+            with self._new_scope(BlockScope(self.scope)):
+                self.visit_all(node.body)
+
+        if len(node.handlers) == 1:
+            # If there is only one exception handler, and it does not terminate
+            # then any variables declared in it will be enabled after it.
+            self.visit(node.handlers[0])
+        else:
+            # Otherwise, we don't know which handler will be called (if any)
+            for handler in node.handlers:
+                with self._new_scope(BlockScope(self.scope)):
+                    self.visit(handler)
+
+        if node.orelse:
+            with self._new_scope(BlockScope(self.scope)):
+                # An else block only runs if the try block succeeded
+                # Therefore, run the try block inside the else scope!
+                self.visit_all(node.body)
+                self.visit_all(node.orelse)
+
+        # Finally is always run, so its variables are visible to subsequent code
+        self.visit_all(node.finalbody)
+
+    def _elif(self, orelse: List[ast.stmt]) -> Optional[ast.If]:
+        """ Return the If node, if an else block is really an 'elif' """
+        if len(orelse) != 1 or not isinstance(orelse[0], ast.If):
+            return None
+        node = orelse[0]
+        line = self.lines[node.lineno - 1]
+        return node if line[node.col_offset :].startswith(b"elif") else None
+
+    def _is_suite(self, body: List[ast.stmt]) -> bool:
+        """ Return true if a block is on the same line as its header, e.g. 'else: raise' """
+        first = body[0]
+        return bool(self.lines[first.lineno - 1][: first.col_offset].strip())
+
+    # Terminal blocks (see ast_utils)
+
+    def is_terminal(self, body: List[ast.stmt]) -> bool:
+        """
+        Return true if a block includes any unconditional statements which break control
+        out of the current scope.
+        """
+        if not body or self._is_suite(body):
+            return False
+
+        for statement in body:
+            if isinstance(statement, EXIT_NODES):
+                return True
+            if self.is_exit_expression(statement, self.scope):
+                return True
+        return False
+
+    def get_qualified_names_for(
+        self, scope: Scope, node: ast.AST
+    ) -> Set[QualifiedName]:
+        """
+        Return the qualified names for a node, memoized for the module until the scope
+        has more assignments
+        """
+        key = (scope, node)
+        cached = self._qualified_names.get(key)
+        if cached is not None and cached[0] == scope.count:
+            return cached[1]
+        names = scope.get_qualified_names_for(node)
+        self._qualified_names[key] = (scope.count, names)
+        return names
+
+    def is_exit_expression(self, node: ast.stmt, scope: Scope) -> bool:
+        """
+        Return true if the node is a function call which unconditionally causes the application to exit.
+        """
+        if not isinstance(node, ast.Expr) or not isinstance(node.value, ast.Call):
+            return False
+        func = node.value.func
+
+        # Builtin exit functions, and those elsewhere in the project
+        for qname, source in self.get_qualified_names_for(scope, func):
+            if is_exit_function(qname) and source == IMPORT:
+                return True
+
+        # Custom exit functions
+        name = get_name_for(func)
+        for assignment in scope.assignments.get(name or "", []):
+            function = assignment.node
+            if not isinstance(function, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                continue
+            if isinstance(assignment, ImportAssignment):
+                continue
+            if self.is_terminal_function(function, assignment.scope):
+                return True
+        return False
+
+    def is_terminal_function(self, node: _FunctionNode, scope: Scope) -> bool:
+        """
+        Return true if calling a function, defined in 'scope', always exits.
+        See ast_utils.FunctionIndex, whose memoization this mirrors.
+        """
+        cached = self._terminal_functions.get(node)
+        if cached is not None and cached[0] == scope.count:
+            return cached[1]
+
+        if node in self._in_progress:
+            # Assume that a recursive call doesn't exit, unless something else does
+            self._depends_on = min(self._depends_on, self._in_progress.index(node))
+            return False
+
+        if node.returns is not None:
+            names = self.get_qualified_names_for(scope, node.returns)
+            if names == {QualifiedNoReturn}:
+                self._terminal_functions[node] = (scope.count, True)
+                return True
+
+        if self._is_suite(node.body):
+            self._terminal_functions[node] = (scope.count, False)
+            return False
+
+        position = len(self._in_progress)
+        self._in_progress.append(node)
+        depends_on, self._depends_on = self._depends_on, position
+        try:
+            # Terminal function bodies
+            terminal = any(self.is_exit_expression(x, scope) for x in node.body)
+        finally:
+            self._in_progress.pop()
+
+        if terminal or self._depends_on >= position:
+            self._terminal_functions[node] = (scope.count, terminal)
+        self._depends_on = min(self._depends_on, depends_on)
+        return terminal
+
+    def is_conditional_typing_import(self, node: ast.If) -> bool:
+        """
+        Return true if an if statement was a truth check of typing.TYPE_CHECKING.
+        """
+        if node.orelse:
+            return False
+
+        tested = node.test
+        if isinstance(tested, ast.Compare) and self.is_truth_comparison(tested):
+            tested = tested.left
+
+        return self.get_qualified_names_for(self.scope, tested) == {
+            QualifiedTypeCheckingFlag
+        }
+
+    def is_truth_comparison(self, node: ast.Compare) -> bool:
+        """ Return true if the node is a comparison of the form "x is True" or "x == True" """
+        if len(node.ops) != 1:
+            return False
+
+        return isinstance(
+            node.ops[0], (ast.Is, ast.Eq)
+        ) and self.get_qualified_names_for(self.scope, node.comparators[0]) == {
+            QualifiedTrue
+        }
+
+
+def dotted_prefixes(name: str) -> List[str]:
+    """ Return 'a.b.c', 'a.b' and 'a' for 'a.b.c' """
+    parts = name.split(".")
+    return [".".join(parts[:i]) for i in range(len(parts), 0, -1)]
+
+
+def check(code: str) -> List[BaseWarning]:
+    """ Return a list of warnings related to some Python code, using the ast module """
+    with phase("parse"):
+        lines = [x.encode() for x in _NEWLINE.split(code)]
+        tree = parse(code)
+
+    with phase("scopes"):
+        visitor = BlockScopeVisitor(lines)
+        visitor.visit_all(tree.body)
+
+    if visitor.import_star:
+        return [ImportStarWarning()]
+
+    ignored_lines: Optional[Set[int]] = None
+    warnings: List[BaseWarning] = []
+
+    with phase("accesses"):
+        live_scopes = set(visitor.node_scopes.values())
+        for scope in visitor.scopes:
+            if scope not in live_scopes:
+                continue
+            for access in scope.accesses:
+                if not is_undefined(access):
+                    continue
+                node = access.node
+                if node.id in EXCEPTIONS:
+                    continue
+
+                if access.in_string_annotation:
+                    warnings.append(NoLocationRefWarning(reference=node.id))
+                    continue
+
+                if ignored_lines is None:
+                    # Comments are only needed once there are warnings to ignore
+                    ignored_lines = prescan(code).ignored_lines
+                if node.lineno not in ignored_lines:
+                    column = len(lines[node.lineno - 1][: node.col_offset].decode())
+                    warnings.append(
+                        RefWarning(line=node.lineno, column=column, reference=node.id)
+                    )
+    return warnings
+
+
+def is_undefined(access: Access) -> bool:
+    """ Return true if an access may not refer to any assignment """
+    scope = access.scope
+    name = access.node.id
+
+    if access.enclosing_attribute is not None:
+        for dotted_name in gen_dotted_names(access.enclosing_attribute):
+            if dotted_name in scope:
+                name = dotted_name
+                break
+
+    assignments = scope[name]
+    for assignment in assignments:
+        if assignment.scope is not scope or assignment.index < access.index:
+            return False
+
+    if assignments and scope.parent is not scope:
+        return not scope.parent[name]
+    return True
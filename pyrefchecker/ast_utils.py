@@ -1,9 +1,11 @@
+from typing import Collection, Dict, List, Optional, Tuple
+
 import libcst as cst
 import libcst.metadata.scope_provider as sp
 
-EXIT_NODES = (cst.Raise, cst.Return, cst.Continue, cst.Break)
+from .exits import is_exit_function
 
-EXIT_FUNCTIONS = ("sys.exit", "os._exit")
+EXIT_NODES = (cst.Raise, cst.Return, cst.Continue, cst.Break)
 
 QualifiedNoReturn = sp.QualifiedName(
     name="typing.NoReturn", source=sp.QualifiedNameSource.IMPORT,
@@ -17,87 +19,210 @@ QualifiedTrue = sp.QualifiedName(
     name="builtins.True", source=sp.QualifiedNameSource.BUILTIN
 )
 
+# Nodes which may assign names in the scope they're left in, as for libCST's assignment
+# index (which not every supported version of libCST has)
+ASSIGNMENT_LIKE_NODES = (
+    cst.AnnAssign,
+    cst.AsName,
+    cst.Assign,
+    cst.AugAssign,
+    cst.ClassDef,
+    cst.CompFor,
+    cst.FunctionDef,
+    cst.Global,
+    cst.Import,
+    cst.ImportFrom,
+    cst.NamedExpr,
+    cst.Nonlocal,
+    cst.Parameters,
+    cst.WithItem,
+)
 
-def is_exit_expression(node: cst.CSTNode, scope: sp.Scope) -> bool:
-    """
-    Return true if the node is a function call which unconditionally causes the application to exit.
 
-    - Function calls to builtin exit functions
-    - Function calls to functions with NoReturn type
-    - Function calls to functions which are terminal
+class FunctionIndex:
+    """
+    A per-module index of which functions are terminal, i.e. unconditionally cause the
+    application to exit, and of the qualified names looked up while deciding.
+
+    A function is terminal if it's annotated as NoReturn, or if its body calls a builtin
+    exit function or another terminal function. Each function is only inspected once,
+    and recursive functions are handled by only remembering that a function is not
+    terminal once nothing it depends on is still being inspected.
+
+    The index is filled in while the module's scopes are being visited, so what's found
+    in a scope depends on how much of it has been visited. Called functions are only
+    looked for in the scope being visited, and its parents can't change until it has
+    been, so results are remembered with how many assignments that scope had (see
+    'record_assignment'), and only reused until it has more. They're then the same as
+    if they were worked out afresh each time, whichever order they're asked for in.
     """
 
-    if isinstance(node, cst.Expr) and isinstance(node.value, cst.Call):
-        # Builtin exit functions
-        qualified_names = scope.get_qualified_names_for(node.value.func)
-        for qname in qualified_names:
-            if (
-                qname.name in EXIT_FUNCTIONS
-                and qname.source == sp.QualifiedNameSource.IMPORT
-            ):
-                return True
+    def __init__(self) -> None:
+        self._terminal: Dict[cst.FunctionDef, Tuple[int, bool]] = {}
+        self._qualified_names: Dict[
+            Tuple[sp.Scope, cst.CSTNode], Tuple[int, Collection[sp.QualifiedName]]
+        ] = {}
+        # How many assignment-like nodes have been left in each scope
+        self._assignments: Dict[sp.Scope, int] = {}
+        self._in_progress: List[cst.FunctionDef] = []
+        # The lowest position in '_in_progress' which the current result depends on
+        self._depends_on = 0
+
+    def record_assignment(self, scope: sp.Scope) -> None:
+        """ Note that an assignment-like node has been left in a scope """
+        self._assignments[scope] = self._assignments.get(scope, 0) + 1
+
+    def get_qualified_names_for(
+        self, scope: sp.Scope, node: cst.CSTNode
+    ) -> Collection[sp.QualifiedName]:
+        key = (scope, node)
+        assignments = self._assignments.get(scope, 0)
+        cached = self._qualified_names.get(key)
+        if cached is not None and cached[0] == assignments:
+            return cached[1]
+        names = scope.get_qualified_names_for(node)
+        self._qualified_names[key] = (assignments, names)
+        return names
+
+    def is_exit_expression(self, node: cst.CSTNode, scope: sp.Scope) -> bool:
+        """
+        Return true if the node is a function call which unconditionally causes the application to exit.
+
+        - Function calls to builtin exit functions
+        - Function calls to functions with NoReturn type
+        - Function calls to functions which are terminal
+        """
+
+        if isinstance(node, cst.Expr) and isinstance(node.value, cst.Call):
+            # Builtin exit functions, and those elsewhere in the project
+            qualified_names = self.get_qualified_names_for(scope, node.value.func)
+            for qname in qualified_names:
+                if (
+                    is_exit_function(qname.name)
+                    and qname.source == sp.QualifiedNameSource.IMPORT
+                ):
+                    return True
 
-        # Custom exit functions
-        for assignment in scope.assignments[node.value.func]:
-            if not isinstance(assignment, sp.Assignment):
-                continue
-            if not isinstance(assignment.node, cst.FunctionDef):
-                continue
-            if assignment.node.returns:
-                return_annotation_names = scope.get_qualified_names_for(
-                    assignment.node.returns.annotation
-                )
-                if return_annotation_names == {QualifiedNoReturn}:
+            # Custom exit functions
+            for assignment in scope.assignments[node.value.func]:
+                if not isinstance(assignment, sp.Assignment):
+                    continue
+                if not isinstance(assignment.node, cst.FunctionDef):
+                    continue
+                if self.is_terminal_function(assignment.node, assignment.scope):
                     return True
+        return False
+
+    def is_terminal_function(self, node: cst.FunctionDef, scope: sp.Scope) -> bool:
+        """ Return true if calling a function, defined in 'scope', always exits """
+        assignments = self._assignments.get(scope, 0)
+        cached = self._terminal.get(node)
+        if cached is not None and cached[0] == assignments:
+            return cached[1]
+
+        if node in self._in_progress:
+            # Assume that a recursive call doesn't exit, unless something else does
+            self._depends_on = min(self._depends_on, self._in_progress.index(node))
+            return False
+
+        if node.returns:
+            return_annotation_names = self.get_qualified_names_for(
+                scope, node.returns.annotation
+            )
+            if return_annotation_names == {QualifiedNoReturn}:
+                self._terminal[node] = (assignments, True)
+                return True
 
+        position = len(self._in_progress)
+        self._in_progress.append(node)
+        depends_on, self._depends_on = self._depends_on, position
+        try:
             # Terminal function bodies
-            for statement in getattr(assignment.node.body, "body", []):
+            terminal = False
+            for statement in getattr(node.body, "body", []):
                 if isinstance(statement, cst.SimpleStatementLine):
                     for statement_item in getattr(statement, "body", []):
-                        if is_exit_expression(statement_item, assignment.scope):
-                            return True
-    return False
+                        if self.is_exit_expression(statement_item, scope):
+                            terminal = True
+                            break
+                if terminal:
+                    break
+        finally:
+            self._in_progress.pop()
+
+        if terminal or self._depends_on >= position:
+            # Either way, the result doesn't rely on an assumption about another function
+            self._terminal[node] = (assignments, terminal)
+        self._depends_on = min(self._depends_on, depends_on)
+        return terminal
+
+    def is_terminal(self, node: cst.CSTNode, scope: sp.Scope) -> bool:
+        """
+        Return true if a node's body includes any unconditioinal statements which break control out of the current scope.
+
+        Currently this includes:
+            - Breaking statements: continue, raise, return, break
+            - Anything which causes the application to quit
+        """
+
+        for statement in getattr(getattr(node, "body", None), "body", []):
+            if isinstance(statement, cst.SimpleStatementLine):
+                for statement_item in getattr(statement, "body", []):
+                    if isinstance(statement_item, EXIT_NODES):
+                        return True
+
+                    if self.is_exit_expression(statement_item, scope):
+                        return True
 
+        return False
 
-def is_terminal(node: cst.CSTNode, scope: sp.Scope) -> bool:
-    """
-    Return true if a node's body includes any unconditioinal statements which break control out of the current scope.
 
-    Currently this includes:
-        - Breaking statements: continue, raise, return, break
-        - Anything which causes the application to quit
+def is_exit_expression(
+    node: cst.CSTNode, scope: sp.Scope, index: Optional[FunctionIndex] = None
+) -> bool:
     """
+    Return true if the node is a function call which unconditionally causes the application to exit.
+    Pass the module's index to share its results between calls.
+    """
+    return (index or FunctionIndex()).is_exit_expression(node, scope)
 
-    for statement in getattr(getattr(node, "body", None), "body", []):
-        if isinstance(statement, cst.SimpleStatementLine):
-            for statement_item in getattr(statement, "body", []):
-                if isinstance(statement_item, EXIT_NODES):
-                    return True
-
-                if is_exit_expression(statement_item, scope):
-                    return True
 
-    return False
+def is_terminal(
+    node: cst.CSTNode, scope: sp.Scope, index: Optional[FunctionIndex] = None
+) -> bool:
+    """
+    Return true if a node's body includes any unconditioinal statements which break control out of the current scope.
+    Pass the module's index to share its results between calls.
+    """
+    return (index or FunctionIndex()).is_terminal(node, scope)
 
 
-def is_conditional_typing_import(node: cst.If, scope: sp.Scope) -> bool:
+def is_conditional_typing_import(
+    node: cst.If, scope: sp.Scope, index: Optional[FunctionIndex] = None
+) -> bool:
     """
     Return true if an if statement was a truth check of typing.TYPE_CHECKING.
     """
+    index = index or FunctionIndex()
 
     if node.orelse:
         return False
 
     tested = node.test
 
-    if isinstance(node.test, cst.Comparison) and is_truth_comparison(node.test, scope):
+    if isinstance(node.test, cst.Comparison) and is_truth_comparison(
+        node.test, scope, index
+    ):
         tested = node.test.left
 
-    return scope.get_qualified_names_for(tested) == {QualifiedTypeCheckingFlag}
+    return index.get_qualified_names_for(scope, tested) == {QualifiedTypeCheckingFlag}
 
 
-def is_truth_comparison(node: cst.Comparison, scope: sp.Scope) -> bool:
+def is_truth_comparison(
+    node: cst.Comparison, scope: sp.Scope, index: Optional[FunctionIndex] = None
+) -> bool:
     """ Return true if the node is a comparison of the form "x is True" or "x == True" """
+    index = index or FunctionIndex()
 
     if len(node.comparisons) != 1:
         return False
@@ -105,4 +230,4 @@ def is_truth_comparison(node: cst.Comparison, scope: sp.Scope) -> bool:
     comp = node.comparisons[0]
     return isinstance(
         comp.operator, (cst.Is, cst.Equal)
-    ) and scope.get_qualified_names_for(comp.comparator) == {QualifiedTrue}
+    ) and index.get_qualified_names_for(scope, comp.comparator) == {QualifiedTrue}
@@ -0,0 +1,125 @@
+"""
+A compact representation of the warnings for a file, for sending from workers and caching.
+"""
+
+from array import array
+from typing import Any, Dict, Iterable, Iterator, List, Sequence, Tuple, Union, overload
+
+from .warnings import BaseRefWarning, BaseWarning, ImportStarWarning, RefWarning
+
+
+class WarningBatch(Sequence[BaseWarning]):
+    """
+    A read-only sequence of warnings, which pickles to a few flat buffers however many
+    warnings it holds.
+
+    Warnings with a location are stored as columns of line and column numbers, with their
+    references interned in a table of names, and any other warnings are kept as they are.
+    Warning objects are only created as the batch is read, e.g. when it's reported.
+    """
+
+    __slots__ = ("_lines", "_columns", "_references", "_names", "_others")
+
+    def __init__(self, warnings: Iterable[BaseWarning] = ()):
+        self._lines = array("i")
+        self._columns = array("i")
+        self._references = array("i")
+        # Warnings without a location, with their index in the batch
+        self._others: List[Tuple[int, BaseWarning]] = []
+
+        names: Dict[str, int] = {}
+        for index, warning in enumerate(warnings):
+            if type(warning) is RefWarning:
+                self._lines.append(warning.line)
+                self._columns.append(warning.column)
+                self._references.append(names.setdefault(warning.reference, len(names)))
+            else:
+                self._others.append((index, warning))
+        self._names = list(names)
+
+    @classmethod
+    def _from_columns(
+        cls,
+        lines: array,
+        columns: array,
+        references: array,
+        names: List[str],
+        others: List[Tuple[int, BaseWarning]],
+    ) -> "WarningBatch":
+        batch = cls()
+        batch._lines = lines
+        batch._columns = columns
+        batch._references = references
+        batch._names = names
+        batch._others = others
+        return batch
+
+    def __reduce__(self) -> Tuple[Any, ...]:
+        return (
+            WarningBatch._from_columns,
+            (self._lines, self._columns, self._references, self._names, self._others),
+        )
+
+    def __len__(self) -> int:
+        return len(self._lines) + len(self._others)
+
+    @overload
+    def __getitem__(self, index: int) -> BaseWarning:
+        ...
+
+    @overload
+    def __getitem__(self, index: slice) -> List[BaseWarning]:
+        ...
+
+    def __getitem__(
+        self, index: Union[int, slice]
+    ) -> Union[BaseWarning, List[BaseWarning]]:
+        if isinstance(index, slice):
+            return list(self)[index]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("WarningBatch index out of range")
+
+        # The number of other warnings before this one
+        skipped = 0
+        for position, warning in self._others:
+            if position == index:
+                return warning
+            if position > index:
+                break
+            skipped += 1
+        return self._ref(index - skipped)
+
+    def __iter__(self) -> Iterator[BaseWarning]:
+        others = iter(self._others)
+        following = next(others, None)
+        ref = 0
+        for index in range(len(self)):
+            if following is not None and following[0] == index:
+                yield following[1]
+                following = next(others, None)
+            else:
+                yield self._ref(ref)
+                ref += 1
+
+    def _ref(self, ref: int) -> RefWarning:
+        return RefWarning(
+            self._lines[ref], self._columns[ref], self._names[self._references[ref]]
+        )
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, Sequence):
+            return NotImplemented
+        return len(self) == len(other) and list(self) == list(other)
+
+    def __repr__(self) -> str:
+        return f"WarningBatch({list(self)!r})"
+
+    def failures(self, allow_import_star: bool) -> int:
+        """ Return the number of warnings which fail the check, without creating them """
+        return len(self._lines) + sum(
+            isinstance(x, BaseRefWarning)
+            or (isinstance(x, ImportStarWarning) and not allow_import_star)
+            for _, x in self._others
+        )
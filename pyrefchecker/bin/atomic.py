@@ -0,0 +1,24 @@
+import os
+import tempfile
+from pathlib import Path
+from typing import Union
+
+
+def atomic_write(path: Union[str, Path], data: bytes) -> None:
+    """
+    Write a file atomically, so that readers (including other processes) see either the
+    old contents or the new, and a writer which is interrupted leaves the old contents.
+    The file's directory must exist.
+    """
+    path = Path(path)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
@@ -1,19 +1,75 @@
+import hashlib
+import itertools
 import re
 import sys
-import traceback
-from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import ExitStack
+from functools import partial
 from pathlib import Path
-from typing import Iterable, List, Optional, Union
+from typing import (
+    Callable,
+    Dict,
+    FrozenSet,
+    Iterable,
+    Iterator,
+    List,
+    Mapping,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+)
 
 import click
-import timeout_decorator
 
-from .. import BaseRefWarning, BaseWarning, ImportStarWarning, check
-from .find_files import find_files
-from .pyproject_toml import PyProjectTOML
+from .. import (
+    ENGINES,
+    PARSERS,
+    BaseRefWarning,
+    BaseWarning,
+    ImportStarWarning,
+    check,
+)
+from ..batch import WarningBatch
+from ..checker import init_worker
+from ..differential import Divergence, compare_engines
+from ..exits import key_content
+from ..exports import expand_content, expand_import_star
+from ..pool import Outcome, WorkerPool
+from ..profiling import Profile, cprofiled, phase, record
+from .cache import ResultCache
+from .find_files import find_files, select_files
+from .formats import (
+    FORMATS,
+    TOO_LARGE,
+    ReorderBuffer,
+    Reporter,
+    TextReporter,
+    fails,
+    failures,
+    report,
+)
+from .git import GitError, changed_files
+from .history import FailureHistory
+from .incremental import IncrementalChecker
+from .project_index import ModuleIndex, ProjectIndex, ProjectIndexer
+from .project_index import index_cache as project_index_cache
+from .project_index import index_project
+from .pyproject_toml import defaults
 from .regex_type import Regex
+from .scheduling import (
+    Durations,
+    Job,
+    JobResult,
+    ShardSelection,
+    longest_first,
+    make_chunks,
+    select_shard,
+)
+from .shard_type import Shard
+from .watch import DEBOUNCE, Watcher, make_watcher, wait_for_changes
 
-defaults = PyProjectTOML("tool.pyrefchecker")
+# The number of files checked at once when sorting output
+SORT_WINDOW = 1024
 
 # Copied from Black!
 DEFAULT_EXCLUDE = r"(\.eggs|\.git|\.hg|\.mypy_cache|\.nox|\.tox|\.venv|\.svn|_build|buck-out|build|dist)"
@@ -37,9 +93,15 @@ DEFAULT_EXCLUDE = r"(\.eggs|\.git|\.hg|\.mypy_cache|\.nox|\.tox|\.venv|\.svn|_bu
     "--timeout",
     type=int,
     default=defaults.get("timeout", 5),
-    help="Maximum processing time for a single file",
+    help="Maximum processing time for a single file, in seconds",
     show_default=True,
 )
+@click.option(
+    "--workers",
+    type=click.IntRange(min=0),
+    default=defaults.get("workers", None),
+    help="Number of worker processes (0 checks files serially, without timeouts)  [default: number of CPUs]",
+)
 @click.option(
     "--allow-import-star/--disallow-import-star",
     default=defaults.get("allow_import_star", True),
@@ -68,14 +130,203 @@ DEFAULT_EXCLUDE = r"(\.eggs|\.git|\.hg|\.mypy_cache|\.nox|\.tox|\.venv|\.svn|_bu
     help="Additional regexes for paths to exclude",
     show_default=False,
 )
+@click.option(
+    "--engine",
+    type=click.Choice(ENGINES),
+    default=defaults.get("engine", ENGINES[0]),
+    help="Engine to analyse files with. 'ast' is much faster, 'libcst' is the reference.",
+    show_default=True,
+)
+@click.option(
+    "--parser",
+    type=click.Choice(PARSERS),
+    default=defaults.get("parser", PARSERS[0]),
+    help=(
+        "libCST parser backend. 'auto' uses the fastest available, and falls back to "
+        "the others for files it can't parse."
+    ),
+    show_default=True,
+)
+@click.option(
+    "--differential",
+    is_flag=True,
+    default=False,
+    help=(
+        "Check files with libcst and the selected engine (ast, if that is libcst), "
+        "and report any differences in their warnings"
+    ),
+)
+@click.option(
+    "--cache/--no-cache",
+    default=defaults.get("cache", True),
+    help="Whether or not to cache results between runs",
+    show_default="cache" if defaults.get("cache", True) else "no-cache",
+)
+@click.option(
+    "--cache-dir",
+    type=click.Path(file_okay=False, dir_okay=True, writable=True),
+    default=defaults.get("cache_dir", ".pyrefchecker_cache"),
+    help="Directory to store cached results in",
+    show_default=True,
+)
+@click.option(
+    "--cache-max-size",
+    type=int,
+    default=defaults.get("cache_max_size", 256),
+    help="Maximum size of the result cache, in megabytes",
+    show_default=True,
+)
+@click.option(
+    "--profile",
+    "profile_count",
+    type=click.IntRange(min=1),
+    default=None,
+    metavar="N",
+    help="Time each phase of checking every file, and report the N slowest files",
+)
+@click.option(
+    "--cprofile",
+    type=click.Path(dir_okay=False, writable=True),
+    default=None,
+    help="Check files serially under cProfile, and write its stats to this path",
+)
+@click.option(
+    "--changed-since",
+    metavar="REF",
+    default=None,
+    help="Only check files which differ from a git ref (including staged and untracked files)",
+)
+@click.option(
+    "--watch",
+    is_flag=True,
+    default=False,
+    help="Keep running, re-checking files as they change and showing the warnings which changed",
+)
+@click.option(
+    "--format",
+    "output_format",
+    type=click.Choice(list(FORMATS)),
+    default=defaults.get("format", "text"),
+    help="Format to report results in. jsonl writes a JSON object for each file with warnings.",
+    show_default=True,
+)
+@click.option(
+    "--sort/--no-sort",
+    default=defaults.get("sort", False),
+    help=(
+        "Report files in the order they were found, rather than as they're done "
+        f"(checking {SORT_WINDOW} files at a time)"
+    ),
+    show_default="sort" if defaults.get("sort", False) else "no-sort",
+)
+@click.option(
+    "--fail-fast",
+    is_flag=True,
+    default=False,
+    help="Stop as soon as a file fails (the same as --max-warnings 1)",
+)
+@click.option(
+    "--max-warnings",
+    type=click.IntRange(min=1),
+    default=None,
+    metavar="N",
+    help="Stop as soon as N failing warnings have been found",
+)
+@click.option(
+    "--history",
+    "history_path",
+    type=click.Path(dir_okay=False, writable=True),
+    default=defaults.get("history", None),
+    help="File to remember failures in, so that files which failed recently are checked first",
+)
+@click.option(
+    "--durations",
+    "durations_path",
+    type=click.Path(dir_okay=False, writable=True),
+    default=defaults.get("durations", None),
+    help="File to remember how long files take to check in, so that the slowest are started first",
+)
+@click.option(
+    "--max-tasks-per-worker",
+    "max_tasks",
+    type=click.IntRange(min=1),
+    default=defaults.get("max_tasks_per_worker", None),
+    metavar="N",
+    help="Replace each worker with a fresh one after it has checked N files",
+)
+@click.option(
+    "--max-worker-memory",
+    "max_memory",
+    type=click.IntRange(min=1),
+    default=defaults.get("max_worker_memory", None),
+    metavar="MB",
+    help=(
+        "Replace a worker once it uses more than this much memory. A file which takes "
+        "more than this alone is reported as too large."
+    ),
+)
+@click.option(
+    "--shard",
+    type=Shard(),
+    default=None,
+    metavar="I/N",
+    help=(
+        "Only check the I-th of N shards of the files, balanced by size, e.g. to split a "
+        "run across machines. Combine the results with 'pyrefchecker merge'."
+    ),
+)
+@click.option(
+    "--index-exits/--no-index-exits",
+    default=defaults.get("index_exits", True),
+    help=(
+        "Whether or not to find the functions in the files which never return (e.g. which "
+        "are annotated NoReturn) first, so that calls to them from other modules end a branch"
+    ),
+    show_default="index-exits"
+    if defaults.get("index_exits", True)
+    else "no-index-exits",
+)
+@click.option(
+    "--resolve-import-star/--no-resolve-import-star",
+    default=defaults.get("resolve_import_star", True),
+    help=(
+        "Whether or not to find the names each file exports first, so that files which "
+        "`import *` from other files can be checked"
+    ),
+    show_default="resolve-import-star"
+    if defaults.get("resolve_import_star", True)
+    else "no-resolve-import-star",
+)
 def main(
     paths: Iterable[Union[str, Path]],
     show_successes: bool,
     timeout: int,
+    workers: Optional[int],
     allow_import_star: bool,
     include: Optional[re.Pattern],
     exclude: Optional[re.Pattern],
     extra_excludes: List[re.Pattern],
+    engine: str,
+    parser: str,
+    differential: bool,
+    cache: bool,
+    cache_dir: str,
+    cache_max_size: int,
+    profile_count: Optional[int],
+    cprofile: Optional[str],
+    changed_since: Optional[str],
+    watch: bool,
+    output_format: str,
+    sort: bool,
+    fail_fast: bool,
+    max_warnings: Optional[int],
+    history_path: Optional[str],
+    durations_path: Optional[str],
+    max_tasks: Optional[int],
+    max_memory: Optional[int],
+    shard: Optional[Tuple[int, int]],
+    index_exits: bool,
+    resolve_import_star: bool,
 ) -> None:
     """
     Check python files for potentially undefined references.
@@ -87,21 +338,177 @@ def main(
     """
 
     excludes = [x for x in [exclude, *extra_excludes] if x is not None]
-    paths = find_files(paths, include, excludes)
+    roots = list(paths)
 
-    if not paths:
-        raise click.UsageError("No files specified")
+    if parser != PARSERS[0]:
+        # libCST is slow to import, so it's only checked for when it's needed
+        from ..parsers import available_parsers
 
-    if not run(
-        paths,
-        timeout=timeout,
-        allow_import_star=allow_import_star,
-        show_successes=show_successes,
-    ):
-        sys.exit(1)
+        if parser not in available_parsers():
+            raise click.UsageError(
+                f"The {parser} parser isn't available in this version of libCST"
+            )
+
+    if (watch or differential) and output_format != "text":
+        raise click.UsageError(
+            "--watch and --differential can only report results as text"
+        )
 
+    if watch:
+        if (
+            changed_since is not None
+            or differential
+            or profile_count is not None
+            or cprofile is not None
+            or shard is not None
+        ):
+            raise click.UsageError(
+                "--watch can't be used with --changed-since, --differential, --shard or profiling"
+            )
+        run_watch(
+            paths,
+            timeout=timeout,
+            allow_import_star=allow_import_star,
+            show_successes=show_successes,
+            include=include,
+            excludes=excludes,
+            workers=workers,
+            engine=engine,
+            max_tasks=max_tasks,
+            max_memory=megabytes(max_memory),
+            parser=parser,
+            index_exits=index_exits,
+            resolve_import_star=resolve_import_star,
+        )
+        return
+
+    if changed_since is not None:
+        try:
+            changed = changed_files(changed_since)
+        except GitError as e:
+            raise click.UsageError(str(e))
+
+        paths = sorted(select_files(changed, roots or ["."], include, excludes))
+        # Every shard is reported, even if empty, so that the shards can be merged
+        if not paths and output_format == "text" and shard is None:
+            click.echo(f"✨ no files changed since {changed_since}")
+            return
     else:
-        click.echo(f"✨ all good!")
+        found = find_files(paths, include, excludes)
+        first = next(found, None)
+        if first is None:
+            raise click.UsageError("No files specified")
+        paths = itertools.chain([first], found)
+
+    shard_selection = None
+    found_paths: Optional[List[Union[str, Path]]] = None
+    if shard is not None:
+        found_paths = list(paths)
+        # Not balanced by durations, which may differ between machines, as each must
+        # select the same shards
+        paths = select_shard(found_paths, *shard, weight=_size)
+        shard_selection = ShardSelection.of(paths, found_paths, *shard)
+        click.echo(
+            f"🧩 Checking shard {shard[0]}/{shard[1]}: "
+            f"{len(paths)} of {len(found_paths)} files",
+            err=True,
+        )
+
+    exits: FrozenSet[str] = frozenset()
+    exports: Mapping[str, Sequence[str]] = {}
+    if index_exits or resolve_import_star:
+        index_cache: Optional[ResultCache[ModuleIndex]] = None
+        if cache:
+            index_cache = project_index_cache(
+                cache_dir, max_size=cache_max_size * 1024 * 1024
+            )
+        paths = list(paths)
+        # Any file can define functions which the checked files call, or names which
+        # they import, but when only some of the files are checked, only the modules
+        # they import (directly or not) matter
+        project: Iterable[Union[str, Path]] = paths
+        reachable_from: Optional[List[Union[str, Path]]] = None
+        if changed_since is not None:
+            project = find_files(roots or ["."], include, excludes)
+            reachable_from = paths
+        elif found_paths is not None:
+            project = found_paths
+            reachable_from = paths
+        index = index_project(
+            project,
+            workers=workers,
+            timeout=timeout,
+            cache=index_cache,
+            reachable_from=reachable_from,
+        )
+        if index_exits:
+            exits = index.exits
+        if resolve_import_star:
+            exports = index.exports
+
+    if differential:
+        candidate = engine if engine != ENGINES[0] else ENGINES[1]
+        if not run_differential(
+            paths,
+            timeout=timeout,
+            workers=workers,
+            candidate=candidate,
+            exits=exits,
+            exports=exports,
+            parser=parser,
+        ):
+            sys.exit(1)
+        click.echo(f"✨ all engines agree!")
+        return
+
+    result_cache: Optional[ResultCache[Sequence[BaseWarning]]] = (
+        ResultCache(
+            cache_dir,
+            max_size=cache_max_size * 1024 * 1024,
+            # Results also depend on which functions elsewhere never return, but only
+            # those a file may call, so they're part of each file's key instead
+            options={"engine": engine},
+        )
+        # Profiles should include every file, not just those which weren't cached
+        if cache and profile_count is None and cprofile is None
+        else None
+    )
+    profile = Profile() if profile_count is not None else None
+    if cprofile is not None:
+        # Only the current process can be profiled
+        workers = 0
+
+    with cprofiled(cprofile):
+        success = run(
+            paths,
+            timeout=timeout,
+            allow_import_star=allow_import_star,
+            show_successes=show_successes,
+            cache=result_cache,
+            workers=workers,
+            engine=engine,
+            profile=profile,
+            reporter=FORMATS[output_format](
+                allow_import_star, show_successes, shard=shard_selection
+            ),
+            sort=sort,
+            max_warnings=1 if fail_fast else max_warnings,
+            history=FailureHistory(history_path) if history_path else None,
+            durations=Durations(durations_path) if durations_path else None,
+            max_tasks=max_tasks,
+            max_memory=megabytes(max_memory),
+            exits=exits,
+            exports=exports,
+            parser=parser,
+        )
+
+    if profile is not None and profile_count is not None:
+        for line in profile.format(profile_count):
+            # Keep machine-readable output on stdout parseable
+            click.echo(line, err=output_format != "text")
+
+    if not success:
+        sys.exit(1)
 
 
 def run(
@@ -109,59 +516,435 @@ def run(
     timeout: int,
     allow_import_star: bool,
     show_successes: bool,
+    cache: Optional[ResultCache[Sequence[BaseWarning]]] = None,
+    workers: Optional[int] = None,
+    engine: str = ENGINES[0],
+    profile: Optional[Profile] = None,
+    reporter: Optional[Reporter] = None,
+    sort: bool = False,
+    max_warnings: Optional[int] = None,
+    history: Optional[FailureHistory] = None,
+    durations: Optional[Durations] = None,
+    max_tasks: Optional[int] = None,
+    max_memory: Optional[int] = None,
+    exits: FrozenSet[str] = frozenset(),
+    exports: Optional[Mapping[str, Sequence[str]]] = None,
+    parser: str = PARSERS[0],
 ) -> bool:
     """
     Check all provided paths, using all available processors.
-    Echo warnings (and optionally successes) on stdout.
-    Return True if no files had any warnings.
+    'exits' are the qualified names of functions elsewhere which never return, and
+    'exports' the names each module exports, with which `import *` is resolved.
+    libCST parses files with 'parser' (see parsers.py).
+    Report warnings (and optionally successes) on stdout, as text unless another reporter
+    is provided. Return True if no files had any warnings.
+
+    Files with identical contents are only checked once. When a cache is provided,
+    files whose results are already cached are not checked at all. When a profile is
+    provided, the time spent in each phase of checking each file is added to it, along
+    with how busy the workers were.
+
+    Files which are expected to take longest are checked first, so that a slow file isn't
+    left until last: by default the largest, or when durations are given, those which took
+    longest in past runs. The durations are updated with the time each file took.
+
+    How busy the workers were is reported on stderr at the end of the run (unless every
+    file was cached, or it's added to the profile). Workers are replaced after 'max_tasks'
+    files, or once they use more than 'max_memory' bytes, and then the peak memory of each
+    worker is reported too.
+
+    Files are reported as they're done, unless sorting, when they're reported in the order
+    they were given. Then files are checked in windows of SORT_WINDOW files, so that at
+    most a window's results are held while waiting for those ahead of them.
+
+    When 'max_warnings' is given, checking stops as soon as that many failing warnings
+    have been found, abandoning outstanding work. When a history is given, the files which
+    failed most recently are checked first, and the history is updated with the results.
     """
+    if reporter is None:
+        reporter = TextReporter(allow_import_star, show_successes)
     success = True
+    found = 0
 
-    with ProcessPoolExecutor() as e:
-        futures = {e.submit(check_file, x, timeout_seconds=timeout): x for x in paths}
+    pool: WorkerPool[Job, JobResult] = WorkerPool(
+        partial(check_job, engine=engine, profile=profile is not None),
+        workers=workers,
+        timeout=timeout,
+        initializer=partial(
+            init_worker, engine=engine, exits=exits, exports=exports, parser=parser
+        ),
+        max_tasks=max_tasks,
+        max_memory=max_memory,
+    )
+    with pool:
         try:
-            for future in as_completed(futures.keys()):
-                infile = futures[future]
-                try:
-                    warnings = future.result()
-                except timeout_decorator.TimeoutError as e:
-                    click.echo(f"⏰ {infile}: Timed out")
-                except Exception:
-                    # Exit early if any files could not be processed
-                    for future in futures:
-                        future.cancel()
-                    traceback.print_exc(file=sys.stderr)
+            windows = _windows(paths, SORT_WINDOW) if sort else [paths]
+            for window in windows:
+                buffer: ReorderBuffer[
+                    Tuple[Union[str, Path], Outcome]
+                ] = ReorderBuffer()
+                outcomes = _outcomes(
+                    window, pool, cache, profile, history, durations, exits, exports
+                )
+                for index, path, outcome in outcomes:
+                    done = [(path, outcome)]
+                    if sort:
+                        done = buffer.add(index, (path, outcome))
+                    for infile, result in done:
+                        success &= reporter.report(infile, result)
+                        if result.error is not None:
+                            # Exit early if any files could not be processed
+                            return False
+                        if result.value is None:
+                            continue
+
+                        warnings = failures(result.value, allow_import_star)
+                        if history is not None:
+                            history.record(infile, failed=warnings > 0)
+                        found += warnings
+                        if max_warnings is not None and found >= max_warnings:
+                            # Outstanding work is abandoned when the pool is closed
+                            plural = "s" if found != 1 else ""
+                            click.echo(
+                                f"🛑 Stopped after {found} failing warning{plural}",
+                                err=True,
+                            )
+                            return False
+        except KeyboardInterrupt:
+            # Outstanding work is abandoned when the pool is closed
+            click.echo(f"🛑 Interrupted", err=True)
+            success = False
+        finally:
+            reporter.finish(success)
+            if cache:
+                cache.prune()
+            if history is not None:
+                history.save()
+            if durations is not None:
+                durations.save()
+            if profile is not None:
+                profile.pool = pool.stats
+            else:
+                if pool.stats.elapsed:
                     click.echo(
-                        f"\n❌ {infile}: Failed to process due to the above exception"
+                        f"⏱️  Worker utilization: {pool.stats.format()}", err=True
+                    )
+                if max_tasks is not None or max_memory is not None:
+                    click.echo(
+                        f"🧠 Peak memory per worker: {pool.stats.format_memory()}",
+                        err=True,
+                    )
+
+    return success
+
+
+def _outcomes(
+    paths: Iterable[Union[str, Path]],
+    pool: "WorkerPool[Job, JobResult]",
+    cache: Optional[ResultCache[Sequence[BaseWarning]]],
+    profile: Optional[Profile],
+    history: Optional[FailureHistory] = None,
+    durations: Optional[Durations] = None,
+    exits: FrozenSet[str] = frozenset(),
+    exports: Optional[Mapping[str, Sequence[str]]] = None,
+) -> Iterator[Tuple[int, Union[str, Path], "Outcome[Sequence[BaseWarning]]"]]:
+    """
+    Check files, generating the outcome for each, with its index in 'paths', as it's done.
+    Cached files are generated first, then those which are most likely to fail, and
+    otherwise those which are expected to take longest.
+    """
+    # Paths waiting on a result, grouped by the key of their contents
+    pending: Dict[str, List[Tuple[int, Union[str, Path]]]] = {}
+    jobs: List[Job] = []
+
+    for index, path in enumerate(paths):
+        content = Path(path).read_bytes()
+        if exports:
+            # Keyed on what's checked, which for `import *` depends on other files
+            content = expand_content(path, content, exports)
+        keyed = key_content(content, exits)
+        key = cache.key(keyed) if cache else hashlib.sha256(keyed).hexdigest()
+        if key in pending:
+            pending[key].append((index, path))
+            continue
+
+        cached = cache.get(key) if cache else None
+        if cached is not None:
+            yield index, path, Outcome(value=cached)
+            continue
+
+        pending[key] = [(index, path)]
+        jobs.append(Job(key=key, path=path, size=len(content)))
+
+    longest_first(jobs, durations.estimate if durations else None)
+    if history is not None:
+        score = history.score
+        jobs.sort(key=lambda job: -score(job.path))
+
+    for job, outcome in pool.imap(make_chunks(jobs, pool.workers)):
+        if durations is not None:
+            if outcome.duration is not None:
+                durations.record(job, outcome.duration)
+            elif outcome.timed_out and pool.timeout is not None:
+                # It took at least this long, so it should be started early next time
+                durations.record(job, pool.timeout)
+
+        result: Outcome[Sequence[BaseWarning]]
+        if outcome.value is not None:
+            warnings, timings = outcome.value
+            if profile is not None and timings is not None:
+                profile.add(str(job.path), timings)
+            if cache:
+                cache.set(job.key, warnings)
+            result = Outcome(value=warnings)
+        else:
+            result = Outcome(
+                timed_out=outcome.timed_out,
+                error=outcome.error,
+                too_large=outcome.too_large,
+            )
+        for index, path in pending[job.key]:
+            yield index, path, result
+
+
+def megabytes(value: Optional[int]) -> Optional[int]:
+    """ Convert an optional number of megabytes to bytes """
+    return None if value is None else value * 1024 * 1024
+
+
+def _size(path: Union[str, Path]) -> float:
+    """ Return the expected cost of checking a file, for balancing shards """
+    return Path(path).stat().st_size
+
+
+def _windows(
+    paths: Iterable[Union[str, Path]], size: int
+) -> Iterator[List[Union[str, Path]]]:
+    remaining = iter(paths)
+    while True:
+        window = list(itertools.islice(remaining, size))
+        if not window:
+            return
+        yield window
+
+
+def run_watch(
+    paths: Iterable[Union[str, Path]],
+    timeout: int,
+    allow_import_star: bool,
+    show_successes: bool,
+    include: Optional[re.Pattern],
+    excludes: List[re.Pattern],
+    workers: Optional[int] = None,
+    engine: str = ENGINES[0],
+    watcher: Optional[Watcher] = None,
+    debounce: float = DEBOUNCE,
+    max_tasks: Optional[int] = None,
+    max_memory: Optional[int] = None,
+    parser: str = PARSERS[0],
+    index_exits: bool = False,
+    resolve_import_star: bool = False,
+) -> None:
+    """
+    Check all provided paths, then re-check files as they change, until interrupted.
+
+    After the first check, only the warnings which have appeared or been fixed since a
+    file was last checked are echoed. Files are checked by the same pool throughout,
+    and only when their contents have changed.
+
+    With 'index_exits' or 'resolve_import_star', the files are indexed like a normal
+    run would, and the index is updated as they change. If it changes, the workers are
+    restarted with the new index, and every file is re-checked.
+    """
+    roots = list(paths)
+    files = list(find_files(roots, include, excludes))
+    if not files:
+        raise click.UsageError("No files specified")
+
+    indexer = (
+        ProjectIndexer(
+            workers=workers,
+            timeout=timeout,
+            exits=index_exits,
+            exports=resolve_import_star,
+        )
+        if index_exits or resolve_import_star
+        else None
+    )
+
+    def initializer() -> Callable[[], None]:
+        index = indexer.index if indexer is not None else ProjectIndex()
+        return partial(
+            init_worker,
+            engine=engine,
+            exits=index.exits,
+            exports=index.exports,
+            parser=parser,
+        )
+
+    if indexer is not None:
+        indexer.update(files)
+    pool: WorkerPool[Job, JobResult] = WorkerPool(
+        partial(check_job, engine=engine),
+        workers=workers,
+        timeout=timeout,
+        initializer=initializer(),
+        max_tasks=max_tasks,
+        max_memory=max_memory,
+    )
+    with ExitStack() as stack:
+        stack.enter_context(pool)
+        # Watch before the first check, so that changes made during it aren't missed
+        if watcher is None:
+            watcher = make_watcher(roots, include, excludes)
+        stack.enter_context(watcher)
+        checker = IncrementalChecker(
+            pool, indexer.index if indexer is not None else ProjectIndex()
+        )
+
+        # The warnings for each file which was checked successfully
+        results: Dict[Path, Sequence[BaseWarning]] = {}
+
+        def check_files(files: List[Path], initial: bool) -> None:
+            outcomes = checker.check(files)
+            for path in files:
+                outcome = outcomes[path]
+                before = results.pop(path, [])
+                if outcome.timed_out:
+                    click.echo(f"⏰ {path}: Timed out")
+                elif outcome.too_large:
+                    click.echo(f"🐘 {path}: {TOO_LARGE}")
+                elif outcome.value is None:
+                    click.echo(outcome.error, err=True)
+                    click.echo(
+                        f"\n❌ {path}: Failed to process due to the above exception"
                     )
-                    return False
                 else:
-                    for warning in warnings:
-                        # TODO: Maybe do this without isinstance
-                        if isinstance(warning, BaseRefWarning):
-                            success = False
-                            click.echo(f"⚠️  {infile}: {warning}")
-                        elif isinstance(warning, ImportStarWarning):
-                            emoji = "❔"
-                            if not allow_import_star:
-                                success = False
-                                emoji = "⚠️"
-                            click.echo(f"{emoji} {infile}: {warning}")
-                    if show_successes and not warnings:
-                        click.echo(f"✅ {infile}")
+                    results[path] = outcome.value
+                    if initial:
+                        report(path, outcome.value, allow_import_star, show_successes)
+                    else:
+                        report_changes(path, before, outcome.value, allow_import_star)
+
+            failing = sum(
+                fails(warnings, allow_import_star) for warnings in results.values()
+            )
+            summary = (
+                f"{failing} of {len(results)} files have warnings"
+                if failing
+                else "all good"
+            )
+            click.echo(f"👀 {summary}, watching for changes...")
+
+        try:
+            check_files(files, initial=True)
+            tracked = set(files)
+            while True:
+                changed = wait_for_changes(watcher, debounce)
+                removed = {x for x in changed if not x.is_file()}
+                # Including the files in any directory which was removed
+                removed |= {
+                    x
+                    for x in tracked
+                    if x in removed or not removed.isdisjoint(x.parents)
+                }
+                checker.forget(removed)
+                for path in removed:
+                    results.pop(path, None)
+                tracked = (tracked | changed) - removed
+
+                if indexer is not None and indexer.update(sorted(tracked)):
+                    # Any file's warnings may depend on what changed, though only
+                    # those which do are checked again
+                    pool.restart(initializer())
+                    checker.set_index(indexer.index)
+                    check_files(sorted(tracked), initial=False)
+                else:
+                    check_files(sorted(changed - removed), initial=False)
+        except KeyboardInterrupt:
+            click.echo(f"🛑 Stopped watching", err=True)
+
+
+def run_differential(
+    paths: Iterable[Union[str, Path]],
+    timeout: int,
+    workers: Optional[int] = None,
+    candidate: str = ENGINES[1],
+    exits: FrozenSet[str] = frozenset(),
+    exports: Optional[Mapping[str, Sequence[str]]] = None,
+    parser: str = PARSERS[0],
+) -> bool:
+    """
+    Check all provided paths with the reference engine and a candidate, and echo any
+    differences on stdout. Return True if the engines agreed on every file.
+    """
+    success = True
+
+    jobs = []
+    for path in paths:
+        jobs.append(Job(key=str(path), path=path, size=Path(path).stat().st_size))
+
+    pool: WorkerPool[Job, Optional[Divergence]] = WorkerPool(
+        partial(compare_job, candidate=candidate),
+        workers=workers,
+        timeout=timeout,
+        initializer=partial(init_worker, exits=exits, exports=exports, parser=parser),
+    )
+    with pool:
+        try:
+            for job, outcome in pool.imap(make_chunks(jobs, pool.workers)):
+                if outcome.timed_out:
+                    click.echo(f"⏰ {job.path}: Timed out")
+                elif outcome.error is not None:
+                    click.echo(outcome.error, err=True)
+                    click.echo(
+                        f"\n❌ {job.path}: Failed to process due to the above exception"
+                    )
+                    return False
+                elif outcome.value is not None:
+                    success = False
+                    click.echo(f"🔀 {job.path}: {outcome.value}")
         except KeyboardInterrupt:
-            # Without this, ctrl-c causes the process to hang waiting
-            # for all unscheduled tasks to complete.
-            for future in futures:
-                future.cancel()
             click.echo(f"🛑 Interrupted", err=True)
             return False
 
     return success
 
 
-def check_file(path: Union[str, Path], timeout_seconds: int = 5) -> List[BaseWarning]:
+def report_changes(
+    infile: Union[str, Path],
+    before: Sequence[BaseWarning],
+    after: Sequence[BaseWarning],
+    allow_import_star: bool,
+) -> None:
+    """ Echo the warnings for a file which have appeared or been fixed since it was last checked """
+    previous, current = set(before), set(after)
+    report(infile, [x for x in after if x not in previous], allow_import_star, False)
+    for warning in before:
+        if warning not in current:
+            click.echo(f"✅ {infile}: Fixed: {warning}")
+
+
+def check_job(job: Job, engine: str = ENGINES[0], profile: bool = False) -> JobResult:
+    """ Check the file for a job, in a worker, batching its warnings to send them back """
+    if not profile:
+        return WarningBatch(check_file(job.path, engine=engine)), None
+    with record() as timings:
+        warnings = check_file(job.path, engine=engine)
+    return WarningBatch(warnings), timings
+
+
+def compare_job(job: Job, candidate: str = ENGINES[1]) -> Optional[Divergence]:
+    """ Check the file for a job with the reference engine and a candidate, in a worker """
+    code = expand_import_star(Path(job.path).read_text(), job.path)
+    return compare_engines(code, candidate=candidate)
+
+
+def check_file(path: Union[str, Path], engine: str = ENGINES[0]) -> List[BaseWarning]:
     """ Read a file path and check it for errors """
 
-    text = Path(path).read_text()
-    return timeout_decorator.timeout(timeout_seconds)(check)(text)
+    with phase("read"):
+        text = Path(path).read_text()
+    # Only changes anything when the project's exports have been set, e.g. by init_worker
+    text = expand_import_star(text, path)
+    return check(text, engine=engine)
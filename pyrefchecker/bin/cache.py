@@ -0,0 +1,130 @@
+import hashlib
+import json
+import os
+import pickle
+import time
+from pathlib import Path
+from typing import Any, Generic, Mapping, Optional, TypeVar, Union
+
+from .. import __version__
+from .atomic import atomic_write
+
+_SUFFIX = ".pickle"
+
+# Temporary files older than this, in seconds, were left by writers which crashed
+STALE_TMP_AGE = 60 * 60
+
+V = TypeVar("V")
+
+
+class ResultCache(Generic[V]):
+    """
+    A persistent, content-addressed cache of check results (or of anything else which
+    is worked out from a file's contents, such as the summary of a module).
+
+    Entries are keyed on a hash of the file contents, the pyrefchecker version and
+    any options which affect the results of a check. Writes are atomic, so several
+    processes may share a cache directory. The least recently used entries are
+    evicted once the cache grows beyond 'max_size' bytes.
+
+    The directory ignores itself in git, as it's usually created in a working tree.
+    """
+
+    def __init__(
+        self,
+        directory: Union[str, Path],
+        max_size: int,
+        options: Optional[Mapping[str, Any]] = None,
+    ):
+        self.directory = Path(directory)
+        self.max_size = max_size
+        self._namespace = hashlib.sha256(
+            json.dumps(
+                {"version": __version__, "options": dict(options or {})},
+                sort_keys=True,
+            ).encode()
+        ).digest()
+
+    def key(self, content: bytes) -> str:
+        """ Return the cache key for some file contents """
+        h = hashlib.sha256(self._namespace)
+        h.update(content)
+        return h.hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.directory / key[:2] / (key[2:] + _SUFFIX)
+
+    def get(self, key: str) -> Optional[V]:
+        """ Return the cached warnings for a key, or None on a cache miss """
+        path = self._path(key)
+        try:
+            with path.open("rb") as f:
+                warnings = pickle.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception:
+            # A corrupt or incompatible entry is treated as a miss
+            self._unlink(path)
+            return None
+
+        try:
+            # Mark the entry as recently used
+            os.utime(path)
+        except OSError:
+            pass
+        return warnings
+
+    def set(self, key: str, warnings: V) -> None:
+        """ Atomically store the warnings for a key """
+        path = self._path(key)
+        if not path.parent.is_dir():
+            path.parent.mkdir(parents=True, exist_ok=True)
+            self._ignore()
+
+        atomic_write(path, pickle.dumps(warnings, protocol=pickle.HIGHEST_PROTOCOL))
+
+    def _ignore(self) -> None:
+        """ Stop git from showing the cache as untracked """
+        gitignore = self.directory / ".gitignore"
+        if not gitignore.exists():
+            try:
+                gitignore.write_text("*\n")
+            except OSError:
+                pass
+
+    def prune(self) -> None:
+        """
+        Evict the least recently used entries until the cache fits in 'max_size', and
+        delete temporary files left by writers which crashed.
+        """
+        stale = time.time() - STALE_TMP_AGE
+        for path in self.directory.glob("*/*.tmp"):
+            try:
+                if path.stat().st_mtime < stale:
+                    path.unlink()
+            except OSError:
+                pass
+
+        entries = []
+        total = 0
+        for path in self.directory.glob(f"*/*{_SUFFIX}"):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+            total += stat.st_size
+
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.max_size:
+                break
+            self._unlink(path)
+            total -= size
+
+    @staticmethod
+    def _unlink(path: Path) -> None:
+        try:
+            path.unlink()
+        except OSError:
+            pass
@@ -0,0 +1,32 @@
+"""
+The entry point of the command line, which dispatches 'pyrefchecker daemon ...' to the
+daemon's commands, 'pyrefchecker lsp' to the language server, 'pyrefchecker merge' to
+merging shards, and everything else to a normal run.
+
+Only what's needed for the command is imported, so that the daemon client starts quickly.
+"""
+
+import sys
+
+
+def main() -> None:
+    if sys.argv[1:2] == ["daemon"]:
+        from .daemon import daemon
+
+        daemon(args=sys.argv[2:], prog_name="pyrefchecker daemon")
+    elif sys.argv[1:2] == ["lsp"]:
+        from .lsp import lsp
+
+        lsp(args=sys.argv[2:], prog_name="pyrefchecker lsp")
+    elif sys.argv[1:2] == ["merge"]:
+        from .merge import merge
+
+        merge(args=sys.argv[2:], prog_name="pyrefchecker merge")
+    else:
+        from .bin import main as check
+
+        check()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,246 @@
+"""
+A resident daemon, which keeps warm workers and the results for each file in memory.
+
+The client only imports what it needs to talk to the daemon over a Unix socket, so it
+starts much faster than a cold run, which has to import libCST and start its workers.
+Requests and responses are sent as lines of JSON.
+"""
+
+import json
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import click
+
+DEFAULT_SOCKET = ".pyrefchecker_daemon.sock"
+
+# How long 'start' waits for the daemon to accept connections, in seconds
+START_TIMEOUT = 30
+
+
+class DaemonNotRunning(Exception):
+    """ Raised when there is no daemon listening on a socket """
+
+
+def send(sock: socket.socket, message: Dict[str, Any]) -> None:
+    sock.sendall(json.dumps(message).encode() + b"\n")
+
+
+def request(socket_path: str, message: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+    """ Send a request to the daemon, and generate the messages it responds with """
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        try:
+            sock.connect(socket_path)
+        except (FileNotFoundError, ConnectionRefusedError) as e:
+            raise DaemonNotRunning(
+                f"No daemon is listening on {socket_path} ({e.strerror})"
+            ) from e
+        send(sock, message)
+        with sock.makefile("r", encoding="utf-8") as lines:
+            for line in lines:
+                yield json.loads(line)
+
+
+def status(socket_path: str) -> Optional[Dict[str, Any]]:
+    """ Return the status of the daemon, or None if it isn't running """
+    try:
+        for response in request(socket_path, {"command": "status"}):
+            return response
+    except (DaemonNotRunning, OSError):
+        pass
+    return None
+
+
+@click.group()
+def daemon() -> None:
+    """
+    Manage a resident daemon, which keeps warm workers and results in memory,
+    so that checking a few changed files is fast.
+
+    Example:
+
+        pyrefchecker daemon start
+
+        pyrefchecker daemon check changed.py
+
+    """
+
+
+def _socket_option(func: Any) -> Any:
+    return click.option(
+        "--socket",
+        "socket_path",
+        type=click.Path(dir_okay=False),
+        default=DEFAULT_SOCKET,
+        help="Unix socket which the daemon listens on",
+        show_default=True,
+    )(func)
+
+
+def _server_options(func: Any) -> Any:
+    # Unset options are read from pyproject.toml by the daemon, as for a normal run
+    for option in reversed(
+        [
+            click.option("--engine", default=None, help="Engine to analyse files with"),
+            click.option(
+                "--timeout",
+                type=int,
+                default=None,
+                help="Maximum processing time for a single file, in seconds",
+            ),
+            click.option(
+                "--workers",
+                type=click.IntRange(min=0),
+                default=None,
+                help="Number of worker processes",
+            ),
+        ]
+    ):
+        func = option(func)
+    return func
+
+
+def _server_args(options: Dict[str, Any]) -> List[str]:
+    args = []
+    for name, value in options.items():
+        if value is not None:
+            args += [f"--{name}", str(value)]
+    return args
+
+
+@daemon.command()
+@_socket_option
+@_server_options
+def start(
+    socket_path: str,
+    engine: Optional[str],
+    timeout: Optional[int],
+    workers: Optional[int],
+) -> None:
+    """ Start a daemon in the background """
+    if status(socket_path) is not None:
+        raise click.ClickException(f"A daemon is already listening on {socket_path}")
+
+    log_path = f"{socket_path}.log"
+    args = _server_args({"engine": engine, "timeout": timeout, "workers": workers})
+    with open(log_path, "ab") as log:
+        process = subprocess.Popen(
+            [
+                sys.executable,
+                "-m",
+                "pyrefchecker.bin.cli",
+                "daemon",
+                "serve",
+                "--socket",
+                socket_path,
+                *args,
+            ],
+            stdin=subprocess.DEVNULL,
+            stdout=log,
+            stderr=log,
+            start_new_session=True,
+        )
+
+    deadline = time.monotonic() + START_TIMEOUT
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise click.ClickException(
+                f"The daemon exited with code {process.returncode}, see {log_path}"
+            )
+        if status(socket_path) is not None:
+            click.echo(f"🚀 daemon started (pid {process.pid})")
+            return
+        time.sleep(0.05)
+    raise click.ClickException(f"The daemon didn't start in time, see {log_path}")
+
+
+@daemon.command()
+@_socket_option
+@_server_options
+def serve(
+    socket_path: str,
+    engine: Optional[str],
+    timeout: Optional[int],
+    workers: Optional[int],
+) -> None:
+    """ Run a daemon in the foreground """
+    # The server needs everything the client doesn't, so it's only imported here
+    from .daemon_server import DaemonServer
+
+    # Exit cleanly when stopped by a signal, so that the socket is removed
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    DaemonServer(socket_path, engine=engine, timeout=timeout, workers=workers).serve()
+
+
+@daemon.command()
+@_socket_option
+def stop(socket_path: str) -> None:
+    """ Stop the daemon """
+    try:
+        for _ in request(socket_path, {"command": "stop"}):
+            pass
+    except DaemonNotRunning as e:
+        raise click.ClickException(str(e))
+    click.echo(f"🛑 daemon stopped")
+
+
+@daemon.command(name="status")
+@_socket_option
+def show_status(socket_path: str) -> None:
+    """ Show whether the daemon is running, and what it has cached """
+    response = status(socket_path)
+    if response is None:
+        raise click.ClickException(f"No daemon is listening on {socket_path}")
+    click.echo(
+        "✨ daemon running (pid {pid}, engine {engine}, {workers} workers): "
+        "{files} files known, {checked} checked since it started".format(**response)
+    )
+
+
+@daemon.command()
+@click.argument(
+    "paths",
+    type=click.Path(exists=True, readable=True, file_okay=True, dir_okay=True),
+    nargs=-1,
+)
+@_socket_option
+@click.option(
+    "--show-successes/--hide-successes",
+    default=None,
+    help="When set, show checks for good files",
+)
+@click.option(
+    "--allow-import-star/--disallow-import-star",
+    default=None,
+    help="Whether or not to consider `import *` a failure",
+)
+def check(
+    paths: Tuple[str, ...],
+    socket_path: str,
+    show_successes: Optional[bool],
+    allow_import_star: Optional[bool],
+) -> None:
+    """ Check files with the daemon, which only re-checks files that have changed """
+    message = {
+        "command": "check",
+        "cwd": os.getcwd(),
+        "paths": list(paths),
+        "show_successes": show_successes,
+        "allow_import_star": allow_import_star,
+    }
+    try:
+        for response in request(socket_path, message):
+            if "out" in response:
+                click.echo(response["out"])
+            elif "err" in response:
+                click.echo(response["err"], err=True)
+            elif "exit" in response:
+                sys.exit(response["exit"])
+    except DaemonNotRunning as e:
+        raise click.ClickException(f"{e}, start one with 'pyrefchecker daemon start'")
+    raise click.ClickException("The daemon closed the connection unexpectedly")
@@ -0,0 +1,190 @@
+"""
+The daemon itself, which checks files for clients with a warm pool of workers.
+"""
+
+import json
+import os
+import re
+import socket
+import traceback
+from functools import partial
+from typing import Any, Callable, Dict, Optional
+
+import click
+
+from .. import ENGINES
+from ..pool import WorkerPool
+from .bin import DEFAULT_EXCLUDE, check_job, init_worker, megabytes
+from .daemon import send
+from .find_files import find_files
+from .formats import TOO_LARGE, report
+from .incremental import IncrementalChecker
+from .project_index import ProjectIndex, ProjectIndexer
+from .pyproject_toml import defaults
+from .scheduling import Job, JobResult
+
+
+class DaemonServer:
+    """
+    Serves requests from clients one at a time, checking files with a long-lived pool
+    and remembering their results.
+    """
+
+    def __init__(
+        self,
+        socket_path: str,
+        engine: Optional[str] = None,
+        timeout: Optional[int] = None,
+        workers: Optional[int] = None,
+    ):
+        self.socket_path = socket_path
+        self.engine = engine or defaults.get("engine", ENGINES[0])
+        if self.engine not in ENGINES:
+            raise click.BadParameter(f"Unknown engine: {self.engine!r}")
+
+        include = defaults.get("include", r"\.pyi?$")
+        excludes = [
+            defaults.get("exclude", DEFAULT_EXCLUDE),
+            *defaults.get("extra_excludes", []),
+        ]
+        self.include = re.compile(include) if include else None
+        self.excludes = [re.compile(x) for x in excludes if x]
+
+        workers = defaults.get("workers", None) if workers is None else workers
+        timeout = defaults.get("timeout", 5) if timeout is None else timeout
+        # Files are checked with the same index as a normal run, kept up to date
+        # between requests
+        index_exits = defaults.get("index_exits", True)
+        resolve_import_star = defaults.get("resolve_import_star", True)
+        self.indexer = (
+            ProjectIndexer(
+                workers=workers,
+                timeout=timeout,
+                exits=index_exits,
+                exports=resolve_import_star,
+            )
+            if index_exits or resolve_import_star
+            else None
+        )
+
+        self.pool: WorkerPool[Job, JobResult] = WorkerPool(
+            partial(check_job, engine=self.engine),
+            workers=workers,
+            timeout=timeout,
+            initializer=self._initializer(),
+            max_tasks=defaults.get("max_tasks_per_worker", None),
+            max_memory=megabytes(defaults.get("max_worker_memory", None)),
+        )
+
+        self.checker = IncrementalChecker(self.pool, self._index())
+        self._stopping = False
+
+    def _index(self) -> ProjectIndex:
+        return self.indexer.index if self.indexer is not None else ProjectIndex()
+
+    def _initializer(self) -> Callable[[], None]:
+        """ Return the initializer for workers, with the current index """
+        index = self._index()
+        return partial(
+            init_worker, engine=self.engine, exits=index.exits, exports=index.exports
+        )
+
+    def serve(self) -> None:
+        """ Listen for requests until asked to stop """
+        listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        if os.path.exists(self.socket_path):
+            # Left behind by a daemon which didn't exit cleanly
+            os.unlink(self.socket_path)
+        listener.bind(self.socket_path)
+
+        try:
+            with self.pool:
+                # Start the workers now, so the first request doesn't wait for them
+                for _ in self.pool.imap([]):
+                    pass
+                listener.listen()
+                while not self._stopping:
+                    conn, _ = listener.accept()
+                    with conn:
+                        self.handle(conn)
+        finally:
+            listener.close()
+            os.unlink(self.socket_path)
+
+    def handle(self, conn: socket.socket) -> None:
+        with conn.makefile("r", encoding="utf-8") as lines:
+            line = lines.readline()
+        try:
+            message: Dict[str, Any] = json.loads(line)
+            command = message["command"]
+            if command == "check":
+                code = self.check(conn, message)
+                send(conn, {"exit": code})
+            elif command == "status":
+                send(conn, self.status())
+            elif command == "stop":
+                self._stopping = True
+                send(conn, {"exit": 0})
+            else:
+                send(conn, {"err": f"Error: Unknown command: {command!r}"})
+                send(conn, {"exit": 2})
+        except BrokenPipeError:
+            # The client went away, e.g. it was interrupted
+            pass
+        except Exception:
+            send(conn, {"err": traceback.format_exc()})
+            send(conn, {"exit": 2})
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "pid": os.getpid(),
+            "engine": self.engine,
+            "workers": self.pool.workers,
+            "files": len(self.checker.files),
+            "checked": self.checker.checked,
+        }
+
+    def check(self, conn: socket.socket, message: Dict[str, Any]) -> int:
+        """ Check the files for a request, echo their warnings, and return an exit code """
+        show_successes = message["show_successes"]
+        if show_successes is None:
+            show_successes = defaults.get("show_successes", False)
+        allow_import_star = message["allow_import_star"]
+        if allow_import_star is None:
+            allow_import_star = defaults.get("allow_import_star", True)
+
+        # Files are found and reported exactly as they would be by a normal run
+        os.chdir(message["cwd"])
+        paths = list(find_files(message["paths"] or ["."], self.include, self.excludes))
+        if not paths:
+            send(conn, {"err": "Error: No files specified"})
+            return 2
+        if self.indexer is not None and self.indexer.update(paths):
+            # Any file's warnings may depend on what changed, though only those which
+            # do are checked again
+            self.pool.restart(self._initializer())
+            self.checker.set_index(self._index())
+        outcomes = self.checker.check(paths)
+
+        def echo(line: str) -> None:
+            send(conn, {"out": line})
+
+        success = True
+        for path in paths:
+            outcome = outcomes[path]
+            if outcome.timed_out:
+                echo(f"⏰ {path}: Timed out")
+            elif outcome.too_large:
+                echo(f"🐘 {path}: {TOO_LARGE}")
+            elif outcome.value is None:
+                send(conn, {"err": outcome.error})
+                echo(f"\n❌ {path}: Failed to process due to the above exception")
+                return 1
+            else:
+                success &= report(
+                    path, outcome.value, allow_import_star, show_successes, echo=echo
+                )
+
+        if success:
+            echo(f"✨ all good!")
+        return 0 if success else 1
@@ -1,30 +1,145 @@
+import os
 import re
 from pathlib import Path
-from typing import Collection, Iterable, Optional, Set, Union
+from typing import Collection, Iterable, Iterator, List, Optional, Set, Union
+
+
+class PathMatcher:
+    """
+    Matches paths against an include regex and any number of exclude regexes.
+
+    The exclude regexes are combined into a single regex, so that each path is only
+    searched once.
+    """
+
+    def __init__(
+        self,
+        include: Optional[re.Pattern],
+        excludes: Optional[Collection[re.Pattern]],
+    ):
+        self.include = include
+        self._excludes = list(excludes or [])
+        self._exclude = _combine(self._excludes)
+
+    def is_excluded(self, path: str) -> bool:
+        """ Return true if a path (file or directory) matches any of the excludes """
+        if self._exclude is not None:
+            return self._exclude.search(path) is not None
+        return any(x.search(path) for x in self._excludes)
+
+    def is_included(self, path: str) -> bool:
+        """ Return true if a file found by searching a directory should be checked """
+        return (not self.include or self.include.search(path) is not None) and (
+            not self.is_excluded(path)
+        )
+
+
+def _combine(patterns: List[re.Pattern]) -> Optional[re.Pattern]:
+    """ Combine regexes into one which matches if any of them match, if possible """
+    if not patterns:
+        return None
+    if len(patterns) == 1:
+        return patterns[0]
+    if len({x.flags for x in patterns}) != 1:
+        return None
+    try:
+        return re.compile(
+            "|".join(f"(?:{x.pattern})" for x in patterns), patterns[0].flags
+        )
+    except re.error:
+        # e.g. inline global flags, which are only allowed at the start of a regex
+        return None
 
 
 def find_files(
     paths: Iterable[Union[str, Path]],
     include: Optional[re.Pattern],
     excludes: Optional[Collection[re.Pattern]],
-) -> Set[Path]:
+) -> Iterator[Path]:
     """
     Recurse any directories specified in 'paths', and include any files specified.
 
     For recursive searches, only include paths which match 'include'.
-    For all paths, exclude any which match 'exclude'.
+    For all paths, exclude any which match 'exclude'. Excluded directories are not searched.
+
+    Files are generated in a deterministic order, as they are found.
+    """
+    matcher = PathMatcher(include, excludes)
+    seen: Set[Path] = set()
+
+    for path in paths:
+        p = Path(path)
+        if p.is_dir():
+            found: Iterable[Path] = _walk(p, matcher)
+        elif p.is_file() and not matcher.is_excluded(str(p)):
+            found = [p]
+        else:
+            continue
+
+        for x in found:
+            if x not in seen:
+                seen.add(x)
+                yield x
+
+
+def _walk(root: Path, matcher: PathMatcher) -> Iterator[Path]:
+    """ Walk a directory tree depth-first, without descending into excluded directories """
+    stack = [str(root)]
+
+    while stack:
+        directory = stack.pop()
+        try:
+            with os.scandir(directory) as it:
+                entries = sorted(it, key=lambda x: x.name)
+        except OSError:
+            continue
+
+        subdirectories = []
+        for entry in entries:
+            # Keep paths in the same form as pathlib would, i.e. without a leading './'
+            path = entry.name if directory == "." else entry.path
+            if entry.is_dir(follow_symlinks=False):
+                if not matcher.is_excluded(path):
+                    subdirectories.append(path)
+            elif entry.is_file() and matcher.is_included(path):
+                yield Path(path)
+
+        stack.extend(reversed(subdirectories))
+
+
+def select_files(
+    candidates: Iterable[Path],
+    paths: Iterable[Union[str, Path]],
+    include: Optional[re.Pattern],
+    excludes: Optional[Collection[re.Pattern]],
+) -> Set[Path]:
+    """
+    Select the files from 'candidates' which 'find_files' would find in 'paths',
+    without searching any directories.
+
+    Candidates must be absolute paths.
     """
+    matcher = PathMatcher(include, excludes)
+    resolved = {x.resolve() for x in candidates if x.is_file()}
     final_paths: Set[Path] = set()
 
     for path in paths:
         p = Path(path)
+        root = p.resolve()
         if p.is_dir():
-            final_paths.update(
-                x for x in p.glob("**/*") if (not include or include.search(str(x)))
-            )
-        elif p.is_file():
-            final_paths.add(Path(p))
-
-    for exclude in excludes or []:
-        final_paths = {x for x in final_paths if not exclude.search(str(x))}
+            for candidate in resolved:
+                try:
+                    relative = candidate.relative_to(root)
+                except ValueError:
+                    continue
+                x = p / relative
+                # Files in excluded directories would not have been found
+                if matcher.is_included(str(x)) and not any(
+                    matcher.is_excluded(str(parent))
+                    for parent in list(x.parents)[: len(relative.parts) - 1]
+                ):
+                    final_paths.add(x)
+        elif root in resolved and not matcher.is_excluded(str(p)):
+            final_paths.add(p)
+
     return final_paths
@@ -0,0 +1,400 @@
+"""
+Output formats for the results of a run: text for people, and JSON Lines or SARIF for tools.
+
+Text is written in blocks rather than a line at a time, and flushed when a file is
+reported at least FLUSH_INTERVAL after the last flush, and at the end of the run. JSON
+Lines records are flushed as soon as each file is done, so that tools reading them as
+they stream see each result as soon as it's found.
+"""
+
+import dataclasses
+import json
+import sys
+import time
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Generic,
+    List,
+    Optional,
+    Sequence,
+    TextIO,
+    Type,
+    TypeVar,
+    Union,
+    cast,
+)
+
+import click
+
+from .. import (
+    BaseRefWarning,
+    BaseWarning,
+    ImportStarWarning,
+    NoLocationRefWarning,
+    RefWarning,
+    __version__,
+)
+from ..batch import WarningBatch
+from ..pool import Outcome
+from .scheduling import ShardSelection
+
+T = TypeVar("T")
+
+# Buffered output is flushed at least this often, in seconds
+FLUSH_INTERVAL = 0.1
+
+SARIF_SCHEMA = "https://json.schemastore.org/sarif-2.1.0.json"
+
+TOO_LARGE = "Too large to check within the memory limit"
+
+
+def failures(warnings: Sequence[BaseWarning], allow_import_star: bool) -> int:
+    """ Return the number of warnings which fail the check """
+    if isinstance(warnings, WarningBatch):
+        return warnings.failures(allow_import_star)
+    return sum(
+        isinstance(x, BaseRefWarning)
+        or (isinstance(x, ImportStarWarning) and not allow_import_star)
+        for x in warnings
+    )
+
+
+def fails(warnings: Sequence[BaseWarning], allow_import_star: bool) -> bool:
+    """ Return True if a file with these warnings fails the check """
+    return failures(warnings, allow_import_star) > 0
+
+
+def report(
+    infile: Union[str, Path],
+    warnings: Sequence[BaseWarning],
+    allow_import_star: bool,
+    show_successes: bool,
+    echo: Callable[[str], None] = click.echo,
+) -> bool:
+    """
+    Echo the warnings for a file (and optionally its success) on stdout.
+    Return True if the file had no failing warnings.
+    """
+    success = True
+    for warning in warnings:
+        # TODO: Maybe do this without isinstance
+        if isinstance(warning, BaseRefWarning):
+            success = False
+            echo(f"⚠️  {infile}: {warning}")
+        elif isinstance(warning, ImportStarWarning):
+            emoji = "❔"
+            if not allow_import_star:
+                success = False
+                emoji = "⚠️"
+            echo(f"{emoji} {infile}: {warning}")
+    if show_successes and not warnings:
+        echo(f"✅ {infile}")
+    return success
+
+
+class Reporter(ABC):
+    """
+    Writes the outcome of checking each file, and a summary once every file is done.
+    When checking one shard of a run, 'shard' describes which files it selected.
+    """
+
+    def __init__(
+        self,
+        allow_import_star: bool,
+        show_successes: bool,
+        stream: Optional[TextIO] = None,
+        shard: Optional[ShardSelection] = None,
+    ):
+        self.allow_import_star = allow_import_star
+        self.show_successes = show_successes
+        self.stream = sys.stdout if stream is None else stream
+        self.shard = shard
+        self._buffer: List[str] = []
+        self._flushed = time.monotonic()
+
+    def write(self, text: str) -> None:
+        self._buffer.append(text)
+        if time.monotonic() - self._flushed >= FLUSH_INTERVAL:
+            self.flush()
+
+    def flush(self) -> None:
+        self.stream.write("".join(self._buffer))
+        self.stream.flush()
+        self._buffer = []
+        self._flushed = time.monotonic()
+
+    @abstractmethod
+    def report(
+        self, path: Union[str, Path], outcome: "Outcome[Sequence[BaseWarning]]"
+    ) -> bool:
+        """ Write the outcome for a file, and return False if it failed the check """
+
+    def finish(self, success: bool) -> None:
+        """ Write anything which is only known once every file is done, and flush """
+        self.flush()
+
+
+class TextReporter(Reporter):
+    """ Lines of text for each warning, as people read them """
+
+    def report(
+        self, path: Union[str, Path], outcome: "Outcome[Sequence[BaseWarning]]"
+    ) -> bool:
+        if outcome.timed_out:
+            self.write(f"⏰ {path}: Timed out\n")
+            return True
+        if outcome.too_large:
+            self.write(f"🐘 {path}: {TOO_LARGE}\n")
+            return True
+        if outcome.value is None:
+            self.flush()
+            click.echo(outcome.error, err=True)
+            self.write(f"\n❌ {path}: Failed to process due to the above exception\n")
+            return False
+        return report(
+            path,
+            outcome.value,
+            self.allow_import_star,
+            self.show_successes,
+            echo=lambda line: self.write(line + "\n"),
+        )
+
+    def finish(self, success: bool) -> None:
+        if success:
+            self.write(f"✨ all good!\n")
+        self.flush()
+
+
+class JsonLinesReporter(Reporter):
+    """
+    A JSON object for each file with warnings (or for every file, when showing successes),
+    written as soon as the file is done.
+
+    When checking a shard, a summary of the shard is written last, so that shards which
+    didn't finish can be told apart when merging them.
+    """
+
+    def __init__(
+        self,
+        allow_import_star: bool,
+        show_successes: bool,
+        stream: Optional[TextIO] = None,
+        shard: Optional[ShardSelection] = None,
+    ):
+        super().__init__(allow_import_star, show_successes, stream, shard)
+        self.files = 0
+
+    def report(
+        self, path: Union[str, Path], outcome: "Outcome[Sequence[BaseWarning]]"
+    ) -> bool:
+        self.files += 1
+        record: Dict[str, Any] = {"path": str(path)}
+        failed = False
+        if outcome.timed_out:
+            record["status"] = "timed_out"
+        elif outcome.too_large:
+            record["status"] = "too_large"
+        elif outcome.value is None:
+            record["status"] = "error"
+            record["error"] = outcome.error
+            failed = True
+        elif outcome.value or self.show_successes:
+            record["status"] = "warnings" if outcome.value else "ok"
+            record["warnings"] = [warning_to_json(x) for x in outcome.value]
+            failed = fails(outcome.value, self.allow_import_star)
+        else:
+            return True
+        record["failed"] = failed
+        self.write(json.dumps(record) + "\n")
+        self.flush()
+        return not failed
+
+    def finish(self, success: bool) -> None:
+        if self.shard is not None:
+            summary = {
+                "shard": self.shard.index,
+                "shards": self.shard.count,
+                "files": self.files,
+                "selected": self.shard.files,
+                "total": self.shard.total,
+                "fingerprint": self.shard.fingerprint,
+                "total_fingerprint": self.shard.total_fingerprint,
+                "failed": not success,
+            }
+            self.write(json.dumps(summary) + "\n")
+        self.flush()
+
+
+WARNING_TYPES: Dict[str, Type[BaseWarning]] = {
+    x.__name__: x for x in [RefWarning, NoLocationRefWarning, ImportStarWarning]
+}
+
+
+def warning_to_json(warning: BaseWarning) -> Dict[str, Any]:
+    # Every warning is a dataclass
+    fields = dataclasses.asdict(cast(Any, warning))
+    return {"type": type(warning).__name__, **fields, "message": str(warning)}
+
+
+def warning_from_json(data: Dict[str, Any]) -> BaseWarning:
+    """ Convert the JSON for a warning back into the warning """
+    cls = WARNING_TYPES[data["type"]]
+    names = {x.name for x in dataclasses.fields(cast(Any, cls))}
+    return cls(**{k: v for k, v in data.items() if k in names})
+
+
+class SarifReporter(Reporter):
+    """
+    A SARIF log, e.g. for code scanning services.
+
+    A log is a single document, so it's only written once every file is done. Timeouts
+    and errors are reported as notifications about the run.
+    """
+
+    def __init__(
+        self,
+        allow_import_star: bool,
+        show_successes: bool,
+        stream: Optional[TextIO] = None,
+        shard: Optional[ShardSelection] = None,
+    ):
+        super().__init__(allow_import_star, show_successes, stream, shard)
+        self.results: List[Dict[str, Any]] = []
+        self.notifications: List[Dict[str, Any]] = []
+
+    def report(
+        self, path: Union[str, Path], outcome: "Outcome[Sequence[BaseWarning]]"
+    ) -> bool:
+        uri = Path(path).as_posix()
+        if outcome.timed_out:
+            self.notifications.append(_notification("warning", "Timed out", uri))
+            return True
+        if outcome.too_large:
+            self.notifications.append(_notification("warning", TOO_LARGE, uri))
+            return True
+        if outcome.value is None:
+            self.notifications.append(
+                _notification("error", f"Failed to process: {outcome.error}", uri)
+            )
+            return False
+
+        for warning in outcome.value:
+            if isinstance(warning, BaseRefWarning):
+                rule, level = "undefined-reference", "error"
+            elif isinstance(warning, ImportStarWarning):
+                rule = "import-star"
+                level = "note" if self.allow_import_star else "error"
+            else:
+                continue
+            location: Dict[str, Any] = {"artifactLocation": {"uri": uri}}
+            if isinstance(warning, RefWarning):
+                location["region"] = {
+                    "startLine": warning.line,
+                    "startColumn": warning.column + 1,
+                    "endColumn": warning.column + 1 + len(warning.reference),
+                }
+            self.results.append(
+                {
+                    "ruleId": rule,
+                    "level": level,
+                    "message": {"text": _message(warning)},
+                    "locations": [{"physicalLocation": location}],
+                }
+            )
+        return not fails(outcome.value, self.allow_import_star)
+
+    def finish(self, success: bool) -> None:
+        run: Dict[str, Any] = {}
+        if self.shard is not None:
+            # Identifies the run, so that code scanning services keep shards apart
+            index, count = self.shard.index, self.shard.count
+            run["automationDetails"] = {"id": f"pyrefchecker/shard-{index}-of-{count}/"}
+        log = {
+            "$schema": SARIF_SCHEMA,
+            "version": "2.1.0",
+            "runs": [
+                {
+                    **run,
+                    "tool": {
+                        "driver": {
+                            "name": "pyrefchecker",
+                            "version": __version__,
+                            "informationUri": "https://github.com/brexhq/pyrefchecker",
+                            "rules": [
+                                {
+                                    "id": "undefined-reference",
+                                    "shortDescription": {
+                                        "text": "Reference to a potentially undefined name"
+                                    },
+                                },
+                                {
+                                    "id": "import-star",
+                                    "shortDescription": {
+                                        "text": "File can't be checked due to import *"
+                                    },
+                                },
+                            ],
+                        }
+                    },
+                    "invocations": [
+                        {
+                            "executionSuccessful": not any(
+                                x["level"] == "error" for x in self.notifications
+                            ),
+                            "toolExecutionNotifications": self.notifications,
+                        }
+                    ],
+                    "results": self.results,
+                }
+            ],
+        }
+        self.write(json.dumps(log, indent=2) + "\n")
+        self.flush()
+
+
+def _message(warning: BaseWarning) -> str:
+    if isinstance(warning, (RefWarning, NoLocationRefWarning)):
+        return f"Reference to potentially undefined `{warning.reference}`"
+    return str(warning)
+
+
+def _notification(level: str, text: str, uri: str) -> Dict[str, Any]:
+    return {
+        "level": level,
+        "message": {"text": text},
+        "locations": [{"physicalLocation": {"artifactLocation": {"uri": uri}}}],
+    }
+
+
+FORMATS: Dict[str, Type[Reporter]] = {
+    "text": TextReporter,
+    "jsonl": JsonLinesReporter,
+    "sarif": SarifReporter,
+}
+
+
+class ReorderBuffer(Generic[T]):
+    """
+    Releases items in order of their indices (counting from 0), holding any which
+    arrive before those ahead of them.
+    """
+
+    def __init__(self) -> None:
+        self.next = 0
+        self._held: Dict[int, T] = {}
+
+    def __len__(self) -> int:
+        return len(self._held)
+
+    def add(self, index: int, item: T) -> List[T]:
+        """ Add an item, and return any items which are now ready, in order """
+        self._held[index] = item
+        ready = []
+        while self.next in self._held:
+            ready.append(self._held.pop(self.next))
+            self.next += 1
+        return ready
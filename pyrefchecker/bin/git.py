@@ -0,0 +1,46 @@
+import subprocess
+from pathlib import Path
+from typing import List, Set
+
+
+class GitError(Exception):
+    """ Raised when git could not be queried """
+
+
+def _git(*args: str) -> str:
+    try:
+        proc = subprocess.run(
+            ["git", *args],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            universal_newlines=True,
+        )
+    except OSError as e:
+        raise GitError(f"Unable to run git: {e}") from e
+
+    if proc.returncode != 0:
+        raise GitError(f"git {' '.join(args)} failed: {proc.stderr.strip()}")
+    return proc.stdout
+
+
+def _split(output: str) -> List[str]:
+    return [x for x in output.split("\0") if x]
+
+
+def changed_files(ref: str) -> Set[Path]:
+    """
+    Return the absolute paths of all files which differ from 'ref'.
+
+    This includes committed, staged and unstaged changes, as well as untracked files
+    (which are not ignored). Deleted files are not included.
+    """
+    root = Path(_git("rev-parse", "--show-toplevel").strip())
+
+    changed = _split(
+        _git("-C", str(root), "diff", "--name-only", "--diff-filter=d", "-z", ref, "--")
+    )
+    untracked = _split(
+        _git("-C", str(root), "ls-files", "--others", "--exclude-standard", "-z")
+    )
+
+    return {root / x for x in [*changed, *untracked]}
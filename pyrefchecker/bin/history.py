@@ -0,0 +1,51 @@
+import json
+from pathlib import Path
+from typing import Dict, Union
+
+from .atomic import atomic_write
+
+# How much a file's past failures count for after each run in which it passes
+DECAY = 0.5
+
+# Files whose score falls below this are forgotten
+MIN_SCORE = 0.1
+
+
+class FailureHistory:
+    """
+    Remembers which files failed in past runs, so that they can be checked first.
+
+    Each file has a score, which grows each time it fails and decays each time it passes,
+    so files which failed recently and often come first. Files which aren't checked in a
+    run keep their scores. Writes are atomic, so a run which is interrupted while saving
+    leaves the previous history intact.
+    """
+
+    def __init__(self, path: Union[str, Path]):
+        self.path = Path(path)
+        try:
+            with self.path.open() as f:
+                self.scores: Dict[str, float] = json.load(f)["scores"]
+        except FileNotFoundError:
+            self.scores = {}
+        except (ValueError, KeyError, TypeError):
+            # A corrupt history is only a missed optimisation
+            self.scores = {}
+
+    def score(self, path: Union[str, Path]) -> float:
+        """ Return how likely a file is to fail, relative to other files """
+        return self.scores.get(str(path), 0.0)
+
+    def record(self, path: Union[str, Path], failed: bool) -> None:
+        """ Record whether a file failed in this run """
+        score = self.score(path) * DECAY + (1.0 if failed else 0.0)
+        if score >= MIN_SCORE:
+            self.scores[str(path)] = score
+        else:
+            self.scores.pop(str(path), None)
+
+    def save(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        atomic_write(
+            self.path, json.dumps({"scores": self.scores}, sort_keys=True).encode()
+        )
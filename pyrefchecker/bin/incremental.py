@@ -0,0 +1,134 @@
+"""
+Checking files repeatedly with a long-lived pool, e.g. for the daemon or watch mode.
+"""
+
+import hashlib
+import os
+import traceback
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+from .. import BaseWarning
+from ..exits import key_content
+from ..exports import expand_content
+from ..pool import Outcome, WorkerPool
+from .project_index import ProjectIndex
+from .scheduling import Job, JobResult, longest_first, make_chunks
+
+
+@dataclass(frozen=True)
+class Entry:
+    """ What a file was like when it was last checked, and the key of its contents """
+
+    mtime_ns: int
+    size: int
+    key: str
+
+
+class IncrementalChecker:
+    """
+    Checks files with a pool which outlives any one check, remembering their results.
+
+    A file is only re-read when its modification time or size changes, and only re-checked
+    when its contents change. Results are dropped once no known file has their contents.
+
+    Files are checked with the index of their project which the pool's workers were
+    prepared with (see 'set_index'). As `import *` is resolved differently in different
+    packages, files are keyed on their contents with it resolved, and on the functions
+    which never return that they may call.
+    """
+
+    def __init__(
+        self, pool: "WorkerPool[Job, JobResult]", index: ProjectIndex = ProjectIndex()
+    ):
+        self.pool = pool
+        self.index = index
+
+        # Each file by its absolute path, and its warnings by the hash of its contents
+        self.files: Dict[str, Entry] = {}
+        self.results: Dict[str, Sequence[BaseWarning]] = {}
+        self.checked = 0
+
+    def check(
+        self, paths: Iterable[Path]
+    ) -> Dict[Path, Outcome[Sequence[BaseWarning]]]:
+        """ Return the outcome of checking each file, only checking those which changed """
+        outcomes: Dict[Path, Outcome[Sequence[BaseWarning]]] = {}
+
+        # Paths waiting on a result, grouped by the key of their contents
+        pending: Dict[str, List[Tuple[Path, os.stat_result]]] = {}
+        jobs: List[Job] = []
+
+        for path in paths:
+            absolute = os.path.abspath(path)
+            try:
+                stat = os.stat(absolute)
+                entry = self.files.get(absolute)
+                if entry is not None and (entry.mtime_ns, entry.size) == (
+                    stat.st_mtime_ns,
+                    stat.st_size,
+                ):
+                    outcomes[path] = Outcome(value=self.results[entry.key])
+                    continue
+                content = Path(absolute).read_bytes()
+            except OSError:
+                # e.g. the file was deleted after it was found
+                outcomes[path] = Outcome(error=traceback.format_exc())
+                continue
+
+            if self.index.exports:
+                content = expand_content(absolute, content, self.index.exports)
+            key = hashlib.sha256(key_content(content, self.index.exits)).hexdigest()
+            if key in self.results:
+                self.files[absolute] = Entry(stat.st_mtime_ns, stat.st_size, key)
+                outcomes[path] = Outcome(value=self.results[key])
+            elif key in pending:
+                pending[key].append((path, stat))
+            else:
+                pending[key] = [(path, stat)]
+                jobs.append(Job(key=key, path=absolute, size=len(content)))
+
+        longest_first(jobs)
+        for job, outcome in self.pool.imap(make_chunks(jobs, self.pool.workers)):
+            if outcome.value is not None:
+                warnings, _ = outcome.value
+                self.results[job.key] = warnings
+                self.checked += 1
+            for path, stat in pending[job.key]:
+                if outcome.value is None:
+                    outcomes[path] = Outcome(
+                        timed_out=outcome.timed_out,
+                        error=outcome.error,
+                        too_large=outcome.too_large,
+                    )
+                else:
+                    outcomes[path] = Outcome(value=self.results[job.key])
+                    self.files[os.path.abspath(path)] = Entry(
+                        stat.st_mtime_ns, stat.st_size, job.key
+                    )
+
+        self._prune()
+        return outcomes
+
+    def set_index(self, index: ProjectIndex) -> None:
+        """
+        Check files with another index from now on, once the pool's workers have been
+        prepared with it. Results aren't forgotten, as changes to the index change the
+        keys of the files they affect.
+        """
+        self.index = index
+        # Files affected by the change have new keys, so each file is read again
+        self.files.clear()
+
+    def forget(self, paths: Iterable[Path]) -> None:
+        """ Forget files, e.g. because they have been deleted """
+        for path in paths:
+            self.files.pop(os.path.abspath(path), None)
+        self._prune()
+
+    def _prune(self) -> None:
+        live = {entry.key for entry in self.files.values()}
+        for key in list(self.results):
+            if key not in live:
+                del self.results[key]
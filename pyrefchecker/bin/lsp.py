@@ -0,0 +1,498 @@
+"""
+A Language Server Protocol server, which publishes warnings as diagnostics for open files.
+
+Documents are analysed in memory as they're edited, including unsaved changes. Analyses
+run in a pool of worker processes, fed by a background thread, so that edits keep being
+read while documents are analysed, and a slow document doesn't hold up the others.
+Edits are debounced, and only the latest version of a document is analysed: when a
+document is edited while it's being analysed, the analysis is cancelled by killing its
+worker, and the results for a version which has since been edited are never published.
+
+Like a normal run, documents can be analysed with the index of the workspace (see
+project_index.py), which is updated when files are saved. If it changes, the workers
+are restarted with the new index, and every open document is analysed again.
+"""
+
+import hashlib
+import json
+import re
+import sys
+import threading
+import time
+import urllib.parse
+import urllib.request
+from dataclasses import dataclass, field
+from functools import partial
+from typing import Any, BinaryIO, Callable, Dict, Iterator, List, Optional, Tuple
+
+import click
+
+from .. import (
+    ENGINES,
+    BaseWarning,
+    ImportStarWarning,
+    NoLocationRefWarning,
+    RefWarning,
+    __version__,
+    check,
+)
+from ..exports import expand_import_star
+from ..pool import CANCEL_POLL_INTERVAL, WorkerPool
+from .bin import DEFAULT_EXCLUDE, init_worker
+from .find_files import find_files
+from .project_index import ProjectIndex, ProjectIndexer
+from .pyproject_toml import defaults
+
+# How long a document must go unedited before it's analysed, in seconds
+DEBOUNCE = 0.15
+
+# A document to analyse: its URI, version, the hash of its text, and its text
+Analysis = Tuple[str, int, str, str]
+
+# LSP constants
+_SYNC_FULL = 1
+_ERROR = 1
+_INFORMATION = 3
+_METHOD_NOT_FOUND = -32601
+_SERVER_NOT_INITIALIZED = -32002
+_INVALID_REQUEST = -32600
+_INVALID_PARAMS = -32602
+
+
+@dataclass
+class Document:
+    """ An open document, and what was last found in it """
+
+    uri: str
+    version: int
+    text: str
+
+    # When the document should next be analysed, if it has changed since it last was
+    due: Optional[float] = None
+
+    # The hash of the text which the published diagnostics are for
+    analysed: Optional[str] = None
+    diagnostics: List[Dict[str, Any]] = field(default_factory=list)
+
+
+def to_diagnostics(text: str, warnings: List[BaseWarning]) -> List[Dict[str, Any]]:
+    """ Convert warnings about some text to LSP diagnostics """
+    lines = text.splitlines()
+    diagnostics = []
+    for warning in warnings:
+        if isinstance(warning, RefWarning):
+            line = lines[warning.line - 1] if warning.line <= len(lines) else ""
+            start = _utf16_length(line[: warning.column])
+            end = start + _utf16_length(warning.reference)
+            diagnostics.append(
+                _diagnostic(
+                    warning.line - 1,
+                    start,
+                    end,
+                    _ERROR,
+                    f"reference to potentially undefined `{warning.reference}`",
+                )
+            )
+        elif isinstance(warning, NoLocationRefWarning):
+            diagnostics.append(
+                _diagnostic(
+                    0,
+                    0,
+                    0,
+                    _ERROR,
+                    f"reference to potentially undefined `{warning.reference}`",
+                )
+            )
+        elif isinstance(warning, ImportStarWarning):
+            diagnostics.append(_diagnostic(0, 0, 0, _INFORMATION, str(warning)))
+    return diagnostics
+
+
+def _diagnostic(
+    line: int, start: int, end: int, severity: int, message: str
+) -> Dict[str, Any]:
+    return {
+        "range": {
+            "start": {"line": line, "character": start},
+            "end": {"line": line, "character": end},
+        },
+        "severity": severity,
+        "source": "pyrefchecker",
+        "message": message,
+    }
+
+
+def _utf16_length(text: str) -> int:
+    # LSP positions count UTF-16 code units
+    return len(text.encode("utf-16-le")) // 2
+
+
+class InvalidParams(Exception):
+    """ Raised when the parameters of a message aren't what its method expects """
+
+
+class LanguageServer:
+    """
+    Speaks LSP over a pair of streams, usually stdin and stdout.
+
+    Documents are analysed with 'analyse' by a pool of 'workers' processes. With
+    'index_exits' or 'resolve_import_star', the files in the workspace's root are
+    indexed, and the workers are prepared with its index.
+    """
+
+    def __init__(
+        self,
+        reader: BinaryIO,
+        writer: BinaryIO,
+        engine: str = ENGINES[0],
+        debounce: float = DEBOUNCE,
+        analyse: Optional[Callable[[str], List[BaseWarning]]] = None,
+        workers: Optional[int] = None,
+        index_exits: bool = False,
+        resolve_import_star: bool = False,
+    ):
+        self.reader = reader
+        self.writer = writer
+        self.engine = engine
+        self.debounce = debounce
+        self.analyse = analyse or partial(check, engine=engine)
+        self.workers = workers
+        self.index_exits = index_exits
+        self.resolve_import_star = resolve_import_star
+
+        include = defaults.get("include", r"\.pyi?$")
+        excludes = [
+            defaults.get("exclude", DEFAULT_EXCLUDE),
+            *defaults.get("extra_excludes", []),
+        ]
+        self.include = re.compile(include) if include else None
+        self.excludes = [re.compile(x) for x in excludes if x]
+
+        self.documents: Dict[str, Document] = {}
+        self.analyses = 0
+
+        # The workspace's root directory, if it's indexed
+        self.root: Optional[str] = None
+        self.indexer = ProjectIndexer(
+            workers=workers, exits=index_exits, exports=resolve_import_star
+        )
+
+        self._initialized = False
+        self._shutdown = False
+        self._stopping = False
+        self._index_due = False
+        self._condition = threading.Condition()
+        self._write_lock = threading.Lock()
+
+    def serve(self) -> int:
+        """ Handle messages until told to exit, and return the exit code """
+        analyser = threading.Thread(target=self._analyse_documents, daemon=True)
+        analyser.start()
+        try:
+            while True:
+                message = self._read()
+                if message is None or message.get("method") == "exit":
+                    return 0 if self._shutdown else 1
+                try:
+                    self._handle(message)
+                except InvalidParams as e:
+                    if message.get("id") is not None:
+                        self._error(message["id"], _INVALID_PARAMS, str(e))
+                    else:
+                        click.echo(f"Ignored {message.get('method')}: {e}", err=True)
+        finally:
+            with self._condition:
+                self._stopping = True
+                self._condition.notify()
+            analyser.join()
+
+    def _read(self) -> Optional[Dict[str, Any]]:
+        length = None
+        while True:
+            header = self.reader.readline()
+            if not header:
+                return None
+            header = header.strip()
+            if not header:
+                break
+            name, _, value = header.decode("ascii").partition(":")
+            if name.lower() == "content-length":
+                length = int(value)
+        if length is None:
+            return None
+        return json.loads(self.reader.read(length))
+
+    def _write(self, message: Dict[str, Any]) -> None:
+        body = json.dumps({"jsonrpc": "2.0", **message}).encode()
+        with self._write_lock:
+            self.writer.write(b"Content-Length: %d\r\n\r\n" % len(body) + body)
+            self.writer.flush()
+
+    def _handle(self, message: Dict[str, Any]) -> None:
+        method = message.get("method")
+        params = message.get("params") or {}
+        id = message.get("id")
+
+        if method == "initialize":
+            self._initialized = True
+            root = _root_path(params)
+            if root is not None and (self.index_exits or self.resolve_import_star):
+                self.root = root
+                self._refresh_index()
+            self._write(
+                {
+                    "id": id,
+                    "result": {
+                        "capabilities": {
+                            "textDocumentSync": {
+                                "openClose": True,
+                                "change": _SYNC_FULL,
+                                "save": True,
+                            }
+                        },
+                        "serverInfo": {"name": "pyrefchecker", "version": __version__},
+                    },
+                }
+            )
+        elif not self._initialized:
+            if id is not None:
+                self._error(id, _SERVER_NOT_INITIALIZED, "Server not initialized")
+        elif method == "shutdown":
+            self._shutdown = True
+            self._write({"id": id, "result": None})
+        elif self._shutdown:
+            if id is not None:
+                self._error(id, _INVALID_REQUEST, "Server is shutting down")
+        elif method == "textDocument/didOpen":
+            document = _param(params, "textDocument", dict)
+            if document.get("languageId", "python") == "python":
+                self._update(
+                    _param(document, "uri", str),
+                    _param(document, "version", int),
+                    _param(document, "text", str),
+                    0,
+                )
+        elif method == "textDocument/didChange":
+            document = _param(params, "textDocument", dict)
+            uri = _param(document, "uri", str)
+            version = _param(document, "version", int)
+            changes = _param(params, "contentChanges", list)
+            if uri in self.documents and changes:
+                # Changes are always the full text, as requested by the capabilities
+                if not isinstance(changes[-1], dict):
+                    raise InvalidParams("Expected contentChanges to contain objects")
+                text = _param(changes[-1], "text", str)
+                self._update(uri, version, text, self.debounce)
+        elif method in ("textDocument/didSave", "workspace/didChangeWatchedFiles"):
+            # Saved files may change the index, unlike unsaved edits
+            self._refresh_index()
+        elif method == "textDocument/didClose":
+            uri = _param(_param(params, "textDocument", dict), "uri", str)
+            with self._condition:
+                closed = self.documents.pop(uri, None)
+                if closed is not None:
+                    self._publish(uri, None, [])
+        elif id is not None:
+            self._error(id, _METHOD_NOT_FOUND, f"Unsupported method: {method}")
+
+    def _error(self, id: Any, code: int, message: str) -> None:
+        self._write({"id": id, "error": {"code": code, "message": message}})
+
+    def _refresh_index(self) -> None:
+        """ Have the analyser update the index, if the workspace is indexed """
+        if self.root is None:
+            return
+        with self._condition:
+            self._index_due = True
+            self._condition.notify()
+
+    def _update(self, uri: str, version: int, text: str, delay: float) -> None:
+        with self._condition:
+            document = self.documents.get(uri)
+            if document is None:
+                document = self.documents[uri] = Document(uri, version, text)
+            document.version = version
+            document.text = text
+            document.due = time.monotonic() + delay
+            self._condition.notify()
+
+    def _publish(
+        self, uri: str, version: Optional[int], diagnostics: List[Dict[str, Any]]
+    ) -> None:
+        params: Dict[str, Any] = {"uri": uri, "diagnostics": diagnostics}
+        if version is not None:
+            params["version"] = version
+        self._write({"method": "textDocument/publishDiagnostics", "params": params})
+
+    def _analyse_documents(self) -> None:
+        """ Analyse documents once they stop being edited, until the server stops """
+        pool: WorkerPool[Analysis, List[BaseWarning]] = WorkerPool(
+            partial(_analyse_item, analyse=self.analyse),
+            workers=self.workers,
+            initializer=self._initializer(),
+        )
+        with pool:
+            while True:
+                with self._condition:
+                    if self._stopping:
+                        return
+                    refresh = self._index_due
+                    self._index_due = False
+                if refresh and self.root is not None:
+                    project = find_files([self.root], self.include, self.excludes)
+                    if self.indexer.update(project):
+                        pool.restart(self._initializer())
+                        with self._condition:
+                            # Any document's warnings may depend on what changed
+                            for document in self.documents.values():
+                                document.analysed = None
+                                if document.due is None:
+                                    document.due = time.monotonic()
+
+                for analysis, outcome in pool.imap(
+                    self._due(), cancelled=self._superseded
+                ):
+                    self._analysed(analysis, outcome.value, outcome.error)
+
+    def _initializer(self) -> Callable[[], None]:
+        """ Return the initializer for workers, with the current index """
+        index = self.indexer.index if self.root is not None else ProjectIndex()
+        return partial(
+            init_worker,
+            engine=self.engine,
+            exits=index.exits,
+            exports=index.exports,
+        )
+
+    def _analysed(
+        self,
+        analysis: Analysis,
+        warnings: Optional[List[BaseWarning]],
+        error: Optional[str],
+    ) -> None:
+        """ Publish the diagnostics for an analysis, unless it failed or is stale """
+        uri, version, key, text = analysis
+        if warnings is None:
+            # e.g. a syntax error while typing, so the last diagnostics are kept
+            click.echo(f"{uri}: {error}", err=True)
+            return
+        self.analyses += 1
+
+        diagnostics = to_diagnostics(text, warnings)
+        with self._condition:
+            current = self.documents.get(uri)
+            if current is None or current.version != version:
+                # Edited or closed since, so the results are stale
+                return
+            current.analysed = key
+            if diagnostics == current.diagnostics:
+                return
+            current.diagnostics = diagnostics
+            # Published while holding the lock, so a document can't be closed first
+            self._publish(uri, version, diagnostics)
+
+    def _due(self) -> Iterator[List[Analysis]]:
+        """
+        Generate documents to analyse as they stop being edited, one at a time, or no
+        documents if none are due for a while, until the server stops or the index
+        needs updating.
+        """
+        while True:
+            with self._condition:
+                if self._stopping or self._index_due:
+                    return
+                now = time.monotonic()
+                waiting = [x for x in self.documents.values() if x.due is not None]
+                document = min(waiting, key=lambda x: x.due or 0.0, default=None)
+                if document is None or (document.due or 0.0) > now:
+                    # Analyses which are under way are checked for cancellation meanwhile
+                    timeout = CANCEL_POLL_INTERVAL
+                    if document is not None:
+                        timeout = min(timeout, (document.due or 0.0) - now)
+                    self._condition.wait(timeout)
+                    yield []
+                    continue
+
+                document.due = None
+                key = hashlib.sha256(document.text.encode()).hexdigest()
+                if key == document.analysed:
+                    # e.g. an edit which was undone
+                    continue
+                analysis = (document.uri, document.version, key, document.text)
+            yield [analysis]
+
+    def _superseded(self, analysis: Analysis) -> bool:
+        """ Return True if a document has been edited or closed since it was analysed """
+        uri, version, _, _ = analysis
+        with self._condition:
+            document = self.documents.get(uri)
+            return self._stopping or document is None or document.version != version
+
+
+def _param(params: Any, name: str, kind: type) -> Any:
+    """ Return a parameter of a message, which must be of some type """
+    if not isinstance(params, dict):
+        raise InvalidParams(f"Expected an object with {name}")
+    value = params.get(name)
+    if not isinstance(value, kind) or (kind is int and isinstance(value, bool)):
+        raise InvalidParams(f"Expected {name} to be of type {kind.__name__}")
+    return value
+
+
+def _root_path(params: Dict[str, Any]) -> Optional[str]:
+    """ Return the workspace's root directory, from the parameters of 'initialize' """
+    uri = params.get("rootUri")
+    if isinstance(uri, str):
+        return _uri_path(uri)
+    path = params.get("rootPath")
+    return path if isinstance(path, str) else None
+
+
+def _uri_path(uri: str) -> Optional[str]:
+    """ Return the path of a file URI, or None for another kind of URI """
+    parsed = urllib.parse.urlparse(uri)
+    if parsed.scheme != "file":
+        return None
+    return urllib.request.url2pathname(parsed.path)
+
+
+def _analyse_item(
+    analysis: Analysis, analyse: Callable[[str], List[BaseWarning]]
+) -> List[BaseWarning]:
+    """ Analyse the text of a document, in a worker """
+    uri, _, _, text = analysis
+    # With the workspace's exports, as set up by init_worker
+    return analyse(expand_import_star(text, _uri_path(uri) or ""))
+
+
+@click.command()
+@click.option(
+    "--engine",
+    type=click.Choice(ENGINES),
+    default=defaults.get("engine", ENGINES[0]),
+    help="Engine to analyse files with",
+    show_default=True,
+)
+@click.option(
+    "--workers",
+    type=click.IntRange(min=0),
+    default=defaults.get("workers", None),
+    help=(
+        "Number of worker processes, which analyse documents at once (0 analyses them "
+        "in the server, without cancelling stale analyses)  [default: number of CPUs]"
+    ),
+)
+def lsp(engine: str, workers: Optional[int]) -> None:
+    """
+    Run a Language Server Protocol server on stdin and stdout, which publishes warnings
+    as diagnostics for the files open in an editor.
+    """
+    server = LanguageServer(
+        sys.stdin.buffer,
+        sys.stdout.buffer,
+        engine=engine,
+        workers=workers,
+        index_exits=defaults.get("index_exits", True),
+        resolve_import_star=defaults.get("resolve_import_star", True),
+    )
+    sys.exit(server.serve())
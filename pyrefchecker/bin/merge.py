@@ -0,0 +1,154 @@
+"""
+Merging the results of a run which was split into shards, e.g. across CI machines.
+
+Each shard is checked with '--shard i/N --format jsonl', which writes a summary of the
+shard once it's done. Merging checks that every shard finished, and that between them
+they checked every file of the run exactly once (from fingerprints of the files each
+selected), then reports the results of all of them together, with a single verdict.
+"""
+
+import json
+import sys
+from typing import Any, Dict, List, Optional, TextIO, Tuple
+
+import click
+
+from ..pool import Outcome
+from .formats import TextReporter, warning_from_json
+from .pyproject_toml import defaults
+from .scheduling import add_fingerprints
+
+# The fields of a shard's summary which describe the files of the whole run
+_RUN_FIELDS = ("shards", "total", "total_fingerprint")
+
+
+def read_shards(
+    results: List[TextIO],
+) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """
+    Read the JSON Lines results of shards, and return the records for files, and the
+    summary of each shard. Raise a ClickException unless every shard finished, and the
+    shards checked every file exactly once.
+    """
+    records = []
+    summaries: Dict[int, Dict[str, Any]] = {}
+    first: Optional[Dict[str, Any]] = None
+    count = None
+
+    for f in results:
+        summary = None
+        for number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                raise click.ClickException(f"{f.name}:{number}: Not valid JSON")
+            if "shard" in record:
+                summary = record
+            else:
+                records.append(record)
+
+        if summary is None:
+            raise click.ClickException(
+                f"{f.name}: No summary of the shard, so it didn't finish "
+                "(or wasn't run with --shard and --format jsonl)"
+            )
+        if "total_fingerprint" not in summary:
+            raise click.ClickException(
+                f"{f.name}: No fingerprint of the shard's files, so it's from an older "
+                "version of pyrefchecker"
+            )
+        if count is not None and summary["shards"] != count:
+            raise click.ClickException(
+                f"{f.name}: Shard {summary['shard']}/{summary['shards']} is from a run "
+                f"with a different number of shards ({count})"
+            )
+        if first is not None and any(summary[x] != first[x] for x in _RUN_FIELDS):
+            raise click.ClickException(
+                f"{f.name}: Shard {summary['shard']}/{summary['shards']} is from a run "
+                f"over different files to shard {first['shard']}"
+            )
+        first = first or summary
+        count = summary["shards"]
+        if summary["shard"] in summaries:
+            raise click.ClickException(
+                f"{f.name}: Shard {summary['shard']}/{count} was given more than once"
+            )
+        summaries[summary["shard"]] = summary
+
+    missing = [i for i in range(1, (count or 0) + 1) if i not in summaries]
+    if missing:
+        raise click.ClickException(
+            f"Missing shard{'s' if len(missing) > 1 else ''} "
+            f"{', '.join(str(i) for i in missing)} of {count}"
+        )
+
+    if first is not None and (
+        sum(x["selected"] for x in summaries.values()) != first["total"]
+        or add_fingerprints(x["fingerprint"] for x in summaries.values())
+        != first["total_fingerprint"]
+    ):
+        raise click.ClickException(
+            "The shards didn't check every file exactly once, so they selected their "
+            "files differently"
+        )
+    records.sort(key=lambda record: record["path"])
+    return records, [summaries[i] for i in sorted(summaries)]
+
+
+@click.command()
+@click.argument("results", type=click.File("r"), nargs=-1, required=True)
+@click.option(
+    "--format",
+    "output_format",
+    type=click.Choice(["text", "jsonl"]),
+    default="text",
+    help="Format to report the merged results in",
+    show_default=True,
+)
+@click.option(
+    "--allow-import-star/--disallow-import-star",
+    default=defaults.get("allow_import_star", True),
+    help="How to show `import *` (the verdict is the shards')",
+    show_default="allowed" if defaults.get("allow_import_star", True) else "disallowed",
+)
+def merge(results: List[TextIO], output_format: str, allow_import_star: bool) -> None:
+    """
+    Merge the results of every shard of a run, and exit with 1 if any shard failed.
+
+    Example:
+
+        pyrefchecker --shard 1/2 --format jsonl . > 1.jsonl
+
+        pyrefchecker --shard 2/2 --format jsonl . > 2.jsonl
+
+        pyrefchecker merge 1.jsonl 2.jsonl
+
+    """
+    records, summaries = read_shards(results)
+    success = not any(x["failed"] for x in records + summaries)
+
+    if output_format == "jsonl":
+        for record in records:
+            click.echo(json.dumps(record))
+    else:
+        # Files are shown however the shards chose to show them
+        reporter = TextReporter(allow_import_star, show_successes=True)
+        for record in records:
+            outcome: Outcome = Outcome(
+                timed_out=record["status"] == "timed_out",
+                too_large=record["status"] == "too_large",
+                error=record.get("error"),
+            )
+            if "warnings" in record:
+                outcome = Outcome(
+                    value=[warning_from_json(x) for x in record["warnings"]]
+                )
+            reporter.report(record["path"], outcome)
+        reporter.finish(success)
+
+    files = sum(x["files"] for x in summaries)
+    click.echo(f"🧩 Merged {len(summaries)} shards, of {files} files", err=True)
+    if not success:
+        sys.exit(1)
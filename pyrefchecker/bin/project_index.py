@@ -0,0 +1,310 @@
+"""
+A pre-pass over the files of a project, which finds what the checks of each file need
+to know about the others: the functions which never return, so that calls to them end
+a branch, and the names each module exports, so that `import *` can be resolved.
+"""
+
+import ast
+import os
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    FrozenSet,
+    Iterable,
+    List,
+    Mapping,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+    Union,
+)
+
+from ..ast_compat import parse
+from ..exits import ExitSummary, summarize_exits, terminal_functions
+from ..exports import ExportSummary, module_exports, star_imports, summarize_exports
+from ..modules import imported_modules, module_name, parent_modules
+from ..pool import WorkerPool
+from .cache import ResultCache
+from .scheduling import Job, make_chunks
+
+# Modules are summarized in the current process when there are fewer than this many
+# bytes to read, as starting workers would take longer
+SERIAL_BYTES = 256 * 1024
+
+# Distinguishes cached summaries from those of versions of ModuleIndex with other fields
+INDEX_VERSION = 3
+
+
+@dataclass(frozen=True)
+class ModuleIndex:
+    """ What one module contributes to the index of its project """
+
+    module: str
+    exits: ExitSummary = field(default_factory=ExitSummary)
+    # None if the module couldn't be parsed
+    exports: ExportSummary = field(default_factory=lambda: ExportSummary(names=None))
+    # The absolute names of everything it imports
+    imports: Tuple[str, ...] = ()
+    # The absolute names of the modules it imports * from
+    stars: Tuple[str, ...] = ()
+
+
+@dataclass(frozen=True)
+class ProjectIndex:
+    """
+    The qualified names of a project's functions which never return, and the names
+    each module which is imported * from exports, by module name.
+    """
+
+    exits: FrozenSet[str] = frozenset()
+    exports: Mapping[str, Sequence[str]] = field(default_factory=dict)
+
+
+def index_project(
+    paths: Iterable[Union[str, Path]],
+    workers: Optional[int] = None,
+    timeout: Optional[float] = None,
+    cache: "Optional[ResultCache[ModuleIndex]]" = None,
+    reachable_from: Optional[Iterable[Union[str, Path]]] = None,
+) -> ProjectIndex:
+    """
+    Index the modules in some files.
+
+    Each module is summarized by a pool of workers, unless its summary is cached (by
+    its contents and the name it's imported by), and the summaries are then combined.
+    Files which can't be summarized are left out, as they're reported when checked.
+
+    When 'reachable_from' is given, only those files, and the files among 'paths' which
+    they import (directly or not), are summarized, which is all that checking them
+    needs. Otherwise, every file is.
+    """
+    paths = list(paths)
+    with _Summarizer(workers, timeout, cache) as summarize:
+        if reachable_from is None:
+            indexes = list(summarize(paths).values())
+        else:
+            indexes = _summarize_reachable(paths, reachable_from, summarize)
+    return combine(indexes)
+
+
+def combine(indexes: Iterable[ModuleIndex]) -> ProjectIndex:
+    """ Combine the summaries of a project's modules into its index """
+    indexes = list(indexes)
+    exports: Dict[str, ExportSummary] = {}
+    for index in indexes:
+        # A file which couldn't be parsed doesn't hide another for the same module
+        if index.module not in exports or index.exports.names is not None:
+            exports[index.module] = index.exports
+    # Only the exports which some module needs, which change far less often than all
+    # of them, and are cheaper to send to each worker
+    stars = {x for index in indexes for x in index.stars}
+    return ProjectIndex(
+        exits=terminal_functions(x.exits for x in indexes),
+        exports={k: v for k, v in module_exports(exports).items() if k in stars},
+    )
+
+
+def index_cache(
+    directory: Union[str, Path], max_size: int
+) -> "ResultCache[ModuleIndex]":
+    """ Return the cache for the summaries of modules, which shares the results' directory """
+    return ResultCache(
+        directory,
+        max_size=max_size,
+        options={"index": "project", "version": INDEX_VERSION},
+    )
+
+
+class ProjectIndexer:
+    """
+    Keeps the index of a project up to date as its files change, e.g. for the daemon or
+    watch mode. A file is only summarized again when its modification time, size or
+    module name changes.
+
+    The index only has the functions which never return with 'exits', and the names
+    modules export with 'exports', so that it only changes when what's used does.
+    """
+
+    def __init__(
+        self,
+        workers: Optional[int] = None,
+        timeout: Optional[float] = None,
+        exits: bool = True,
+        exports: bool = True,
+    ):
+        self.workers = workers
+        self.timeout = timeout
+        self.exits = exits
+        self.exports = exports
+        self.index = ProjectIndex()
+
+        # The summary of each file by its absolute path, and its mtime and size then
+        self._modules: Dict[str, Tuple[Tuple[int, int], ModuleIndex]] = {}
+
+    def update(self, paths: Iterable[Union[str, Path]]) -> bool:
+        """
+        Index the project made up of some files, summarizing those which are new or have
+        changed, and return True if its index changed.
+
+        The summaries of files which aren't part of it are kept, in case a later project
+        (e.g. another request to the daemon) includes them again.
+        """
+        current: List[str] = []
+        stale: Dict[str, Tuple[int, int]] = {}
+        for path in paths:
+            absolute = os.path.abspath(path)
+            try:
+                stat = os.stat(absolute)
+            except OSError:
+                # Deleted since it was found, so it's no longer part of the project
+                self._modules.pop(absolute, None)
+                continue
+            current.append(absolute)
+            version = (stat.st_mtime_ns, stat.st_size)
+            entry = self._modules.get(absolute)
+            # A module is renamed when a package is created or removed around it
+            if (
+                entry is None
+                or entry[0] != version
+                or entry[1].module != module_name(absolute)
+            ):
+                stale[absolute] = version
+
+        with _Summarizer(self.workers, self.timeout) as summarize:
+            summaries = summarize(list(stale))
+        for absolute, version in stale.items():
+            if absolute in summaries:
+                self._modules[absolute] = (version, summaries[absolute])
+            else:
+                self._modules.pop(absolute, None)
+
+        index = combine(self._modules[x][1] for x in current if x in self._modules)
+        index = ProjectIndex(
+            exits=index.exits if self.exits else frozenset(),
+            exports=index.exports if self.exports else {},
+        )
+        changed = index != self.index
+        self.index = index
+        return changed
+
+
+class _Summarizer:
+    """
+    Summarizes files, with a pool of workers which is started the first time there are
+    enough of them, and kept until the summarizer is closed.
+    """
+
+    def __init__(
+        self,
+        workers: Optional[int],
+        timeout: Optional[float],
+        cache: "Optional[ResultCache[ModuleIndex]]" = None,
+    ):
+        self.workers = workers
+        self.timeout = timeout
+        self.cache = cache
+        self._pool: Optional[WorkerPool[Job, ModuleIndex]] = None
+
+    def __enter__(self) -> "_Summarizer":
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        if self._pool is not None:
+            self._pool.close()
+
+    def __call__(
+        self, files: Sequence[Union[str, Path]]
+    ) -> Dict[Union[str, Path], ModuleIndex]:
+        """ Summarize files, returning the summary of each which could be summarized """
+        indexes: Dict[Union[str, Path], ModuleIndex] = {}
+        jobs: List[Job] = []
+        for path in files:
+            content = Path(path).read_bytes()
+            key = ""
+            if self.cache:
+                key = self.cache.key(content + b"\0" + module_name(path).encode())
+                cached = self.cache.get(key)
+                if cached is not None:
+                    indexes[path] = cached
+                    continue
+            jobs.append(Job(key=key, path=path, size=len(content)))
+
+        pool: WorkerPool[Job, ModuleIndex]
+        if sum(job.size for job in jobs) < SERIAL_BYTES:
+            pool = WorkerPool(index_job, workers=0)
+        else:
+            if self._pool is None:
+                self._pool = WorkerPool(
+                    index_job, workers=self.workers, timeout=self.timeout
+                )
+            pool = self._pool
+        for job, outcome in pool.imap(make_chunks(jobs, pool.workers)):
+            if outcome.value is None:
+                continue
+            if self.cache:
+                self.cache.set(job.key, outcome.value)
+            indexes[job.path] = outcome.value
+        return indexes
+
+
+def _summarize_reachable(
+    paths: Sequence[Union[str, Path]],
+    start: Iterable[Union[str, Path]],
+    summarize: Callable[
+        [Sequence[Union[str, Path]]], Mapping[Union[str, Path], ModuleIndex]
+    ],
+) -> List[ModuleIndex]:
+    """
+    Summarize some files, then the files they import, and so on, a round of imports
+    at a time, so that each round can be summarized in parallel.
+    """
+    # Finding which module each file is costs far less than reading and parsing it
+    by_module: Dict[str, List[Union[str, Path]]] = {}
+    for path in paths:
+        by_module.setdefault(module_name(path), []).append(path)
+
+    indexes: List[ModuleIndex] = []
+    seen: Set[str] = set()
+    pending = [x for x in start if _mark(seen, x)]
+    while pending:
+        summaries = list(summarize(pending).values())
+        indexes.extend(summaries)
+        pending = []
+        for index in summaries:
+            for name in index.imports:
+                for module in parent_modules(name):
+                    pending.extend(
+                        x for x in by_module.get(module, []) if _mark(seen, x)
+                    )
+    return indexes
+
+
+def _mark(seen: Set[str], path: Union[str, Path]) -> bool:
+    """ Add a file to those seen, and return True if it wasn't already """
+    key = str(Path(path).absolute())
+    if key in seen:
+        return False
+    seen.add(key)
+    return True
+
+
+def index_job(job: Job) -> ModuleIndex:
+    """ Summarize the module for a job, in a worker """
+    path = Path(job.path)
+    module = module_name(path)
+    try:
+        tree = parse(path.read_text())
+    except (SyntaxError, ValueError):
+        return ModuleIndex(module=module)
+    is_package = path.stem == "__init__"
+    return ModuleIndex(
+        module=module,
+        exits=summarize_exits(tree, module, is_package),
+        exports=summarize_exports(tree, module, is_package),
+        imports=tuple(imported_modules(tree, module, is_package)),
+        stars=tuple(star_imports(tree, module, is_package)),
+    )
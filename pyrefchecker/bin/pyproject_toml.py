@@ -32,3 +32,7 @@ class PyProjectTOML:
         if not data or name not in data:
             return fallback
         return data[name]
+
+
+# pyrefchecker's own section, which the defaults of its command line options come from
+defaults = PyProjectTOML("tool.pyrefchecker")
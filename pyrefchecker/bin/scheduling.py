@@ -0,0 +1,231 @@
+import hashlib
+import heapq
+import json
+import os
+from dataclasses import dataclass
+from pathlib import Path
+from typing import (
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+    TypeVar,
+    Union,
+)
+
+from ..warnings import BaseWarning
+from .atomic import atomic_write
+
+P = TypeVar("P")
+
+# Bounds on the total size of the files in one chunk
+MIN_CHUNK_BYTES = 8 * 1024
+MAX_CHUNK_BYTES = 1024 * 1024
+
+# Upper bound on the number of files in one chunk
+MAX_CHUNK_FILES = 256
+
+# Fingerprints of sets of files are sums of the hashes of their paths, modulo this
+_FINGERPRINT_MODULUS = 2 ** 256
+
+# An estimate of how long checking a byte of code takes, in seconds, for files which
+# haven't been timed (only its ratio to recorded durations matters)
+SECONDS_PER_BYTE = 1e-5
+
+
+@dataclass(frozen=True)
+class Job:
+    """ A file which needs to be checked """
+
+    key: str
+    path: Union[str, Path]
+    size: int
+
+
+# The warnings for a file, and the time spent in each phase of checking it if profiled
+JobResult = Tuple[Sequence[BaseWarning], Optional[Dict[str, float]]]
+
+
+def make_chunks(jobs: Sequence[Job], workers: int) -> Iterator[List[Job]]:
+    """
+    Split jobs into chunks to be sent to workers together.
+
+    Chunks start large and shrink as the remaining work shrinks (guided self-scheduling),
+    so that per-chunk overhead stays small without leaving workers idle at the end.
+    Many small files share a chunk, whereas a large file gets a chunk to itself.
+    """
+    remaining = sum(job.size for job in jobs)
+
+    chunk: List[Job] = []
+    chunk_bytes = 0
+    target = 0
+
+    for job in jobs:
+        if not chunk:
+            target = min(
+                max(remaining // (2 * max(workers, 1)), MIN_CHUNK_BYTES),
+                MAX_CHUNK_BYTES,
+            )
+
+        chunk.append(job)
+        chunk_bytes += job.size
+        remaining -= job.size
+
+        if chunk_bytes >= target or len(chunk) >= MAX_CHUNK_FILES:
+            yield chunk
+            chunk = []
+            chunk_bytes = 0
+
+    if chunk:
+        yield chunk
+
+
+def longest_first(
+    jobs: List[Job], estimate: Optional[Callable[[Job], float]] = None
+) -> None:
+    """
+    Sort jobs so that those expected to take longest come first (by default, the largest),
+    so that a slow file isn't started last, leaving one worker busy while the rest idle.
+    """
+    if estimate is None:
+        jobs.sort(key=lambda job: -job.size)
+    else:
+        jobs.sort(key=lambda job: -estimate(job))
+
+
+def select_shard(
+    paths: Iterable[P], index: int, count: int, weight: Callable[[P], float]
+) -> List[P]:
+    """
+    Split paths into 'count' shards of about equal total weight, and return those in the
+    shard numbered 'index' (counting from 1), sorted.
+
+    The split only depends on the paths and their weights, not on the order they're given
+    in, so each machine checking a shard of the same files selects the same shard, as
+    long as the weights only depend on what every machine has (e.g. the files' sizes).
+    Heaviest paths are placed first, each in the lightest shard so far.
+    """
+    ordered = sorted(set(paths), key=str)
+    weights = {path: weight(path) for path in ordered}
+    ordered.sort(key=lambda path: -weights[path])
+
+    shards = [(0.0, i) for i in range(count)]
+    selected = []
+    for path in ordered:
+        total, i = heapq.heappop(shards)
+        if i == index - 1:
+            selected.append(path)
+        heapq.heappush(shards, (total + weights[path], i))
+    return sorted(selected, key=str)
+
+
+@dataclass(frozen=True)
+class ShardSelection:
+    """
+    The files selected for one shard of a run, out of all the files in the run, so that
+    when the shards are merged, they can be checked to cover every file exactly once.
+    """
+
+    index: int
+    count: int
+    files: int
+    total: int
+    # Fingerprints of the selected files, and of all the files (see 'fingerprint')
+    fingerprint: str
+    total_fingerprint: str
+
+    @classmethod
+    def of(
+        cls,
+        selected: Iterable[Union[str, Path]],
+        paths: Iterable[Union[str, Path]],
+        index: int,
+        count: int,
+    ) -> "ShardSelection":
+        selected, paths = set(selected), set(paths)
+        return cls(
+            index=index,
+            count=count,
+            files=len(selected),
+            total=len(paths),
+            fingerprint=fingerprint(selected),
+            total_fingerprint=fingerprint(paths),
+        )
+
+
+def fingerprint(paths: Iterable[Union[str, Path]]) -> str:
+    """
+    Return a fingerprint of a set of files, from their paths. The fingerprint of a set
+    is the sum of the fingerprints of any sets which partition it (see 'add_fingerprints').
+    """
+    return add_fingerprints(
+        hashlib.sha256(Path(path).as_posix().encode()).hexdigest()
+        for path in set(paths)
+    )
+
+
+def add_fingerprints(fingerprints: Iterable[str]) -> str:
+    """ Return the fingerprint of the union of disjoint sets of files """
+    total = sum(int(x, 16) for x in fingerprints) % _FINGERPRINT_MODULUS
+    return f"{total:064x}"
+
+
+class Durations:
+    """
+    Remembers how long files took to check, so that the slowest can be started first.
+
+    Files which haven't been timed are estimated from their size, at the rate of those
+    which have. Writes are atomic, and files which no longer exist are forgotten when
+    saving.
+    """
+
+    def __init__(self, path: Union[str, Path]):
+        self.path = Path(path)
+        # The time each file took to check, in seconds, and its size at the time
+        self.files: Dict[str, Tuple[float, int]] = {}
+        try:
+            with self.path.open() as f:
+                self.files = {
+                    name: (float(seconds), int(size))
+                    for name, (seconds, size) in json.load(f)["files"].items()
+                }
+        except FileNotFoundError:
+            pass
+        except (ValueError, KeyError, TypeError):
+            # Corrupt durations are only a missed optimisation
+            pass
+        self._rate: Optional[float] = None
+
+    def rate(self) -> float:
+        """ Return how long checking a byte of code takes, in seconds """
+        if self._rate is None:
+            seconds = sum(x for x, _ in self.files.values())
+            size = sum(x for _, x in self.files.values())
+            self._rate = seconds / size if seconds and size else SECONDS_PER_BYTE
+        return self._rate
+
+    def estimate(self, job: Job) -> float:
+        """ Return how long a job is expected to take, in seconds """
+        recorded = self.files.get(str(job.path))
+        if recorded is None:
+            return job.size * self.rate()
+        seconds, size = recorded
+        # Scaled by how much the file has changed in size since it was timed
+        return seconds * job.size / size if size else seconds
+
+    def record(self, job: Job, seconds: float) -> None:
+        self.files[str(job.path)] = (seconds, job.size)
+        self._rate = None
+
+    def save(self) -> None:
+        files = {
+            name: list(recorded)
+            for name, recorded in self.files.items()
+            if os.path.exists(name)
+        }
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        atomic_write(self.path, json.dumps({"files": files}, sort_keys=True).encode())
@@ -0,0 +1,35 @@
+from typing import Any, Optional, Tuple, Union
+
+import click
+
+
+class Shard(click.ParamType):
+    """
+    A shard of a run, given as "i/N" for the i-th of N shards, counting from 1.
+    """
+
+    name = "shard"
+
+    def convert(
+        self,
+        value: Union[Tuple[int, int], None, str],
+        param: Optional[click.Parameter],
+        ctx: Any,
+    ) -> Optional[Tuple[int, int]]:
+        if value is None or isinstance(value, tuple):
+            return value
+
+        index, _, count = value.partition("/")
+        try:
+            shard = int(index), int(count)
+        except ValueError:
+            self.fail(
+                f'Could not parse shard "{value}": expected e.g. "1/4"', param, ctx
+            )
+            # Not reached, as 'fail' raises, but it isn't known to never return
+            raise
+        if not 1 <= shard[0] <= shard[1]:
+            self.fail(
+                f'Invalid shard "{value}": expected i/N, with 1 <= i <= N', param, ctx
+            )
+        return shard
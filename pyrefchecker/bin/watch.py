@@ -0,0 +1,316 @@
+"""
+Watching files for changes, with inotify on Linux, and by polling elsewhere.
+
+Watchers report the files which may have changed in the same form as 'find_files' would
+find them, so that they can be re-checked and reported like any other file. A directory
+which was deleted (or moved away) may be reported instead of the files in it.
+"""
+
+import ctypes
+import ctypes.util
+import os
+import re
+import select
+import struct
+import sys
+import time
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Any, Collection, Dict, Iterable, Optional, Set, Tuple, Union
+
+from .find_files import PathMatcher, find_files
+
+# How often the polling watcher looks for changes, in seconds
+POLL_INTERVAL = 0.5
+
+# How long changes must stop for before they're reported, in seconds, so that a burst of
+# saves (e.g. a refactor across many files) is handled at once
+DEBOUNCE = 0.2
+
+# inotify(7) constants
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+
+_IN_MASK = (
+    IN_MODIFY
+    | IN_CLOSE_WRITE
+    | IN_MOVED_FROM
+    | IN_MOVED_TO
+    | IN_CREATE
+    | IN_DELETE
+    | IN_DELETE_SELF
+)
+_EVENT = struct.Struct("iIII")
+
+
+class Watcher(ABC):
+    """ Watches files under some paths, which are given as they would be to 'find_files' """
+
+    def __init__(
+        self,
+        paths: Iterable[Union[str, Path]],
+        include: Optional[re.Pattern],
+        excludes: Optional[Collection[re.Pattern]],
+    ):
+        self.paths = [Path(x) for x in paths]
+        self.include = include
+        self.excludes = excludes
+        self.matcher = PathMatcher(include, excludes)
+
+    def __enter__(self) -> "Watcher":
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        self.close()
+
+    def close(self) -> None:
+        pass
+
+    @abstractmethod
+    def wait(self, timeout: Optional[float]) -> Set[Path]:
+        """
+        Wait up to 'timeout' seconds (or forever) for changes, and return the files which
+        may have been modified, created or deleted.
+        """
+
+
+class PollingWatcher(Watcher):
+    """ Finds changes by comparing the modification time and size of every file """
+
+    def __init__(
+        self,
+        paths: Iterable[Union[str, Path]],
+        include: Optional[re.Pattern],
+        excludes: Optional[Collection[re.Pattern]],
+        interval: float = POLL_INTERVAL,
+    ):
+        super().__init__(paths, include, excludes)
+        self.interval = interval
+        self._snapshot = self._take_snapshot()
+
+    def _take_snapshot(self) -> Dict[Path, Tuple[int, int]]:
+        snapshot = {}
+        for path in find_files(self.paths, self.include, self.excludes):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            snapshot[path] = (stat.st_mtime_ns, stat.st_size)
+        return snapshot
+
+    def wait(self, timeout: Optional[float]) -> Set[Path]:
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            snapshot = self._take_snapshot()
+            previous, self._snapshot = self._snapshot, snapshot
+            changed = {
+                path
+                for path in snapshot.keys() | previous.keys()
+                if snapshot.get(path) != previous.get(path)
+            }
+            if changed:
+                return changed
+
+            if deadline is None:
+                time.sleep(self.interval)
+            else:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return set()
+                time.sleep(min(self.interval, remaining))
+
+
+class InotifyWatcher(Watcher):
+    """
+    Finds changes with inotify, by watching every directory which would be searched.
+
+    New directories are watched as they're created, and any files already in them are
+    reported. Directories which are deleted or moved away are reported themselves, and
+    stop being watched. If the kernel's queue of events overflows, every known file is
+    reported.
+    """
+
+    def __init__(
+        self,
+        paths: Iterable[Union[str, Path]],
+        include: Optional[re.Pattern],
+        excludes: Optional[Collection[re.Pattern]],
+    ):
+        super().__init__(paths, include, excludes)
+        self._libc = _load_libc()
+        self._fd = self._libc.inotify_init1(os.O_CLOEXEC | os.O_NONBLOCK)
+        if self._fd < 0:
+            raise _os_error()
+
+        # Each watched directory, and whether it's searched for files (rather than being
+        # the directory of a file which was specified directly)
+        self._directories: Dict[int, Tuple[Path, bool]] = {}
+        # Files which were specified directly, and are watched through their directory
+        self._files: Set[Path] = set()
+        try:
+            for path in self.paths:
+                if path.is_dir():
+                    self._watch_tree(path)
+                elif not self.matcher.is_excluded(str(path)):
+                    self._files.add(path)
+                    self._watch(path.parent, searched=False)
+        except BaseException:
+            self.close()
+            raise
+
+    def close(self) -> None:
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
+
+    def _watch(self, directory: Path, searched: bool) -> None:
+        wd = self._libc.inotify_add_watch(
+            self._fd, os.fsencode(str(directory)), _IN_MASK
+        )
+        if wd < 0:
+            raise _os_error(str(directory))
+        # The same directory may be watched both ways
+        _, already_searched = self._directories.get(wd, (directory, False))
+        self._directories[wd] = (directory, searched or already_searched)
+
+    def _watch_tree(self, root: Path) -> Set[Path]:
+        """ Watch a directory and those under it, and return the files in them """
+        found = set()
+        stack = [root]
+        while stack:
+            directory = stack.pop()
+            try:
+                self._watch(directory, searched=True)
+                entries = list(os.scandir(directory))
+            except (FileNotFoundError, NotADirectoryError):
+                # Removed before it could be watched
+                continue
+            for entry in entries:
+                path = directory / entry.name
+                if entry.is_dir(follow_symlinks=False):
+                    if not self.matcher.is_excluded(str(path)):
+                        stack.append(path)
+                elif self.matcher.is_included(str(path)):
+                    found.add(path)
+        return found
+
+    def wait(self, timeout: Optional[float]) -> Set[Path]:
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                return set()
+            readable, _, _ = select.select([self._fd], [], [], remaining)
+            if not readable:
+                return set()
+
+            changed = self._read_events()
+            if changed:
+                return changed
+
+    def _read_events(self) -> Set[Path]:
+        changed: Set[Path] = set()
+        try:
+            data = os.read(self._fd, 64 * 1024)
+        except BlockingIOError:
+            return changed
+
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = _EVENT.unpack_from(data, offset)
+            offset += _EVENT.size
+            name = data[offset : offset + length].rstrip(b"\0")
+            offset += length
+
+            if mask & IN_Q_OVERFLOW:
+                changed |= self._rescan()
+                continue
+            if mask & IN_IGNORED:
+                self._directories.pop(wd, None)
+                continue
+            if wd not in self._directories or not name:
+                continue
+
+            directory, searched = self._directories[wd]
+            path = directory / os.fsdecode(name)
+            if mask & IN_ISDIR:
+                if not searched or self.matcher.is_excluded(str(path)):
+                    continue
+                if mask & (IN_CREATE | IN_MOVED_TO):
+                    changed |= self._watch_tree(path)
+                elif mask & (IN_DELETE | IN_MOVED_FROM):
+                    # Without events for the files in it, if it was moved
+                    self._unwatch_tree(path)
+                    changed.add(path)
+            elif path in self._files or (
+                searched and self.matcher.is_included(str(path))
+            ):
+                changed.add(path)
+        return changed
+
+    def _unwatch_tree(self, root: Path) -> None:
+        """ Stop watching a directory and those under it """
+        for wd, (directory, _) in list(self._directories.items()):
+            if directory == root or root in directory.parents:
+                # Fails harmlessly if the directory was deleted, as its watch already was
+                self._libc.inotify_rm_watch(self._fd, wd)
+                del self._directories[wd]
+
+    def _rescan(self) -> Set[Path]:
+        for wd in list(self._directories):
+            self._libc.inotify_rm_watch(self._fd, wd)
+        self._directories.clear()
+        found = set(self._files)
+        for path in self.paths:
+            if path.is_dir():
+                found |= self._watch_tree(path)
+            elif path in self._files:
+                self._watch(path.parent, searched=False)
+        return found
+
+
+def _load_libc() -> Any:
+    libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+    libc.inotify_init1.argtypes = [ctypes.c_int]
+    libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+    libc.inotify_rm_watch.argtypes = [ctypes.c_int, ctypes.c_int]
+    return libc
+
+
+def _os_error(filename: Optional[str] = None) -> OSError:
+    errno = ctypes.get_errno()
+    return OSError(errno, os.strerror(errno), filename)
+
+
+def wait_for_changes(watcher: Watcher, debounce: float = DEBOUNCE) -> Set[Path]:
+    """ Wait for files to change, and return them once they've stopped changing """
+    changed = watcher.wait(None)
+    while True:
+        more = watcher.wait(debounce)
+        if not more:
+            return changed
+        changed |= more
+
+
+def make_watcher(
+    paths: Iterable[Union[str, Path]],
+    include: Optional[re.Pattern],
+    excludes: Optional[Collection[re.Pattern]],
+) -> Watcher:
+    """ Watch paths with inotify where it's available, and by polling otherwise """
+    paths = list(paths)
+    if sys.platform.startswith("linux"):
+        try:
+            return InotifyWatcher(paths, include, excludes)
+        except (OSError, AttributeError):
+            # e.g. too many watches, or an unusual libc
+            pass
+    return PollingWatcher(paths, include, excludes)
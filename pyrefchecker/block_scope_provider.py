@@ -6,7 +6,11 @@ import libcst.metadata as meta
 import libcst.metadata.scope_provider as sp
 from libcst.helpers import get_full_name_for_node
 
-from .ast_utils import is_conditional_typing_import, is_terminal
+from .ast_utils import (
+    ASSIGNMENT_LIKE_NODES,
+    FunctionIndex,
+    is_conditional_typing_import,
+)
 
 
 class BlockScopeProvider(meta.ScopeProvider):
@@ -58,6 +62,11 @@ def monkeypatch_nameutil() -> Iterator[None]:
 
     prop = "find_qualified_name_for_non_import"
     prev = getattr(sp._NameUtil, prop, None)
+    if prev is find_qualified_name_for_non_import:
+        # Already patched, e.g. for the lifetime of a worker process
+        yield
+        return
+
     setattr(
         sp._NameUtil,
         prop,
@@ -72,6 +81,15 @@ def monkeypatch_nameutil() -> Iterator[None]:
 class BlockScopeVisitor(sp.ScopeVisitor):
     """ A ScopeVisitor which also makes scopes for blocks """
 
+    def __init__(self, provider: meta.ScopeProvider) -> None:
+        super().__init__(provider)
+        self.functions = FunctionIndex()
+
+    def on_leave(self, original_node: cst.CSTNode) -> None:
+        if isinstance(original_node, ASSIGNMENT_LIKE_NODES):
+            self.functions.record_assignment(self.scope)
+        super().on_leave(original_node)
+
     def visit_For(self, node: cst.For) -> Optional[bool]:
         node.target.visit(self)
         node.iter.visit(self)
@@ -91,7 +109,7 @@ class BlockScopeVisitor(sp.ScopeVisitor):
         """ Create a new scope for if """
         node.test.visit(self)
 
-        if is_conditional_typing_import(node, self.scope):
+        if is_conditional_typing_import(node, self.scope, self.functions):
             node.body.visit(self)
             return False
 
@@ -103,7 +121,7 @@ class BlockScopeVisitor(sp.ScopeVisitor):
             if isinstance(orelse, cst.If):
                 orelse = orelse.orelse
             elif isinstance(orelse, cst.Else):
-                if is_terminal(orelse, self.scope):
+                if self.functions.is_terminal(orelse, self.scope):
                     terminal_else = True
                 break
 
@@ -133,7 +151,7 @@ class BlockScopeVisitor(sp.ScopeVisitor):
         """ Deal with the complexities of try/except/else/finally """
 
         all_terminal_handlers = all(
-            is_terminal(handler, self.scope) for handler in node.handlers
+            self.functions.is_terminal(handler, self.scope) for handler in node.handlers
         )
 
         if all_terminal_handlers:
@@ -0,0 +1,259 @@
+"""
+A reusable checker, for programs which embed pyrefchecker rather than running it.
+"""
+
+from contextlib import ExitStack, contextmanager
+from dataclasses import dataclass
+from functools import partial
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    FrozenSet,
+    Iterable,
+    Iterator,
+    List,
+    Mapping,
+    Optional,
+    Sequence,
+    Tuple,
+)
+
+from .batch import WarningBatch
+from .check import ENGINES, PARSERS, check
+from .exits import project_exits, set_project_exits
+from .exports import expand_import_star, set_project_exports
+from .warnings import BaseWarning
+
+if TYPE_CHECKING:
+    from .pool import WorkerPool
+
+# A name for some code (e.g. its path), and the code itself
+Item = Tuple[str, str]
+
+# Items are sent to workers in chunks of about this many bytes, so that small items
+# share a chunk, whereas a large item gets a chunk to itself
+CHUNK_BYTES = 8 * 1024
+
+
+@dataclass(frozen=True)
+class CheckResult:
+    """ The outcome of checking some code: its warnings, unless it timed out or failed """
+
+    name: str
+    warnings: Optional[List[BaseWarning]] = None
+    timed_out: bool = False
+    error: Optional[str] = None
+    too_large: bool = False
+
+    @property
+    def ok(self) -> bool:
+        return self.warnings is not None
+
+
+class Checker:
+    """
+    Checks code with a fixed configuration, keeping what it needs between calls.
+
+    'check' checks code in the current process, with the nameutil patch applied for the
+    lifetime of the checker rather than for each call. 'check_many' fans code out to a
+    pool of worker processes, which is started when it's first needed and kept until the
+    checker is closed. With zero workers, code is checked serially in the current
+    process, and timeouts are not enforced.
+
+    To bound their memory, workers can be replaced after 'max_tasks' items, or once they
+    use more than 'max_memory' bytes (see WorkerPool).
+
+    Like a run of the command, code can be checked with an index of its project (see
+    bin/project_index.py): 'exits' are the qualified names of functions which never
+    return, and 'exports' are the names each module exports to `import *`, which is
+    resolved relative to the name of each piece of code, as its path.
+
+    Example:
+
+        with Checker(engine="ast", timeout=5) as checker:
+            for result in checker.check_many(sources):
+                ...
+
+    """
+
+    def __init__(
+        self,
+        engine: str = ENGINES[0],
+        workers: Optional[int] = None,
+        timeout: Optional[float] = None,
+        max_tasks: Optional[int] = None,
+        max_memory: Optional[int] = None,
+        exits: Iterable[str] = (),
+        exports: Optional[Mapping[str, Sequence[str]]] = None,
+    ):
+        if engine not in ENGINES:
+            raise ValueError(f"Unknown engine: {engine!r}")
+        self.engine = engine
+        self.workers = workers
+        self.timeout = timeout
+        self.max_tasks = max_tasks
+        self.max_memory = max_memory
+        self.exits = frozenset(exits)
+        self.exports = exports or {}
+
+        self._context = ExitStack()
+        self._patched = False
+        self._pool: "Optional[WorkerPool[Item, WarningBatch]]" = None
+
+    def __enter__(self) -> "Checker":
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """ Shut down any worker processes, abandoning outstanding work, and unpatch """
+        self._context.close()
+        self._patched = False
+        self._pool = None
+
+    def check(self, code: str, path: str = "") -> List[BaseWarning]:
+        """
+        Return a list of warnings related to some Python code. 'path' is the file it's
+        from, if any, which relative `import *` is resolved from.
+        """
+        if not self._patched and self.engine == "libcst":
+            from .block_scope_provider import monkeypatch_nameutil
+
+            self._context.enter_context(monkeypatch_nameutil())
+            self._patched = True
+        code = expand_import_star(code, path, self.exports)
+        with _project_exits(self.exits):
+            return check(code, engine=self.engine)
+
+    def check_many(self, items: Iterable[Item]) -> Iterator[CheckResult]:
+        """
+        Check pieces of code, given as (name, code) pairs, generating their results as
+        they complete, which may not be the order they were given in.
+
+        Items are taken from 'items' as workers become free, so it may be a generator.
+        If this generator is closed early, any outstanding work is abandoned.
+        """
+        pool = self._get_pool()
+        for (name, _), outcome in pool.imap(_chunks(items)):
+            yield CheckResult(
+                name=name,
+                warnings=list(outcome.value) if outcome.value is not None else None,
+                timed_out=outcome.timed_out,
+                error=outcome.error,
+                too_large=outcome.too_large,
+            )
+
+    def _get_pool(self) -> "WorkerPool[Item, WarningBatch]":
+        if self._pool is None:
+            # multiprocessing is slow to import, and 'check' doesn't need it
+            from .pool import WorkerPool
+
+            self._pool = self._context.enter_context(
+                WorkerPool(
+                    partial(_check_item, engine=self.engine),
+                    workers=self.workers,
+                    timeout=self.timeout,
+                    initializer=partial(
+                        init_worker,
+                        engine=self.engine,
+                        exits=self.exits,
+                        exports=self.exports,
+                    ),
+                    max_tasks=self.max_tasks,
+                    max_memory=self.max_memory,
+                )
+            )
+        return self._pool
+
+
+def check_many(
+    items: Iterable[Item],
+    engine: str = ENGINES[0],
+    workers: Optional[int] = None,
+    timeout: Optional[float] = None,
+    exits: Iterable[str] = (),
+    exports: Optional[Mapping[str, Sequence[str]]] = None,
+) -> Iterator[CheckResult]:
+    """
+    Check pieces of code, given as (name, code) pairs, with a pool of worker processes,
+    generating their results as they complete. The pool is shut down once every item
+    has been checked, or when this generator is closed.
+    """
+    with Checker(
+        engine=engine, workers=workers, timeout=timeout, exits=exits, exports=exports
+    ) as checker:
+        yield from checker.check_many(items)
+
+
+def _chunks(items: Iterable[Item]) -> Iterator[Sequence[Item]]:
+    chunk: List[Item] = []
+    size = 0
+    for item in items:
+        chunk.append(item)
+        size += len(item[1])
+        if size >= CHUNK_BYTES:
+            yield chunk
+            chunk = []
+            size = 0
+    if chunk:
+        yield chunk
+
+
+@contextmanager
+def _project_exits(names: FrozenSet[str]) -> Iterator[None]:
+    """ Set the project's terminal functions for this process, while checking """
+    previous = project_exits()
+    set_project_exits(names)
+    try:
+        yield
+    finally:
+        set_project_exits(previous)
+
+
+def _check_item(item: Item, engine: str = ENGINES[0]) -> WarningBatch:
+    # With the project's exports, as set up by init_worker
+    code = expand_import_star(item[1], item[0])
+    # Batched, so that results are cheap to send back from workers
+    return WarningBatch(check(code, engine=engine))
+
+
+# Held open for the lifetime of a worker process
+_worker_context = ExitStack()
+
+WARMUP_CODE = """
+import sys
+try:
+    import os
+except ImportError:
+    sys.exit(1)
+for x in []:
+    if x:
+        y = x
+"""
+
+
+def init_worker(
+    engine: Optional[str] = None,
+    exits: Iterable[str] = (),
+    exports: Optional[Mapping[str, Sequence[str]]] = None,
+    parser: str = PARSERS[0],
+) -> None:
+    """
+    Prepare a worker process, so that the first file it checks is no slower than the rest.
+
+    The engine (or, by default, every engine) is imported and exercised once, and the
+    nameutil patch is applied for the lifetime of the process. 'exits' are the qualified
+    names of functions elsewhere in the project which never return (see exits.py), and
+    'exports' are the names each module exports to `import *` (see exports.py), and
+    'parser' is the backend libCST parses with (see parsers.py).
+    """
+    from .block_scope_provider import monkeypatch_nameutil
+    from .parsers import set_parser
+
+    set_project_exits(exits)
+    set_project_exports(exports or {})
+    set_parser(parser)
+    _worker_context.enter_context(monkeypatch_nameutil())
+    for name in ENGINES if engine is None else [engine]:
+        check(WARMUP_CODE, engine=name)
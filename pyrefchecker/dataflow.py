@@ -0,0 +1,1002 @@
+"""
+An analysis engine which finds names that may be used before they're assigned, with
+definite-assignment dataflow over a control flow graph of each scope.
+
+Unlike the block scope engines, which approximate control flow with nested scopes,
+this follows the flow of each scope (module, class, function, lambda or comprehension)
+through branches, loops and exception handlers. Names which are only assigned on some
+paths are not considered assigned where those paths join, e.g. after an if/elif/else.
+
+Each scope is compiled to basic blocks, which record the names they assign and access
+as bits. A name can't be unassigned (a 'del' is treated as an access), so the set of
+definitely assigned names only grows along a path, and loops can't make a name any more
+assigned than it was on entry. That makes a single pass over the blocks, in the order
+they were created, enough to compute the names assigned at the start of each block,
+so the analysis takes linear time.
+"""
+
+import ast
+import builtins
+import re
+from dataclasses import dataclass, field
+from functools import reduce
+from typing import Dict, List, Optional, Sequence, Set, Tuple, Union, cast
+
+from .ast_compat import parse, parse_expression
+from .exits import is_exit_function
+from .prescan import prescan
+from .profiling import phase
+from .warnings import BaseWarning, ImportStarWarning, NoLocationRefWarning, RefWarning
+
+EXCEPTIONS = {"__file__", "__name__", "__doc__", "__package__"}
+
+NO_RETURN = ({"typing.NoReturn"}, {"typing_extensions.NoReturn"})
+TYPE_CHECKING = {"typing.TYPE_CHECKING"}
+
+# The qualified name of anything which isn't an import or a builtin
+LOCAL = "<local>"
+
+MODULE = "module"
+CLASS = "class"
+FUNCTION = "function"
+COMPREHENSION = "comprehension"
+
+_FunctionNode = Union[ast.FunctionDef, ast.AsyncFunctionDef]
+_ScopeNode = Union[
+    ast.Module,
+    ast.ClassDef,
+    ast.FunctionDef,
+    ast.AsyncFunctionDef,
+    ast.Lambda,
+    ast.ListComp,
+    ast.SetComp,
+    ast.DictComp,
+    ast.GeneratorExp,
+]
+_Comprehension = Union[ast.ListComp, ast.SetComp, ast.DictComp, ast.GeneratorExp]
+
+# Flags for how control can leave a sequence of statements
+COMPLETES = 1
+BREAKS = 2
+RETURNS = 4
+
+# Statements which don't exist in every supported version of Python
+TRY_NODES = tuple(getattr(ast, x) for x in ("Try", "TryStar") if hasattr(ast, x))
+MATCH_NODES = tuple(getattr(ast, x) for x in ("Match",) if hasattr(ast, x))
+
+_NEWLINE = re.compile(r"\r\n|\r|\n")
+
+
+@dataclass(eq=False)
+class Scope:
+    """ The names bound in a scope, found before its control flow is analysed """
+
+    kind: str
+    parent: Optional["Scope"]
+    bound: Set[str] = field(default_factory=set)
+    global_names: Set[str] = field(default_factory=set)
+    nonlocal_names: Set[str] = field(default_factory=set)
+    # Names assigned by functions which declare them 'global' (module scope only)
+    external: Set[str] = field(default_factory=set)
+    imports: Dict[str, List[str]] = field(default_factory=dict)
+    plain: Set[str] = field(default_factory=set)
+    functions: Dict[str, List[_FunctionNode]] = field(default_factory=dict)
+    generator: bool = False
+
+    def is_local(self, name: str) -> bool:
+        return (
+            name in self.bound
+            and name not in self.global_names
+            and name not in self.nonlocal_names
+        )
+
+    @property
+    def module(self) -> "Scope":
+        scope = self
+        while scope.parent is not None:
+            scope = scope.parent
+        return scope
+
+
+class Binder(ast.NodeVisitor):
+    """ Finds the scopes of a module, and the names bound in each of them """
+
+    def __init__(self) -> None:
+        self.scopes: Dict[ast.AST, Scope] = {}
+        self.scope = Scope(MODULE, None)
+        self.import_star = False
+
+    def bind(self, name: str, scope: Optional[Scope] = None) -> None:
+        scope = scope or self.scope
+        scope.bound.add(name)
+        scope.plain.add(name)
+
+    def _enter(self, node: _ScopeNode, kind: str) -> Scope:
+        scope = self.scopes[node] = Scope(kind, self.scope)
+        self.scope = scope
+        return scope
+
+    def _leave(self, scope: Scope) -> None:
+        module = scope.module
+        for name in scope.global_names & scope.bound:
+            module.bound.add(name)
+            module.plain.add(name)
+            module.external.add(name)
+        assert scope.parent is not None
+        self.scope = scope.parent
+
+    def visit_Module(self, node: ast.Module) -> None:
+        self.scopes[node] = self.scope
+        self.generic_visit(node)
+
+    def visit_Name(self, node: ast.Name) -> None:
+        if not isinstance(node.ctx, ast.Load):
+            self.bind(node.id)
+
+    def _visit_function(self, node: Union[_FunctionNode, ast.Lambda]) -> None:
+        if not isinstance(node, ast.Lambda):
+            self.bind(node.name)
+            self.scope.functions.setdefault(node.name, []).append(node)
+            self._visit_all(node.decorator_list)
+            if node.returns is not None:
+                self.visit(node.returns)
+        self._visit_arguments(node.args)
+
+        scope = self._enter(node, FUNCTION)
+        for arg in _all_args(node.args):
+            self.bind(arg.arg)
+        if isinstance(node, ast.Lambda):
+            self.visit(node.body)
+        else:
+            self._visit_all(node.body)
+        self._leave(scope)
+
+    visit_FunctionDef = visit_AsyncFunctionDef = visit_Lambda = _visit_function
+
+    def _visit_arguments(self, node: ast.arguments) -> None:
+        # Defaults and annotations are evaluated in the enclosing scope
+        self._visit_all(node.defaults)
+        self._visit_all([x for x in node.kw_defaults if x is not None])
+        self._visit_all([x.annotation for x in _all_args(node) if x.annotation])
+
+    def visit_ClassDef(self, node: ast.ClassDef) -> None:
+        self.bind(node.name)
+        self._visit_all(node.decorator_list)
+        self._visit_all(node.bases)
+        self._visit_all(node.keywords)
+
+        scope = self._enter(node, CLASS)
+        self._visit_all(node.body)
+        self._leave(scope)
+
+    def _visit_comprehension(self, node: _Comprehension) -> None:
+        first, *rest = node.generators
+        # The first iterable is evaluated in the enclosing scope
+        self.visit(first.iter)
+
+        scope = self._enter(node, COMPREHENSION)
+        self.visit(first.target)
+        self._visit_all(first.ifs)
+        self._visit_all(rest)
+        if isinstance(node, ast.DictComp):
+            self.visit(node.key)
+            self.visit(node.value)
+        else:
+            self.visit(node.elt)
+        self._leave(scope)
+
+    visit_ListComp = visit_SetComp = _visit_comprehension
+    visit_DictComp = visit_GeneratorExp = _visit_comprehension
+
+    def visit_NamedExpr(self, node: "ast.NamedExpr") -> None:
+        self.visit(node.value)
+        # Assignment expressions bind in the scope enclosing any comprehensions
+        scope = self.scope
+        while scope.kind == COMPREHENSION and scope.parent is not None:
+            scope = scope.parent
+        self.bind(node.target.id, scope)
+
+    def visit_Global(self, node: ast.Global) -> None:
+        if self.scope.kind != MODULE:
+            self.scope.global_names.update(node.names)
+
+    def visit_Nonlocal(self, node: ast.Nonlocal) -> None:
+        self.scope.nonlocal_names.update(node.names)
+
+    def visit_Import(self, node: ast.Import) -> None:
+        for alias in node.names:
+            if alias.asname:
+                self._bind_import(alias.asname, alias.name)
+            else:
+                name = alias.name.split(".")[0]
+                self._bind_import(name, name)
+
+    def visit_ImportFrom(self, node: ast.ImportFrom) -> None:
+        module = "." * node.level + (node.module or "")
+        separator = "" if module.endswith(".") else "."
+        for alias in node.names:
+            if alias.name == "*":
+                self.import_star = True
+            else:
+                self._bind_import(
+                    alias.asname or alias.name, f"{module}{separator}{alias.name}"
+                )
+
+    def _bind_import(self, name: str, qualified_name: str) -> None:
+        self.scope.bound.add(name)
+        self.scope.imports.setdefault(name, []).append(qualified_name)
+
+    def visit_ExceptHandler(self, node: ast.ExceptHandler) -> None:
+        if node.name is not None:
+            self.bind(node.name)
+        self.generic_visit(node)
+
+    def visit_MatchAs(self, node: "ast.MatchAs") -> None:
+        if node.name is not None:
+            self.bind(node.name)
+        self.generic_visit(node)
+
+    def visit_MatchStar(self, node: "ast.MatchStar") -> None:
+        if node.name is not None:
+            self.bind(node.name)
+
+    def visit_MatchMapping(self, node: "ast.MatchMapping") -> None:
+        if node.rest is not None:
+            self.bind(node.rest)
+        self.generic_visit(node)
+
+    def visit_Yield(self, node: ast.Yield) -> None:
+        self.scope.generator = True
+        self.generic_visit(node)
+
+    def visit_YieldFrom(self, node: ast.YieldFrom) -> None:
+        self.scope.generator = True
+        self.generic_visit(node)
+
+    def _visit_all(self, nodes: Sequence[ast.AST]) -> None:
+        for node in nodes:
+            self.visit(node)
+
+
+def _all_args(node: ast.arguments) -> List[ast.arg]:
+    args = [*node.posonlyargs, *node.args, *node.kwonlyargs]
+    if node.vararg:
+        args.append(node.vararg)
+    if node.kwarg:
+        args.append(node.kwarg)
+    return args
+
+
+def _dotted_name(node: ast.AST) -> Optional[str]:
+    if isinstance(node, ast.Name):
+        return node.id
+    if isinstance(node, ast.Attribute):
+        value = _dotted_name(node.value)
+        return None if value is None else f"{value}.{node.attr}"
+    return None
+
+
+def _is_constant_true(node: ast.expr) -> bool:
+    return isinstance(node, ast.Constant) and bool(node.value) and node.value != ...
+
+
+def _is_irrefutable(case: "ast.match_case") -> bool:
+    pattern = case.pattern
+    while isinstance(pattern, ast.MatchAs) and pattern.pattern is not None:
+        pattern = pattern.pattern
+    if isinstance(pattern, ast.MatchOr):
+        return case.guard is None and any(
+            isinstance(x, ast.MatchAs) and x.pattern is None for x in pattern.patterns
+        )
+    return case.guard is None and isinstance(pattern, ast.MatchAs)
+
+
+class Block:
+    """ A basic block, and the names it assigns and accesses, in order """
+
+    __slots__ = ("index", "predecessors", "events", "union", "state")
+
+    def __init__(self, index: int, predecessors: List["Block"]):
+        self.index = index
+        self.predecessors = predecessors
+        # (mask, None) for an assignment, and (mask, node) for an access
+        self.events: List[Tuple[int, Optional[ast.Name]]] = []
+        # A block whose assigned names are also assigned at the start of this one
+        self.union: Optional[Block] = None
+        # The names definitely assigned at the end of the block
+        self.state = 0
+
+
+class _Loop:
+    def __init__(self, head: Block):
+        self.head = head
+        self.breaks: List[Optional[Block]] = []
+
+
+class Analysis:
+    """ The analysis of a module """
+
+    def __init__(self, tree: ast.Module, binder: Binder):
+        self.tree = tree
+        self.scopes = binder.scopes
+
+        self.undefined: List[ast.Name] = []
+        self.undefined_in_strings: List[str] = []
+
+        self._terminal: Dict[_FunctionNode, bool] = {}
+        self._in_progress: List[_FunctionNode] = []
+        self._depends_on = 0
+
+    def run(self) -> None:
+        FlowBuilder(self, self.scopes[self.tree]).build(self.tree.body)
+
+    # Name resolution
+
+    def resolve(self, scope: Scope, name: str) -> Optional[Scope]:
+        """ Return the scope which binds a name, as seen from within 'scope' """
+        current: Optional[Scope] = scope
+        while current is not None:
+            if current.kind == MODULE:
+                return current if name in current.bound else None
+            if name in current.global_names:
+                module = current.module
+                return module if name in module.bound else None
+            if (current is scope or current.kind != CLASS) and current.is_local(name):
+                return current
+            current = current.parent
+        return None
+
+    def is_defined(self, scope: Scope, name: str) -> bool:
+        """ Return true if a name is bound anywhere visible from 'scope' """
+        return self.resolve(scope, name) is not None or hasattr(builtins, name)
+
+    def qualified_names(self, scope: Scope, node: ast.AST) -> Set[str]:
+        """ Return the qualified names of a name or attribute, e.g. 'sys.exit' """
+        full_name = _dotted_name(node)
+        if full_name is None:
+            return set()
+        head, _, rest = full_name.partition(".")
+        suffix = f".{rest}" if rest else ""
+
+        owner = self.resolve(scope, head)
+        if owner is None:
+            return {f"builtins.{full_name}"} if hasattr(builtins, head) else set()
+
+        names = {f"{x}{suffix}" for x in owner.imports.get(head, [])}
+        if head in owner.plain:
+            names.add(LOCAL)
+        return names
+
+    # Terminal functions
+
+    def is_exit_call(self, scope: Scope, node: ast.stmt) -> bool:
+        """ Return true if a statement is a call which always exits the application """
+        if not isinstance(node, ast.Expr) or not isinstance(node.value, ast.Call):
+            return False
+        func = node.value.func
+
+        # Builtin exit functions, and those elsewhere in the project
+        if any(is_exit_function(x) for x in self.qualified_names(scope, func)):
+            return True
+
+        if isinstance(func, ast.Name):
+            owner = self.resolve(scope, func.id)
+            if owner is not None:
+                for function in owner.functions.get(func.id, []):
+                    if self.is_terminal_function(function, owner):
+                        return True
+        return False
+
+    def is_terminal_function(self, node: _FunctionNode, scope: Scope) -> bool:
+        """
+        Return true if calling a function, defined in 'scope', never returns.
+
+        Recursive calls are assumed to return, unless something else makes the function
+        terminal, and results which rely on that assumption about another function are
+        only remembered once that function has been decided.
+        """
+        try:
+            return self._terminal[node]
+        except KeyError:
+            pass
+
+        if node in self._in_progress:
+            self._depends_on = min(self._depends_on, self._in_progress.index(node))
+            return False
+
+        # Calling an async function or a generator doesn't run its body
+        if isinstance(node, ast.AsyncFunctionDef) or self.scopes[node].generator:
+            self._terminal[node] = False
+            return False
+
+        if node.returns is not None:
+            if self.qualified_names(scope, node.returns) in NO_RETURN:
+                self._terminal[node] = True
+                return True
+
+        position = len(self._in_progress)
+        self._in_progress.append(node)
+        depends_on, self._depends_on = self._depends_on, position
+        try:
+            flags = self.exits(self.scopes[node], node.body)
+            terminal = not flags & (COMPLETES | RETURNS)
+        finally:
+            self._in_progress.pop()
+
+        if terminal or self._depends_on >= position:
+            self._terminal[node] = terminal
+        self._depends_on = min(self._depends_on, depends_on)
+        return terminal
+
+    def exits(self, scope: Scope, body: Sequence[ast.stmt]) -> int:
+        """ Return how control can leave a sequence of statements """
+        flags = 0
+        for statement in body:
+            statement_flags = self._exits(scope, statement)
+            flags |= statement_flags & ~COMPLETES
+            if not statement_flags & COMPLETES:
+                return flags
+        return flags | COMPLETES
+
+    def _exits(self, scope: Scope, node: ast.stmt) -> int:
+        if isinstance(node, ast.Return):
+            return RETURNS
+        if isinstance(node, ast.Break):
+            return BREAKS
+        if isinstance(node, (ast.Raise, ast.Continue)):
+            return 0
+        if isinstance(node, ast.Expr):
+            return 0 if self.is_exit_call(scope, node) else COMPLETES
+        if isinstance(node, ast.If):
+            if self.is_conditional_typing_import(scope, node):
+                return self.exits(scope, node.body)
+            return self.exits(scope, node.body) | self.exits(scope, node.orelse)
+        if isinstance(node, (ast.For, ast.AsyncFor, ast.While)):
+            body = self.exits(scope, node.body)
+            flags = body & RETURNS
+            if isinstance(node, ast.While) and _is_constant_true(node.test):
+                return flags | (COMPLETES if body & BREAKS else 0)
+            orelse = self.exits(scope, node.orelse)
+            if body & BREAKS:
+                flags |= COMPLETES
+            return flags | orelse
+        if isinstance(node, (ast.With, ast.AsyncWith)):
+            return self.exits(scope, node.body)
+        if isinstance(node, TRY_NODES):
+            node = cast(ast.Try, node)
+            body = self.exits(scope, node.body)
+            flags = body & ~COMPLETES
+            if body & COMPLETES:
+                flags |= self.exits(scope, node.orelse)
+            for handler in node.handlers:
+                flags |= self.exits(scope, handler.body)
+            if node.finalbody:
+                final = self.exits(scope, node.finalbody)
+                if not final & COMPLETES:
+                    return final
+                flags |= final & ~COMPLETES
+            return flags
+        if isinstance(node, MATCH_NODES):
+            node = cast("ast.Match", node)
+            flags = 0 if any(_is_irrefutable(x) for x in node.cases) else COMPLETES
+            for case in node.cases:
+                flags |= self.exits(scope, case.body)
+            return flags
+        return COMPLETES
+
+    def is_conditional_typing_import(self, scope: Scope, node: ast.If) -> bool:
+        """ Return true if an if statement was a truth check of typing.TYPE_CHECKING """
+        if node.orelse:
+            return False
+
+        tested = node.test
+        if (
+            isinstance(tested, ast.Compare)
+            and len(tested.ops) == 1
+            and isinstance(tested.ops[0], (ast.Is, ast.Eq))
+            and isinstance(tested.comparators[0], ast.Constant)
+            and tested.comparators[0].value is True
+        ):
+            tested = tested.left
+
+        return self.qualified_names(scope, tested) == TYPE_CHECKING
+
+
+class FlowBuilder(ast.NodeVisitor):
+    """ Builds the control flow graph of a scope, then finds any unassigned names """
+
+    def __init__(self, analysis: Analysis, scope: Scope):
+        self.analysis = analysis
+        self.scope = scope
+
+        self.blocks: List[Block] = []
+        self.current: Optional[Block] = self._block()
+        self.bits: Dict[str, int] = {}
+        self.loops: List[_Loop] = []
+
+        # Whether assignments in the current expression always happen
+        self._definite = True
+        self._in_annotation = False
+        self._in_type_hint = False
+        self._in_literal = False
+
+    def build(self, body: Sequence[ast.AST]) -> None:
+        for node in body:
+            self.visit(node)
+        self.analyse()
+
+    # The graph
+
+    def _block(self, *predecessors: Optional[Block]) -> Block:
+        block = Block(len(self.blocks), [x for x in predecessors if x is not None])
+        self.blocks.append(block)
+        return block
+
+    def _join(self, *predecessors: Optional[Block]) -> Optional[Block]:
+        """ Start a block after some others, or return None if none of them are reachable """
+        if not any(x is not None for x in predecessors):
+            return None
+        return self._block(*predecessors)
+
+    def _here(self) -> Block:
+        """ The current block, which is new (and unreachable) after a jump """
+        if self.current is None:
+            self.current = self._block()
+        return self.current
+
+    def _mask(self, name: str) -> int:
+        try:
+            return self.bits[name]
+        except KeyError:
+            mask = self.bits[name] = 1 << len(self.bits)
+            return mask
+
+    def assign(self, name: str) -> None:
+        if self._definite and self.scope.is_local(name):
+            self._here().events.append((self._mask(name), None))
+
+    def access(self, node: ast.Name) -> None:
+        name = node.id
+        if name in EXCEPTIONS:
+            return
+        if self.scope.is_local(name):
+            self._here().events.append((self._mask(name), node))
+        elif not self.analysis.is_defined(self.scope, name):
+            self.analysis.undefined.append(node)
+
+    def analyse(self) -> None:
+        """ Find the names which are definitely assigned in each block, in one pass """
+        everything = (1 << len(self.bits)) - 1
+        for block in self.blocks:
+            # Only forward edges are considered: names assigned around a loop were
+            # already assigned when it was entered
+            predecessors = [
+                x.state for x in block.predecessors if x.index < block.index
+            ]
+            if block.index == 0:
+                state = 0
+            elif predecessors:
+                state = reduce(int.__and__, predecessors)
+            else:
+                # Unreachable, so everything is vacuously assigned
+                state = everything
+            if block.union is not None:
+                state |= block.union.state
+
+            for mask, node in block.events:
+                if node is None:
+                    state |= mask
+                elif not state & mask:
+                    self._unassigned(node)
+            block.state = state
+
+    def _unassigned(self, node: ast.Name) -> None:
+        """ Handle an access of a local name which may not be assigned yet """
+        name = node.id
+        scope = self.scope
+        if scope.kind == MODULE:
+            # Functions might have assigned it, or it's a builtin
+            if name in scope.external or hasattr(builtins, name):
+                return
+        elif scope.kind == CLASS:
+            # Class bodies fall back to the enclosing scopes
+            assert scope.parent is not None
+            if self.analysis.is_defined(scope.parent, name):
+                return
+        self.analysis.undefined.append(node)
+
+    # Statements
+
+    def visit_FunctionDef(self, node: _FunctionNode) -> None:
+        self._visit_all(node.decorator_list)
+        self._visit_arguments(node.args)
+        if node.returns is not None:
+            self._visit_annotation(node.returns)
+        self.assign(node.name)
+
+        builder = FlowBuilder(self.analysis, self.analysis.scopes[node])
+        for arg in _all_args(node.args):
+            builder.assign(arg.arg)
+        builder.build(node.body)
+
+    visit_AsyncFunctionDef = visit_FunctionDef
+
+    def visit_Lambda(self, node: ast.Lambda) -> None:
+        self._visit_arguments(node.args)
+
+        builder = FlowBuilder(self.analysis, self.analysis.scopes[node])
+        for arg in _all_args(node.args):
+            builder.assign(arg.arg)
+        builder.build([node.body])
+
+    def _visit_arguments(self, node: ast.arguments) -> None:
+        self._visit_all(node.defaults)
+        self._visit_all([x for x in node.kw_defaults if x is not None])
+        for arg in _all_args(node):
+            if arg.annotation is not None:
+                self._visit_annotation(arg.annotation)
+
+    def visit_ClassDef(self, node: ast.ClassDef) -> None:
+        self._visit_all(node.decorator_list)
+        self._visit_all(node.bases)
+        self._visit_all(node.keywords)
+        FlowBuilder(self.analysis, self.analysis.scopes[node]).build(node.body)
+        self.assign(node.name)
+
+    def visit_Return(self, node: ast.Return) -> None:
+        if node.value is not None:
+            self.visit(node.value)
+        self.current = None
+
+    def visit_Raise(self, node: ast.Raise) -> None:
+        self.generic_visit(node)
+        self.current = None
+
+    def visit_Break(self, node: ast.Break) -> None:
+        if self.loops:
+            self.loops[-1].breaks.append(self.current)
+        self.current = None
+
+    def visit_Continue(self, node: ast.Continue) -> None:
+        if self.loops and self.current is not None:
+            self.loops[-1].head.predecessors.append(self.current)
+        self.current = None
+
+    def visit_Expr(self, node: ast.Expr) -> None:
+        self.visit(node.value)
+        if self.analysis.is_exit_call(self.scope, node):
+            self.current = None
+
+    def visit_Assign(self, node: ast.Assign) -> None:
+        self.visit(node.value)
+        self._visit_all(node.targets)
+
+    def visit_AugAssign(self, node: ast.AugAssign) -> None:
+        if isinstance(node.target, ast.Name):
+            self.access(node.target)
+        self.visit(node.value)
+        self.visit(node.target)
+
+    def visit_AnnAssign(self, node: ast.AnnAssign) -> None:
+        self._visit_annotation(node.annotation)
+        if node.value is not None:
+            self.visit(node.value)
+            self.visit(node.target)
+        elif not isinstance(node.target, ast.Name):
+            self.visit(node.target)
+
+    def visit_Import(self, node: Union[ast.Import, ast.ImportFrom]) -> None:
+        for alias in node.names:
+            name = alias.asname or alias.name.split(".")[0]
+            self.assign(name)
+
+    visit_ImportFrom = visit_Import
+
+    def visit_If(self, node: ast.If) -> None:
+        self.visit(node.test)
+
+        if self.analysis.is_conditional_typing_import(self.scope, node):
+            # Imports for type checking are always considered available
+            self._visit_all(node.body)
+            return
+
+        condition = self.current
+        self.current = self._block(condition)
+        self._visit_all(node.body)
+        body = self.current
+
+        self.current = self._block(condition)
+        self._visit_all(node.orelse)
+        self.current = self._join(body, self.current)
+
+    def visit_While(self, node: ast.While) -> None:
+        self.current = self._block(self.current)
+        self.visit(node.test)
+        test = self.current
+
+        loop = self._loop(test, node.body)
+        if _is_constant_true(node.test):
+            self.current = None
+        else:
+            self.current = self._block(test)
+            self._visit_all(node.orelse)
+        self.current = self._join(self.current, *loop.breaks)
+
+    def visit_For(self, node: Union[ast.For, ast.AsyncFor]) -> None:
+        self.visit(node.iter)
+        head = self._block(self.current)
+        self.current = head
+        # The target is treated as assigned even if the iterable is empty
+        self.visit(node.target)
+
+        loop = self._loop(head, node.body)
+        self.current = self._block(head)
+        self._visit_all(node.orelse)
+        self.current = self._join(self.current, *loop.breaks)
+
+    visit_AsyncFor = visit_For
+
+    def _loop(self, head: Optional[Block], body: Sequence[ast.stmt]) -> _Loop:
+        loop_head = self._block(head)
+        loop = _Loop(loop_head)
+        self.current = loop_head
+
+        self.loops.append(loop)
+        self._visit_all(body)
+        self.loops.pop()
+
+        if self.current is not None:
+            loop_head.predecessors.append(self.current)
+        return loop
+
+    def visit_Try(self, node: ast.Try) -> None:
+        # An exception could be raised before anything in the body, so handlers
+        # (and finally blocks) start with whatever was assigned before the try
+        entry = self._here()
+
+        self.current = self._block(entry)
+        self._visit_all(node.body)
+        self._visit_all(node.orelse)
+        completed = [self.current]
+
+        for handler in node.handlers:
+            self.current = self._block(entry)
+            if handler.type is not None:
+                self.visit(handler.type)
+            if handler.name is not None:
+                self.assign(handler.name)
+            self._visit_all(handler.body)
+            completed.append(self.current)
+
+        if not node.finalbody:
+            self.current = self._join(*completed)
+            return
+
+        normal = self._join(*completed)
+
+        # The finally block runs on every path, including when an exception escapes
+        self.current = self._block(entry, *completed)
+        self._visit_all(node.finalbody)
+
+        if self.current is not None and normal is not None:
+            # After it, anything assigned on every path which completed the try is assigned,
+            # as well as anything assigned by the finally block itself
+            after = self._block(self.current)
+            after.union = normal
+            self.current = after
+        else:
+            self.current = None
+
+    def visit_TryStar(self, node: "ast.TryStar") -> None:
+        self.visit_Try(cast(ast.Try, node))
+
+    def visit_With(self, node: Union[ast.With, ast.AsyncWith]) -> None:
+        for item in node.items:
+            self.visit(item.context_expr)
+            if item.optional_vars is not None:
+                self.visit(item.optional_vars)
+        self._visit_all(node.body)
+
+    visit_AsyncWith = visit_With
+
+    def visit_Match(self, node: "ast.Match") -> None:
+        self.visit(node.subject)
+        subject = self.current
+
+        completed: List[Optional[Block]] = []
+        for case in node.cases:
+            self.current = self._block(subject)
+            self.visit(case.pattern)
+            if case.guard is not None:
+                self.visit(case.guard)
+            self._visit_all(case.body)
+            completed.append(self.current)
+
+        if not any(_is_irrefutable(x) for x in node.cases):
+            completed.append(subject)
+        self.current = self._join(*completed)
+
+    def visit_MatchAs(self, node: "ast.MatchAs") -> None:
+        if node.pattern is not None:
+            self.visit(node.pattern)
+        if node.name is not None:
+            self.assign(node.name)
+
+    def visit_MatchStar(self, node: "ast.MatchStar") -> None:
+        if node.name is not None:
+            self.assign(node.name)
+
+    def visit_MatchMapping(self, node: "ast.MatchMapping") -> None:
+        self._visit_all(node.keys)
+        self._visit_all(node.patterns)
+        if node.rest is not None:
+            self.assign(node.rest)
+
+    def visit_Global(self, node: ast.Global) -> None:
+        pass
+
+    def visit_Nonlocal(self, node: ast.Nonlocal) -> None:
+        pass
+
+    # Expressions
+
+    def visit_Name(self, node: ast.Name) -> None:
+        if isinstance(node.ctx, ast.Store):
+            self.assign(node.id)
+        else:
+            self.access(node)
+
+    def visit_NamedExpr(self, node: "ast.NamedExpr") -> None:
+        self.visit(node.value)
+        if self.scope.kind != COMPREHENSION:
+            self.assign(node.target.id)
+
+    def visit_BoolOp(self, node: ast.BoolOp) -> None:
+        first, *rest = node.values
+        self.visit(first)
+        with self._maybe():
+            self._visit_all(rest)
+
+    def visit_IfExp(self, node: ast.IfExp) -> None:
+        self.visit(node.test)
+        with self._maybe():
+            self.visit(node.body)
+            self.visit(node.orelse)
+
+    def _maybe(self) -> "_Maybe":
+        return _Maybe(self)
+
+    def _visit_comprehension(self, node: _Comprehension) -> None:
+        first, *rest = node.generators
+        self.visit(first.iter)
+
+        builder = FlowBuilder(self.analysis, self.analysis.scopes[node])
+        builder.visit(first.target)
+        builder._visit_all(first.ifs)
+        for generator in rest:
+            builder.visit(generator.iter)
+            builder.visit(generator.target)
+            builder._visit_all(generator.ifs)
+        if isinstance(node, ast.DictComp):
+            builder.build([node.key, node.value])
+        else:
+            builder.build([node.elt])
+
+    visit_ListComp = visit_SetComp = _visit_comprehension
+    visit_DictComp = visit_GeneratorExp = _visit_comprehension
+
+    def visit_JoinedStr(self, node: ast.JoinedStr) -> None:
+        for value in node.values:
+            if isinstance(value, ast.FormattedValue):
+                self.visit(value)
+
+    # Annotations, and strings within them
+
+    def _visit_annotation(self, node: ast.expr) -> None:
+        in_annotation, self._in_annotation = self._in_annotation, True
+        self.visit(node)
+        self._in_annotation = in_annotation
+
+    def visit_Subscript(self, node: ast.Subscript) -> None:
+        self.visit(node.value)
+
+        names = self.analysis.qualified_names(self.scope, node.value)
+        in_type_hint, in_literal = self._in_type_hint, self._in_literal
+        self._in_type_hint = any(
+            x.startswith(("typing.", "typing_extensions.")) for x in names
+        )
+        self._in_literal = in_literal or bool(
+            names & {"typing.Literal", "typing_extensions.Literal"}
+        )
+        self.visit(node.slice)
+        self._in_type_hint, self._in_literal = in_type_hint, in_literal
+
+    def visit_Call(self, node: ast.Call) -> None:
+        self.visit(node.func)
+        names = self.analysis.qualified_names(self.scope, node.func)
+
+        in_type_hint = self._in_type_hint
+        self._in_type_hint = False
+        args: List[ast.expr] = [*node.args, *(x.value for x in node.keywords)]
+        for i, arg in enumerate(args):
+            if "typing.cast" in names:
+                self._in_type_hint = i == 0
+            elif names & {"typing.NewType", "typing.TypeVar"}:
+                self._in_type_hint = i > 0
+            self.visit(arg)
+        self._in_type_hint = in_type_hint
+
+    def visit_Constant(self, node: ast.Constant) -> None:
+        if (
+            isinstance(node.value, str)
+            and node.value
+            and (self._in_annotation or self._in_type_hint)
+            and not self._in_literal
+        ):
+            try:
+                parsed = parse_expression(node.value.strip())
+            except (SyntaxError, ValueError):
+                # Unparseable string annotations are ignored, as they are by CPython
+                return
+
+            # String annotations are evaluated lazily, if at all, so they may refer to
+            # anything defined in the module (but have no location of their own)
+            for child in ast.walk(parsed):
+                if isinstance(child, ast.Name) and child.id not in EXCEPTIONS:
+                    if not self.analysis.is_defined(self.scope, child.id):
+                        self.analysis.undefined_in_strings.append(child.id)
+
+    def _visit_all(self, nodes: Sequence[ast.AST]) -> None:
+        for node in nodes:
+            self.visit(node)
+
+
+class _Maybe:
+    """ Within this context, assignments only happen on some paths """
+
+    def __init__(self, builder: FlowBuilder):
+        self.builder = builder
+
+    def __enter__(self) -> None:
+        self.definite = self.builder._definite
+        self.builder._definite = False
+
+    def __exit__(self, *args: object) -> None:
+        self.builder._definite = self.definite
+
+
+def check(code: str) -> List[BaseWarning]:
+    """ Return a list of warnings related to some Python code, using dataflow analysis """
+    with phase("parse"):
+        tree = parse(code)
+
+    with phase("bindings"):
+        binder = Binder()
+        binder.visit(tree)
+    if binder.import_star:
+        return [ImportStarWarning()]
+
+    with phase("dataflow"):
+        analysis = Analysis(tree, binder)
+        analysis.run()
+
+    warnings: List[BaseWarning] = []
+    if analysis.undefined:
+        with phase("positions"):
+            lines = _NEWLINE.split(code)
+            ignored_lines = prescan(code).ignored_lines
+            undefined = sorted(
+                analysis.undefined, key=lambda x: (x.lineno, x.col_offset)
+            )
+            for node in undefined:
+                if node.lineno not in ignored_lines:
+                    line = lines[node.lineno - 1].encode()
+                    column = len(line[: node.col_offset].decode())
+                    warnings.append(
+                        RefWarning(line=node.lineno, column=column, reference=node.id)
+                    )
+
+    warnings.extend(
+        NoLocationRefWarning(reference=x) for x in analysis.undefined_in_strings
+    )
+    return warnings
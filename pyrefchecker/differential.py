@@ -0,0 +1,68 @@
+from collections import Counter
+from dataclasses import dataclass
+from typing import Counter as CounterType
+from typing import List, Optional, Tuple, Union
+
+from .check import ENGINES, check
+from .warnings import BaseWarning
+
+# What an engine produced: either its warnings, or the exception it raised
+_Result = Union[CounterType[BaseWarning], Tuple[str, str]]
+
+
+@dataclass(frozen=True)
+class Divergence:
+    """ A difference between the results of two engines for the same code """
+
+    reference: str
+    candidate: str
+    missing: List[str]
+    unexpected: List[str]
+
+    def __str__(self) -> str:
+        lines = [f"{self.candidate} engine disagrees with {self.reference} engine"]
+        lines += [f"    missing: {x}" for x in self.missing]
+        lines += [f"    unexpected: {x}" for x in self.unexpected]
+        return "\n".join(lines)
+
+
+def _run(code: str, engine: str) -> _Result:
+    try:
+        return Counter(check(code, engine=engine))
+    except Exception as e:
+        # Engines agree if they both fail to process some code
+        return ("failed to process", type(e).__name__)
+
+
+def compare_engines(
+    code: str, reference: str = ENGINES[0], candidate: str = ENGINES[1]
+) -> Optional[Divergence]:
+    """
+    Check some code with two engines, and return how their warnings differ, if at all.
+    Warnings are compared regardless of their order.
+    """
+    expected = _run(code, reference)
+    actual = _run(code, candidate)
+    if expected == actual:
+        return None
+
+    if isinstance(expected, tuple) or isinstance(actual, tuple):
+        return Divergence(
+            reference=reference,
+            candidate=candidate,
+            missing=[_describe(expected)],
+            unexpected=[_describe(actual)],
+        )
+
+    return Divergence(
+        reference=reference,
+        candidate=candidate,
+        missing=[repr(x) for x in (expected - actual).elements()],
+        unexpected=[repr(x) for x in (actual - expected).elements()],
+    )
+
+
+def _describe(result: _Result) -> str:
+    if isinstance(result, tuple):
+        return "{} ({})".format(*result)
+    return ", ".join(repr(x) for x in result.elements()) or "no warnings"
@@ -0,0 +1,167 @@
+"""
+Functions which never return, across the modules of a project.
+
+Each engine works out which functions in the module being checked are terminal, but
+only knows the builtin exit functions from elsewhere. This module summarizes each
+module of a project on its own (so that summaries can be cached by content), then
+works out which functions are terminal across all of them, so that calls to e.g.
+`from app.errors import abort` end a branch just like `sys.exit` does.
+
+The engines consult the project's terminal functions, which a process sets once
+with 'set_project_exits', e.g. when a worker starts.
+"""
+
+import ast
+import json
+from dataclasses import dataclass, field
+from typing import Dict, FrozenSet, Iterable, List, Mapping, Optional, Tuple, Union
+
+from .modules import absolute_name, package_name
+
+EXIT_FUNCTIONS = frozenset({"sys.exit", "os._exit"})
+
+NO_RETURN = frozenset({"typing.NoReturn", "typing_extensions.NoReturn"})
+
+# The qualified names of terminal functions defined elsewhere in the project
+_project_exits: FrozenSet[str] = frozenset()
+
+
+def set_project_exits(names: Iterable[str]) -> None:
+    """ Set the qualified names of the project's terminal functions, for this process """
+    global _project_exits
+    _project_exits = frozenset(names)
+
+
+def project_exits() -> FrozenSet[str]:
+    return _project_exits
+
+
+def is_exit_function(qualified_name: str) -> bool:
+    """ Return true if an imported function with this name never returns """
+    return qualified_name in EXIT_FUNCTIONS or qualified_name in _project_exits
+
+
+@dataclass(frozen=True)
+class ExitSummary:
+    """
+    What a module contributes to the project's terminal functions, by qualified name:
+    its functions, with whether they're annotated NoReturn and what their bodies call,
+    and the names it imports (which others may import from it in turn).
+    """
+
+    functions: Dict[str, Tuple[bool, List[str]]] = field(default_factory=dict)
+    aliases: Dict[str, str] = field(default_factory=dict)
+
+
+def summarize_exits(
+    tree: ast.Module, module: str, is_package: bool = False
+) -> ExitSummary:
+    """
+    Summarize the top level of a parsed module.
+    'is_package' is true for an __init__ module, which relative imports are relative to.
+    """
+    package = package_name(module, is_package)
+
+    # Names bound at the top level, and the qualified names they refer to
+    names: Dict[str, str] = {}
+    aliases: Dict[str, str] = {}
+    defined: List[Union[ast.FunctionDef, ast.AsyncFunctionDef]] = []
+    for node in tree.body:
+        if isinstance(node, ast.Import):
+            for alias in node.names:
+                if alias.asname:
+                    names[alias.asname] = aliases[alias.asname] = alias.name
+                else:
+                    head = alias.name.split(".")[0]
+                    names[head] = head
+        elif isinstance(node, ast.ImportFrom):
+            source = absolute_name(node.module, node.level, package)
+            if source is None:
+                continue
+            for alias in node.names:
+                if alias.name != "*":
+                    name = alias.asname or alias.name
+                    names[name] = aliases[name] = f"{source}.{alias.name}"
+        elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            names[node.name] = f"{module}.{node.name}"
+            aliases.pop(node.name, None)
+            defined.append(node)
+
+    functions: Dict[str, Tuple[bool, List[str]]] = {}
+    for function in defined:
+        # Calling an async function doesn't run its body
+        if isinstance(function, ast.AsyncFunctionDef):
+            continue
+        no_return = _resolve(function.returns, names) in NO_RETURN
+        calls = []
+        for statement in function.body:
+            if isinstance(statement, ast.Expr) and isinstance(
+                statement.value, ast.Call
+            ):
+                called = _resolve(statement.value.func, names)
+                if called is not None:
+                    calls.append(called)
+        functions[function.name] = (no_return, calls)
+
+    return ExitSummary(
+        functions={f"{module}.{k}": v for k, v in functions.items()},
+        aliases={f"{module}.{k}": v for k, v in aliases.items()},
+    )
+
+
+def terminal_functions(summaries: Iterable[ExitSummary]) -> FrozenSet[str]:
+    """
+    Return the qualified names of the terminal functions of a project: those annotated
+    NoReturn, those whose bodies call a terminal function, and the names they're
+    imported by elsewhere in the project.
+    """
+    functions: Dict[str, Tuple[bool, List[str]]] = {}
+    aliases: Dict[str, str] = {}
+    for summary in summaries:
+        functions.update(summary.functions)
+        aliases.update(summary.aliases)
+
+    terminal = set(EXIT_FUNCTIONS)
+    # Names which become terminal when a name they depend on does
+    dependents: Dict[str, List[str]] = {}
+    pending = []
+    for name, (no_return, calls) in functions.items():
+        if no_return:
+            pending.append(name)
+        for called in calls:
+            dependents.setdefault(called, []).append(name)
+    for name, target in aliases.items():
+        dependents.setdefault(target, []).append(name)
+    for name in EXIT_FUNCTIONS:
+        pending.extend(dependents.get(name, []))
+
+    while pending:
+        name = pending.pop()
+        if name in terminal:
+            continue
+        terminal.add(name)
+        pending.extend(dependents.get(name, []))
+
+    return frozenset(terminal - EXIT_FUNCTIONS)
+
+
+def key_content(content: bytes, exits: Iterable[str]) -> bytes:
+    """
+    Return the contents of a file with the project's terminal functions which it may
+    call in front of them, e.g. to key its results on, so that changes to the others
+    don't change its key. A call can only refer to a function whose name is in the file.
+    """
+    used = sorted(x for x in exits if x.rpartition(".")[2].encode() in content)
+    # The names can't contain a newline, so the contents can't be mistaken for them
+    return json.dumps(used).encode() + b"\n" + content
+
+
+def _resolve(node: Optional[ast.AST], names: Mapping[str, str]) -> Optional[str]:
+    """ Return the qualified name of a dotted name, given what its head refers to """
+    attributes = []
+    while isinstance(node, ast.Attribute):
+        attributes.append(node.attr)
+        node = node.value
+    if not isinstance(node, ast.Name) or node.id not in names:
+        return None
+    return ".".join([names[node.id], *reversed(attributes)])
@@ -0,0 +1,350 @@
+"""
+The names which modules export to `import *`, across the modules of a project.
+
+A file with `import *` can't be checked on its own, as the names it imports aren't
+known. When the imported module is part of the project, its exports can be found from
+its __all__ (or else its public top-level names) without importing it, so the `*` is
+replaced with the names it imports, and the file is checked like any other.
+
+Each module is summarized on its own (so that summaries can be cached by content),
+then the summaries are resolved together, as a module re-exports the names of any
+modules it imports * from. A process sets the project's exports once with
+'set_project_exports', e.g. when a worker starts.
+"""
+
+import ast
+import io
+import keyword
+import re
+import tokenize
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Iterator, List, Mapping, Optional, Sequence, Set, Tuple, Union
+
+from .modules import absolute_name, child_module, module_name, package_name
+
+# The exports of each module of the project, by module name
+_project_exports: Mapping[str, Sequence[str]] = {}
+
+_IMPORT_STAR = re.compile(r"\bimport\s*\*")
+
+# Statements whose blocks run at the top level of a module, if they're there
+_BLOCKS = (
+    ast.If,
+    ast.For,
+    ast.AsyncFor,
+    ast.While,
+    ast.With,
+    ast.AsyncWith,
+    ast.Try,
+    *([ast.TryStar] if hasattr(ast, "TryStar") else []),
+)
+
+
+def set_project_exports(exports: Mapping[str, Sequence[str]]) -> None:
+    """ Set the names each module of the project exports, for this process """
+    global _project_exports
+    _project_exports = exports
+
+
+def project_exports() -> Mapping[str, Sequence[str]]:
+    return _project_exports
+
+
+@dataclass(frozen=True)
+class ExportSummary:
+    """
+    The names a module exports: those in its __all__, or if it has none, its public
+    top-level names and those of the modules it imports * from ('stars'). 'names' is
+    None if they can't be known, e.g. when __all__ is computed.
+    """
+
+    names: Optional[List[str]] = field(default_factory=list)
+    stars: List[str] = field(default_factory=list)
+
+
+def summarize_exports(
+    tree: ast.Module, module: str, is_package: bool = False
+) -> ExportSummary:
+    """
+    Summarize the exports of a parsed module.
+    'is_package' is true for an __init__ module, which relative imports are relative to.
+    """
+    package = package_name(module, is_package)
+
+    # Used as an ordered set
+    names: Dict[str, None] = {}
+    stars: List[str] = []
+    dunder_all: Optional[List[str]] = None
+
+    for node in _top_level(tree.body):
+        if isinstance(node, ast.Import):
+            for alias in node.names:
+                names[alias.asname or alias.name.split(".")[0]] = None
+        elif isinstance(node, ast.ImportFrom):
+            source = absolute_name(node.module, node.level, package)
+            if is_package and source is not None:
+                # Importing a submodule binds its name in the package
+                child = child_module(source, package)
+                if child is not None:
+                    names[child] = None
+            for alias in node.names:
+                if alias.name != "*":
+                    names[alias.asname or alias.name] = None
+                    continue
+                if source is None:
+                    return ExportSummary(names=None)
+                stars.append(source)
+        elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            names[node.name] = None
+        elif isinstance(node, (ast.Assign, ast.AnnAssign, ast.AugAssign)):
+            targets = node.targets if isinstance(node, ast.Assign) else [node.target]
+            if any(_is_all(x) for x in targets):
+                if isinstance(node, ast.AnnAssign) and node.value is None:
+                    continue
+                values = _strings(node.value)
+                if values is None or (
+                    isinstance(node, ast.AugAssign)
+                    and (dunder_all is None or not isinstance(node.op, ast.Add))
+                ):
+                    return ExportSummary(names=None)
+                if isinstance(node, ast.AugAssign) and dunder_all is not None:
+                    dunder_all = dunder_all + values
+                else:
+                    dunder_all = values
+                continue
+            if isinstance(node, ast.AnnAssign) and node.value is None:
+                continue
+            for target in targets:
+                names.update(dict.fromkeys(_bound(target)))
+        elif isinstance(node, ast.Expr) and isinstance(node.value, ast.Call):
+            # __all__.extend([...]) and __all__.append("...")
+            func = node.value.func
+            if isinstance(func, ast.Attribute) and _is_all(func.value):
+                arguments = node.value.args
+                values = None
+                if func.attr == "extend" and len(arguments) == 1:
+                    values = _strings(arguments[0])
+                elif func.attr == "append" and len(arguments) == 1:
+                    values = _strings(ast.List(elts=arguments, ctx=ast.Load()))
+                if values is None or dunder_all is None:
+                    return ExportSummary(names=None)
+                dunder_all = dunder_all + values
+        elif isinstance(node, ast.For):
+            names.update(dict.fromkeys(_bound(node.target)))
+        elif isinstance(node, ast.With):
+            for item in node.items:
+                if item.optional_vars is not None:
+                    names.update(dict.fromkeys(_bound(item.optional_vars)))
+
+    if dunder_all is not None:
+        return ExportSummary(names=[x for x in dunder_all if _is_name(x)])
+    return ExportSummary(names=[x for x in names if not x.startswith("_")], stars=stars)
+
+
+def star_imports(tree: ast.Module, module: str, is_package: bool = False) -> List[str]:
+    """
+    Return the absolute names of the modules a parsed module imports * from, whose
+    exports it needs.
+    """
+    package = package_name(module, is_package)
+    sources: Dict[str, None] = {}
+    for node in ast.walk(tree):
+        if isinstance(node, ast.ImportFrom) and any(x.name == "*" for x in node.names):
+            source = absolute_name(node.module, node.level, package)
+            if source is not None:
+                sources[source] = None
+    return list(sources)
+
+
+def module_exports(summaries: Mapping[str, ExportSummary]) -> Dict[str, List[str]]:
+    """
+    Return the names each module exports, given the summaries of a project's modules
+    by name, leaving out modules whose exports can't be known (including those which
+    import * from modules outside the project).
+    """
+    resolved: Dict[str, Optional[List[str]]] = {}
+
+    def resolve(module: str, in_progress: Set[str]) -> Optional[List[str]]:
+        if module in resolved:
+            return resolved[module]
+        summary = summaries.get(module)
+        if summary is None or summary.names is None:
+            resolved[module] = None
+            return None
+        if module in in_progress:
+            # Each module in a cycle only contributes its own names to the others
+            return summary.names
+
+        exports = dict.fromkeys(summary.names)
+        in_progress.add(module)
+        try:
+            for star in summary.stars:
+                names = resolve(star, in_progress)
+                if names is None:
+                    resolved[module] = None
+                    return None
+                exports.update(dict.fromkeys(x for x in names if not x.startswith("_")))
+        finally:
+            in_progress.discard(module)
+        result = resolved[module] = list(exports)
+        return result
+
+    exports = {}
+    for module in summaries:
+        names = resolve(module, set())
+        if names is not None:
+            exports[module] = names
+    return exports
+
+
+def expand_import_star(
+    code: str,
+    path: Union[str, Path],
+    exports: Optional[Mapping[str, Sequence[str]]] = None,
+) -> str:
+    """
+    Replace `import *` in the code for a file with the names it imports, wherever the
+    imported module's exports are known (by default, those of the project). Other
+    imports are left as they are, and lines keep their numbers.
+    """
+    if exports is None:
+        exports = _project_exports
+    if not exports or not _IMPORT_STAR.search(code):
+        return code
+
+    try:
+        tokens = list(tokenize.generate_tokens(io.StringIO(code).readline))
+    except (tokenize.TokenError, SyntaxError):
+        # Left for the parser to report
+        return code
+
+    package: Optional[str] = None
+    is_package = Path(path).stem == "__init__"
+    # The row, start and end columns of each replacement, and its text
+    replacements: List[Tuple[int, int, int, str]] = []
+    for index, token in enumerate(tokens):
+        if token.string != "*" or index < 1 or tokens[index - 1].string != "import":
+            continue
+        # Anything after it on the same line would move
+        following = tokens[index + 1] if index + 1 < len(tokens) else None
+        if following is not None and following.type not in (
+            tokenize.NEWLINE,
+            tokenize.COMMENT,
+            tokenize.ENDMARKER,
+        ):
+            continue
+        statement = _import_from(tokens, index - 1)
+        if statement is None:
+            continue
+        start, name, level = statement
+
+        if package is None:
+            package = package_name(module_name(path), is_package)
+        source = absolute_name(name, level, package) or ""
+        names = exports.get(source)
+        if names is None:
+            continue
+        # In a package, importing from a submodule also binds the submodule's name
+        child = child_module(source, package) if is_package else None
+        if child is not None and child not in names:
+            names = [*names, child]
+        if names:
+            row, column = token.start
+            replacements.append((row, column, token.end[1], ", ".join(names)))
+        elif start[0] == token.start[0]:
+            # A module which exports nothing
+            replacements.append((start[0], start[1], token.end[1], "pass"))
+
+    if not replacements:
+        return code
+
+    lines = io.StringIO(code).readlines()
+    for row, begin, end, text in sorted(replacements, reverse=True):
+        line = lines[row - 1]
+        lines[row - 1] = line[:begin] + text + line[end:]
+    return "".join(lines)
+
+
+def _import_from(
+    tokens: List[tokenize.TokenInfo], index: int
+) -> Optional[Tuple[Tuple[int, int], Optional[str], int]]:
+    """
+    Given the index of the 'import' token of a `from ... import`, return where the
+    statement starts, the name of the module and the number of leading dots.
+    """
+    parts: List[str] = []
+    level = 0
+    for token in reversed(tokens[:index]):
+        if token.type == tokenize.NAME and token.string == "from":
+            name = "".join(parts)
+            # Leading dots are relative, the rest separate the parts of the name
+            stripped = name.lstrip(".")
+            level = len(name) - len(stripped)
+            return token.start, stripped or None, level
+        if token.type == tokenize.NAME or token.string in (".", "..."):
+            parts.insert(0, token.string)
+        elif token.type != tokenize.NL:
+            return None
+    return None
+
+
+def _top_level(body: Sequence[ast.stmt]) -> Iterator[ast.stmt]:
+    """ Generate the statements which run at the top level of a module, in order """
+    pending = list(reversed(body))
+    while pending:
+        node = pending.pop()
+        yield node
+        if isinstance(node, _BLOCKS):
+            children: List[ast.stmt] = list(getattr(node, "body", []))
+            for handler in getattr(node, "handlers", []):
+                children.extend(handler.body)
+            children.extend(getattr(node, "orelse", []))
+            children.extend(getattr(node, "finalbody", []))
+            pending.extend(reversed(children))
+
+
+def _bound(target: ast.expr) -> Iterator[str]:
+    """ Generate the names an assignment target binds """
+    if isinstance(target, ast.Name):
+        yield target.id
+    elif isinstance(target, (ast.Tuple, ast.List)):
+        for element in target.elts:
+            yield from _bound(element)
+    elif isinstance(target, ast.Starred):
+        yield from _bound(target.value)
+
+
+def _is_all(node: ast.expr) -> bool:
+    return isinstance(node, ast.Name) and node.id == "__all__"
+
+
+def _strings(node: Optional[ast.expr]) -> Optional[List[str]]:
+    """ Return the strings in a literal list or tuple of strings, or None """
+    if not isinstance(node, (ast.List, ast.Tuple)):
+        return None
+    values = []
+    for element in node.elts:
+        if not isinstance(element, ast.Constant) or not isinstance(element.value, str):
+            return None
+        values.append(element.value)
+    return values
+
+
+def _is_name(value: str) -> bool:
+    return value.isidentifier() and not keyword.iskeyword(value)
+
+
+def expand_content(
+    path: Union[str, Path], content: bytes, exports: Mapping[str, Sequence[str]]
+) -> bytes:
+    """
+    Return the contents of a file as they're checked, with `import *` resolved, e.g. to
+    key its results on
+    """
+    try:
+        code = content.decode()
+    except UnicodeDecodeError:
+        return content
+    expanded = expand_import_star(code, path, exports)
+    return content if expanded is code else expanded.encode()
@@ -0,0 +1,93 @@
+"""
+The reference analysis engine, built on libCST's ScopeProvider with block scopes.
+"""
+
+from dataclasses import dataclass
+from typing import List, Set, cast
+
+import libcst as cst
+import libcst.metadata as meta
+
+from .block_scope_provider import BlockScopeProvider, monkeypatch_nameutil
+from .parsers import parse_module
+from .positions import find_positions
+from .prescan import prescan
+from .profiling import phase
+from .warnings import (
+    BaseRefWarning,
+    BaseWarning,
+    ImportStarWarning,
+    NoLocationRefWarning,
+    RefWarning,
+)
+
+EXCEPTIONS = {"__file__", "__name__", "__doc__", "__package__"}
+
+
+@dataclass(frozen=True)
+class Metadata:
+    module: cst.Module
+    scopes: Set[meta.Scope]
+
+
+def get_metadata(code: str) -> Metadata:
+    """
+    Parse metadata about scopes from Python code.
+
+    Positions are not included, as they're only needed for the few nodes with warnings.
+    """
+    # Timed by the parser, as a phase named after the backend which parsed it
+    parsed = parse_module(code)
+    # The module was parsed here, so there is no need for the wrapper to copy it
+    wrapper = cst.MetadataWrapper(parsed, unsafe_skip_copy=True)
+
+    with phase("scopes"):
+        resolved = wrapper.resolve(BlockScopeProvider)
+    scopes = cast(Set[meta.Scope], set(resolved.values()))
+
+    return Metadata(module=wrapper.module, scopes=scopes)
+
+
+@monkeypatch_nameutil()
+def check(code: str) -> List[BaseWarning]:
+    """ Return a list of warnings related to some Python code, using libCST """
+    warnings: List[BaseWarning] = []
+
+    # Files with 'import *' can't be checked, so don't bother parsing them
+    with phase("prescan"):
+        scan = prescan(code)
+    if scan.import_star:
+        return [ImportStarWarning()]
+
+    metadata = get_metadata(code)
+
+    undefined: List[cst.Name] = []
+    with phase("accesses"):
+        for scope in metadata.scopes:
+            if not scope:
+                continue
+            for access in scope.accesses:
+                if len(access.referents) == 0:
+                    node = access.node
+                    if node.value not in EXCEPTIONS:
+                        undefined.append(node)
+
+    with phase("positions"):
+        positions = find_positions(metadata.module, undefined)
+
+    for node in undefined:
+        try:
+            location = positions[node]
+        except KeyError:
+            # XXX: libCST's scope provider doesn't properly handle string-y type annotations
+            warnings.append(NoLocationRefWarning(reference=str(node.value)))
+        else:
+            if location.line not in scan.ignored_lines:
+                warnings.append(
+                    RefWarning(
+                        line=location.line,
+                        column=location.column,
+                        reference=str(node.value),
+                    )
+                )
+    return warnings
@@ -0,0 +1,89 @@
+"""
+The names of modules, for matching imports in one file to the files they import.
+"""
+
+import ast
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Union
+
+
+def module_name(path: Union[str, Path]) -> str:
+    """
+    Return the name a file is imported by, from the packages (directories with an
+    __init__.py) which contain it.
+    """
+    path = Path(path).absolute()
+    parts = [] if path.stem == "__init__" else [path.stem]
+    directory = path.parent
+    while (directory / "__init__.py").exists() or (directory / "__init__.pyi").exists():
+        parts.append(directory.name)
+        if directory.parent == directory:
+            break
+        directory = directory.parent
+    return ".".join(reversed(parts))
+
+
+def package_name(module: str, is_package: bool = False) -> str:
+    """
+    Return the package which relative imports in a module are relative to.
+    'is_package' is true for an __init__ module.
+    """
+    return module if is_package else module.rpartition(".")[0]
+
+
+def absolute_name(module: Optional[str], level: int, package: str) -> Optional[str]:
+    """
+    Return the absolute name of a module imported from 'package' (with 'level' leading
+    dots), or None if it can't be known.
+    """
+    if not level:
+        return module
+    parts = package.split(".") if package else []
+    if level - 1 > len(parts) or (level - 1 == len(parts) and not module):
+        return None
+    parts = parts[: len(parts) - (level - 1)]
+    if module:
+        parts.append(module)
+    return ".".join(parts) or None
+
+
+def child_module(module: str, package: str) -> Optional[str]:
+    """
+    Return the name of the direct child of a package which a module is in, if it's in
+    the package. Importing it from the package's __init__ binds this name there too.
+    """
+    prefix = f"{package}." if package else ""
+    if not package or not module.startswith(prefix):
+        return None
+    return module[len(prefix) :].split(".")[0]
+
+
+def imported_modules(
+    tree: ast.Module, module: str, is_package: bool = False
+) -> List[str]:
+    """
+    Return the absolute names of everything a parsed module imports, anywhere in it.
+    Names imported from a module are included (as they may be submodules), in order.
+    """
+    package = package_name(module, is_package)
+    # Used as an ordered set
+    names: Dict[str, None] = {}
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            names.update((alias.name, None) for alias in node.names)
+        elif isinstance(node, ast.ImportFrom):
+            source = absolute_name(node.module, node.level, package)
+            if source is None:
+                continue
+            names[source] = None
+            for alias in node.names:
+                if alias.name != "*":
+                    names[f"{source}.{alias.name}"] = None
+    return list(names)
+
+
+def parent_modules(name: str) -> Iterator[str]:
+    """ Generate a dotted name and each module it's in, which importing it runs """
+    parts = name.split(".")
+    for i in range(len(parts), 0, -1):
+        yield ".".join(parts[:i])
@@ -0,0 +1,81 @@
+"""
+Backends for libCST's parser: the native parser (written in Rust, and only included in
+newer versions of libCST) and the pure-Python parser.
+
+How fast each is varies between versions of libCST, and each accepts some syntax the
+other doesn't (e.g. the pure-Python grammar stops at older versions of Python). By
+default, files are parsed with the fastest available backend, which is the native one
+when there is one, and with the others in turn if it fails.
+
+The backend is chosen for each parse with the environment variable libCST reads, so
+that only its public API is used, whichever version of it is installed.
+"""
+
+import importlib.util
+import os
+from functools import lru_cache
+from typing import Tuple
+
+import libcst as cst
+
+from .check import PARSERS
+from .profiling import phase, rename_phase
+
+_PARSER_TYPE = "LIBCST_PARSER_TYPE"
+
+# The backend this process parses with
+_parser = PARSERS[0]
+
+
+@lru_cache(maxsize=None)
+def available_parsers() -> Tuple[str, ...]:
+    """ Return the backends this version of libCST has, fastest first """
+    if importlib.util.find_spec("libcst.native") is not None:
+        return ("native", "pure")
+    return ("pure",)
+
+
+def set_parser(parser: str) -> None:
+    """ Set the backend to parse with, for this process """
+    global _parser
+    if parser not in PARSERS:
+        raise ValueError(f"Unknown parser: {parser!r}")
+    if parser != "auto" and parser not in available_parsers():
+        raise ValueError(
+            f"The {parser} parser isn't available in this version of libCST"
+        )
+    _parser = parser
+
+
+def parse_with(backend: str, code: str) -> cst.Module:
+    """ Parse a module with a particular backend """
+    previous = os.environ.get(_PARSER_TYPE)
+    os.environ[_PARSER_TYPE] = backend
+    try:
+        return cst.parse_module(code)
+    finally:
+        if previous is None:
+            del os.environ[_PARSER_TYPE]
+        else:
+            os.environ[_PARSER_TYPE] = previous
+
+
+def parse_module(code: str) -> cst.Module:
+    """
+    Parse a module with the configured backend, or automatically. The time taken is
+    recorded as a phase named after the backend which parsed it, and the time taken by
+    any which failed first as a phase of its own.
+    """
+    backends = available_parsers() if _parser == "auto" else (_parser,)
+    for backend in backends[:-1]:
+        try:
+            with phase(f"parse ({backend})"):
+                return parse_with(backend, code)
+        except BaseException as e:
+            # The native parser raises PanicException (a BaseException) if it crashes
+            if not isinstance(e, Exception) and type(e).__name__ != "PanicException":
+                raise
+            rename_phase(f"parse ({backend})", f"parse ({backend}, failed)")
+
+    with phase(f"parse ({backends[-1]})"):
+        return parse_with(backends[-1], code)
@@ -0,0 +1,522 @@
+import multiprocessing
+import os
+import signal
+import sys
+import time
+import traceback
+from collections import deque
+from dataclasses import dataclass, field, replace
+from multiprocessing.connection import Connection, wait
+from typing import (
+    Any,
+    Callable,
+    Deque,
+    Dict,
+    Generic,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+    TypeVar,
+)
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+_READY = "ready"
+
+# How often the memory of busy workers is measured, when it's limited, in seconds
+MEMORY_POLL_INTERVAL = 0.1
+
+# How often busy workers' items are checked for cancellation, when they can be, in seconds
+CANCEL_POLL_INTERVAL = 0.05
+
+try:
+    _PAGE_SIZE = os.sysconf("SC_PAGE_SIZE")
+except (AttributeError, ValueError):
+    _PAGE_SIZE = 4096
+
+
+def memory_usage(pid: Optional[int] = None) -> Optional[int]:
+    """
+    Return the resident memory of a process (by default, this one) in bytes, or None if
+    it can't be measured. Other processes can only be measured on Linux.
+    """
+    try:
+        with open(f"/proc/{pid or 'self'}/statm") as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except (OSError, ValueError, IndexError):
+        pass
+    if pid is not None:
+        return None
+    try:
+        import resource
+    except ImportError:
+        return None
+    # Only the peak is available, in kilobytes on Linux but in bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+@dataclass(frozen=True)
+class Outcome(Generic[R]):
+    """ The outcome of handling a single item of work """
+
+    value: Optional[R] = None
+    timed_out: bool = False
+    error: Optional[str] = None
+
+    # The time spent handling the item, in seconds, if it was handled
+    duration: Optional[float] = None
+
+    # Whether a fresh worker exceeded the memory limit while handling the item
+    too_large: bool = False
+
+    @property
+    def ok(self) -> bool:
+        return not self.timed_out and self.error is None and not self.too_large
+
+
+@dataclass
+class PoolStats:
+    """ How much of the time that a pool had work for its workers they spent working """
+
+    workers: int
+
+    # The total time during which any work was outstanding, in seconds
+    elapsed: float = 0.0
+
+    # The total time that workers had work assigned to them, in seconds
+    busy: float = 0.0
+
+    # The most memory used by each worker (including those which replaced it), in bytes
+    peak_memory: List[int] = field(default_factory=list)
+
+    # The number of workers which were replaced after too many items or too much memory
+    recycled: int = 0
+
+    @property
+    def utilization(self) -> float:
+        """ The fraction of the workers' capacity which was used while there was work """
+        capacity = self.elapsed * max(self.workers, 1)
+        return min(self.busy / capacity, 1.0) if capacity else 0.0
+
+    def format(self) -> str:
+        return (
+            f"{self.utilization:.0%} ({self.busy:.2f}s busy across "
+            f"{max(self.workers, 1)} workers in {self.elapsed:.2f}s)"
+        )
+
+    def format_memory(self) -> str:
+        peaks = ", ".join(f"{x / 1024 / 1024:.0f} MB" for x in self.peak_memory)
+        return f"{peaks or 'not measured'} ({self.recycled} workers recycled)"
+
+
+class WorkerError(Exception):
+    """ Raised when a worker process cannot be started """
+
+
+def _work(
+    conn: Connection,
+    handler: Callable[[Any], Any],
+    initializer: Optional[Callable[[], None]],
+) -> None:
+    """ The main loop of a worker process """
+
+    # Interrupts are handled by the parent, which shuts the workers down
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+    if initializer is not None:
+        initializer()
+    conn.send(_READY)
+
+    while True:
+        try:
+            chunk = conn.recv()
+        except EOFError:
+            return
+        if chunk is None:
+            return
+
+        for item in chunk:
+            start = time.perf_counter()
+            try:
+                value = handler(item)
+            except Exception:
+                succeeded, value = False, traceback.format_exc()
+            else:
+                succeeded = True
+            conn.send((succeeded, value, time.perf_counter() - start, memory_usage()))
+
+
+class _Worker:
+    """ A worker process, and the work currently assigned to it """
+
+    def __init__(
+        self,
+        context: Any,
+        handler: Callable[[Any], Any],
+        initializer: Optional[Callable[[], None]],
+        slot: int,
+    ):
+        # Which of the pool's workers this is, for as long as it lasts
+        self.slot = slot
+        self.conn: Connection
+        self.conn, child = context.Pipe()
+        self.process = context.Process(
+            target=_work, args=(child, handler, initializer), daemon=True
+        )
+        self.process.start()
+        child.close()
+
+        self.ready = False
+        self.pending: Deque[Any] = deque()
+        self.deadline: Optional[float] = None
+        # When the worker was last assigned a chunk
+        self.assigned = 0.0
+        # The number of items the worker has handled
+        self.tasks = 0
+        # An item to retry as soon as the worker is ready
+        self.retry: Optional[List[Any]] = None
+
+    def assign(self, chunk: Sequence[Any], timeout: Optional[float]) -> None:
+        self.pending.extend(chunk)
+        self.conn.send(list(chunk))
+        self.assigned = time.monotonic()
+        self.deadline = None if timeout is None else self.assigned + timeout
+
+    def kill(self) -> None:
+        self.process.kill()
+        self.process.join()
+        self.conn.close()
+
+    def stop(self) -> None:
+        try:
+            self.conn.send(None)
+        except OSError:
+            pass
+        self.process.join(timeout=1)
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join()
+        self.conn.close()
+
+
+class WorkerPool(Generic[T, R]):
+    """
+    A pool of worker processes which enforces a deadline on each item of work.
+
+    Work is sent to workers in chunks, and each worker reports the outcome of every item
+    as soon as it has been handled. When a worker spends longer than 'timeout' seconds
+    on a single item, it is killed and replaced: the item is reported as timed out,
+    and the rest of its chunk is handed to another worker. The rest of the pool carries on.
+
+    Workers can be recycled to bound their memory: replaced after 'max_tasks' items, or
+    after an item which left them using more than 'max_memory' bytes. Where the memory of
+    busy workers can be measured (on Linux), a worker which exceeds 'max_memory' while
+    handling an item is killed, and the item is retried in a fresh worker, unless it was
+    already in one, when it's reported as too large.
+
+    With zero workers, items are handled serially in the current process, and timeouts
+    and limits are not enforced.
+
+    'stats' accumulates how busy the workers were while there was work for them, across
+    every call to 'imap'.
+    """
+
+    def __init__(
+        self,
+        handler: Callable[[T], R],
+        workers: Optional[int] = None,
+        timeout: Optional[float] = None,
+        initializer: Optional[Callable[[], None]] = None,
+        max_tasks: Optional[int] = None,
+        max_memory: Optional[int] = None,
+    ):
+        self.handler = handler
+        self.workers = (os.cpu_count() or 1) if workers is None else workers
+        self.timeout = timeout
+        self.initializer = initializer
+        self.max_tasks = max_tasks
+        self.max_memory = max_memory
+
+        self.stats = PoolStats(
+            workers=self.workers, peak_memory=[0] * max(self.workers, 0)
+        )
+
+        self._context = multiprocessing.get_context()
+        self._pool: List[_Worker] = []
+        self._initialized = False
+        # When work last became outstanding, while there is some
+        self._active_since: Optional[float] = None
+
+    def __enter__(self) -> "WorkerPool[T, R]":
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """ Shut down all worker processes """
+        for worker in self._pool:
+            if worker.pending:
+                worker.kill()
+            else:
+                worker.stop()
+        self._pool = []
+
+    def restart(self, initializer: Optional[Callable[[], None]] = None) -> None:
+        """
+        Shut down all worker processes, so that they're started again when next needed,
+        prepared with a new initializer (e.g. because what it sets up has changed).
+        """
+        self.close()
+        self.initializer = initializer
+        self._initialized = False
+
+    def imap(
+        self,
+        chunks: Iterable[Sequence[T]],
+        cancelled: Optional[Callable[[T], bool]] = None,
+    ) -> Iterator[Tuple[T, Outcome[R]]]:
+        """
+        Handle chunks of items, generating each item with its outcome as it completes.
+
+        Chunks are only taken from 'chunks' when a worker is free to handle them, so it
+        may be a generator which waits for work, and generates an empty chunk if none
+        arrives for a while (e.g. in a server). If the generator is closed early, any
+        outstanding work is abandoned.
+
+        When 'cancelled' is given, it's called with the item each busy worker is handling
+        every CANCEL_POLL_INTERVAL seconds, and if it returns True, the worker is killed
+        and replaced, and the item is abandoned without being generated.
+        """
+        if self.workers <= 0:
+            yield from self._imap_serial(chunks)
+            return
+
+        self._start()
+        queue: Deque[Sequence[T]] = deque()
+        remaining = iter(chunks)
+        exhausted = False
+
+        try:
+            while True:
+                for worker in self._pool:
+                    if not worker.ready or worker.pending:
+                        continue
+                    if worker.retry is not None:
+                        self._active()
+                        worker.assign(worker.retry, self.timeout)
+                        worker.retry = None
+                        continue
+                    if not queue and not exhausted:
+                        chunk = next(remaining, None)
+                        if chunk is None:
+                            exhausted = True
+                        elif chunk:
+                            queue.append(chunk)
+                    if not queue:
+                        break
+                    chunk = queue.popleft()
+                    if self.max_tasks is not None:
+                        # Only as many items as the worker may handle before recycling
+                        room = self.max_tasks - worker.tasks
+                        if len(chunk) > room:
+                            queue.appendleft(chunk[room:])
+                            chunk = chunk[:room]
+                    self._active()
+                    worker.assign(chunk, self.timeout)
+
+                busy = [w for w in self._pool if w.pending]
+                if not busy:
+                    retrying = any(w.retry is not None for w in self._pool)
+                    if not retrying:
+                        self._idle()
+                        if not queue and exhausted:
+                            return
+                        if not queue and any(w.ready for w in self._pool):
+                            # The chunk was empty, and there's nothing to wait for
+                            continue
+
+                deadlines = [w.deadline for w in busy if w.deadline is not None]
+                wait_time = (
+                    max(min(deadlines) - time.monotonic(), 0) if deadlines else None
+                )
+                if self.max_memory is not None and busy:
+                    wait_time = (
+                        MEMORY_POLL_INTERVAL
+                        if wait_time is None
+                        else min(wait_time, MEMORY_POLL_INTERVAL)
+                    )
+                if cancelled is not None and busy:
+                    wait_time = (
+                        CANCEL_POLL_INTERVAL
+                        if wait_time is None
+                        else min(wait_time, CANCEL_POLL_INTERVAL)
+                    )
+                by_conn: Dict[Any, _Worker] = {w.conn: w for w in self._pool}
+
+                for conn in wait(list(by_conn), wait_time):
+                    worker = by_conn[conn]
+                    try:
+                        message = worker.conn.recv()
+                    except EOFError:
+                        worker.process.join()
+                        exitcode = worker.process.exitcode
+                        if not worker.ready:
+                            raise WorkerError(
+                                f"Worker failed to start (exit code {exitcode})"
+                            )
+                        lost = self._replace(worker, queue)
+                        if lost is not None:
+                            yield lost, Outcome(
+                                error=f"Worker exited unexpectedly (exit code {exitcode})"
+                            )
+                        continue
+
+                    if message == _READY:
+                        worker.ready = True
+                        continue
+
+                    item = worker.pending.popleft()
+                    worker.deadline = (
+                        None
+                        if self.timeout is None or not worker.pending
+                        else time.monotonic() + self.timeout
+                    )
+                    if not worker.pending:
+                        self._finished(worker)
+                    succeeded, value, duration, memory = message
+                    worker.tasks += 1
+                    self._measured(worker, memory)
+                    if (
+                        self.max_tasks is not None and worker.tasks >= self.max_tasks
+                    ) or (
+                        self.max_memory is not None
+                        and memory is not None
+                        and memory > self.max_memory
+                    ):
+                        self._recycle(worker, queue)
+                    if succeeded:
+                        yield item, Outcome(value=value, duration=duration)
+                    else:
+                        yield item, Outcome(error=value, duration=duration)
+
+                now = time.monotonic()
+                for worker in list(self._pool):
+                    if worker.deadline is not None and worker.deadline <= now:
+                        lost = self._replace(worker, queue)
+                        if lost is not None:
+                            yield lost, Outcome(timed_out=True)
+
+                if self.max_memory is not None:
+                    for worker in [w for w in self._pool if w.pending]:
+                        memory = memory_usage(worker.process.pid)
+                        self._measured(worker, memory)
+                        if memory is None or memory <= self.max_memory:
+                            continue
+                        # A worker which has handled other items may just not have
+                        # returned their memory, so the item gets another chance
+                        lost = self._replace(worker, queue, retry=worker.tasks > 0)
+                        if lost is not None:
+                            yield lost, Outcome(too_large=True)
+
+                if cancelled is not None:
+                    for worker in [w for w in self._pool if w.pending]:
+                        if cancelled(worker.pending[0]):
+                            self._replace(worker, queue)
+        finally:
+            # Workers still busy with abandoned work are killed, and replaced on demand
+            for worker in list(self._pool):
+                if worker.pending:
+                    self._finished(worker)
+                    worker.kill()
+                    self._pool.remove(worker)
+            self._idle()
+
+    def _finished(self, worker: _Worker) -> None:
+        """ Account for a worker which has no more work assigned to it """
+        self.stats.busy += time.monotonic() - worker.assigned
+
+    def _active(self) -> None:
+        """ Account for the pool having outstanding work """
+        if self._active_since is None:
+            self._active_since = time.monotonic()
+
+    def _idle(self) -> None:
+        """ Account for the pool having no outstanding work """
+        if self._active_since is not None:
+            self.stats.elapsed += time.monotonic() - self._active_since
+            self._active_since = None
+
+    def _measured(self, worker: _Worker, memory: Optional[int]) -> None:
+        if memory is not None and memory > self.stats.peak_memory[worker.slot]:
+            self.stats.peak_memory[worker.slot] = memory
+
+    def _start(self) -> None:
+        slots = {w.slot for w in self._pool}
+        for slot in range(self.workers):
+            if slot not in slots:
+                self._pool.append(self._spawn(slot))
+
+    def _spawn(self, slot: int) -> _Worker:
+        return _Worker(self._context, self.handler, self.initializer, slot)
+
+    def _replace(
+        self, worker: _Worker, queue: Deque[Sequence[T]], retry: bool = False
+    ) -> Optional[T]:
+        """
+        Kill a worker and start a new one in its place.
+        Return the item it was working on, and requeue the rest of its chunk. When
+        retrying, the item is handed to the new worker instead.
+        """
+        if worker.pending:
+            self._finished(worker)
+        worker.kill()
+        replacement = self._spawn(worker.slot)
+        self._pool[self._pool.index(worker)] = replacement
+
+        lost = worker.pending.popleft() if worker.pending else None
+        if worker.pending:
+            queue.appendleft(list(worker.pending))
+        if retry and lost is not None:
+            replacement.retry = [lost]
+            return None
+        return lost
+
+    def _recycle(self, worker: _Worker, queue: Deque[Sequence[T]]) -> None:
+        """ Replace a worker with a fresh one, requeueing any work it hadn't started """
+        if worker.pending:
+            self._finished(worker)
+            queue.appendleft(list(worker.pending))
+            worker.pending.clear()
+            worker.kill()
+        else:
+            worker.stop()
+        self._pool[self._pool.index(worker)] = self._spawn(worker.slot)
+        self.stats.recycled += 1
+
+    def _imap_serial(
+        self, chunks: Iterable[Sequence[T]]
+    ) -> Iterator[Tuple[T, Outcome[R]]]:
+        if not self._initialized:
+            if self.initializer is not None:
+                self.initializer()
+            self._initialized = True
+
+        for chunk in chunks:
+            for item in chunk:
+                start = time.perf_counter()
+                try:
+                    value = self.handler(item)
+                except Exception:
+                    outcome: Outcome[R] = Outcome(error=traceback.format_exc())
+                else:
+                    outcome = Outcome(value=value)
+                duration = time.perf_counter() - start
+                self.stats.elapsed += duration
+                self.stats.busy += duration
+                yield item, replace(outcome, duration=duration)
@@ -0,0 +1,121 @@
+import re
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Collection, Dict, Iterator, Optional
+
+import libcst as cst
+import libcst.metadata as meta
+
+try:
+    # Private to libCST, so it may move in other versions, when positions are found
+    # with PositionProvider instead
+    from libcst._nodes.internal import CodegenState
+except ImportError:
+    CodegenState = object  # type: ignore
+
+NEWLINE_RE = re.compile(r"\r\n?|\n")
+
+
+@dataclass(frozen=True)
+class Position:
+    line: int
+    column: int
+
+
+class _Finished(Exception):
+    """ Raised to stop generating code once every node has been found """
+
+
+@dataclass
+class _PositionFinderState(CodegenState):
+    """
+    Tracks the position of generated code, like libCST's PositionProvider,
+    but only records the start of the target nodes.
+    """
+
+    targets: Collection[cst.CSTNode] = field(default_factory=set)
+    starts: Dict[cst.CSTNode, Position] = field(default_factory=dict)
+
+    line: int = 1
+    column: int = 0
+
+    def add_indent_tokens(self) -> None:
+        for token in self.indent_tokens:
+            self._update_position(token)
+
+    def add_token(self, value: str) -> None:
+        # Don't keep the generated code, it's only needed for its positions
+        self._update_position(value)
+
+    def _update_position(self, value: str) -> None:
+        segments = NEWLINE_RE.split(value)
+        if len(segments) == 1:
+            self.column += len(value)
+        else:
+            self.line += len(segments) - 1
+            self.column = len(segments[-1])
+
+    @contextmanager
+    def record_syntactic_position(
+        self,
+        node: cst.CSTNode,
+        *,
+        start_node: Optional[cst.CSTNode] = None,
+        end_node: Optional[cst.CSTNode] = None,
+    ) -> Iterator[None]:
+        if node in self.targets and node not in self.starts:
+            self.starts[node] = Position(self.line, self.column)
+            if len(self.starts) == len(self.targets):
+                raise _Finished()
+        yield
+
+
+def find_positions(
+    module: cst.Module, nodes: Collection[cst.CSTNode]
+) -> Dict[cst.CSTNode, Position]:
+    """
+    Find the start positions of some nodes in a module, stopping once they've all been found.
+
+    Positions match those of libCST's PositionProvider, but nothing is computed
+    for the rest of the tree. Nodes which are not part of the module are omitted.
+    """
+    if not nodes:
+        return {}
+    if CodegenState is not object:
+        try:
+            return _find_positions(module, nodes)
+        except (AttributeError, TypeError):
+            # libCST's private code generation API has changed
+            pass
+    return provided_positions(module, nodes)
+
+
+def _find_positions(
+    module: cst.Module, nodes: Collection[cst.CSTNode]
+) -> Dict[cst.CSTNode, Position]:
+    state = _PositionFinderState(
+        default_indent=module.default_indent,
+        default_newline=module.default_newline,
+        targets=set(nodes),
+    )
+    try:
+        module._codegen(state)
+    except _Finished:
+        pass
+    return state.starts
+
+
+def provided_positions(
+    module: cst.Module, nodes: Collection[cst.CSTNode]
+) -> Dict[cst.CSTNode, Position]:
+    """
+    Find the start positions of some nodes in a module with libCST's PositionProvider,
+    which computes them for the whole tree, but only uses its public API.
+    """
+    wrapper = cst.MetadataWrapper(module, unsafe_skip_copy=True)
+    ranges = wrapper.resolve(meta.PositionProvider)
+    return {
+        x: Position(ranges[x].start.line, ranges[x].start.column)
+        for x in nodes
+        if x in ranges
+    }
@@ -0,0 +1,37 @@
+import io
+import tokenize
+from dataclasses import dataclass
+from typing import Set
+
+
+@dataclass(frozen=True)
+class Prescan:
+    import_star: bool
+    ignored_lines: Set[int]
+
+
+def prescan(code: str) -> Prescan:
+    """
+    Find any 'import *' statements, and the lines of any 'ref: ignore' comments,
+    from the tokens of some Python code.
+
+    This is much cheaper than parsing, so files which can't be checked are skipped early.
+    If the code can't be tokenized, what was found before the error is returned,
+    and the error is left for the parser to report.
+    """
+    import_star = False
+    ignored_lines = set()
+    previous = None
+
+    try:
+        for token in tokenize.generate_tokens(io.StringIO(code).readline):
+            if token.type == tokenize.COMMENT:
+                if "ref: ignore" in token.string:
+                    ignored_lines.add(token.start[0])
+            elif token.string == "*" and previous == "import":
+                import_star = True
+            previous = token.string
+    except (tokenize.TokenError, SyntaxError):
+        pass
+
+    return Prescan(import_star=import_star, ignored_lines=ignored_lines)
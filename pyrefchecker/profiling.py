@@ -0,0 +1,145 @@
+"""
+Optional timing of the phases of checking a file, e.g. parsing or scope inference.
+
+Phases are only timed while timings are being recorded. Otherwise, 'phase' returns a
+shared context manager which does nothing, so instrumented code costs almost nothing.
+"""
+
+import cProfile
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, ContextManager, Dict, Iterator, List, Optional, Tuple
+
+if TYPE_CHECKING:
+    from .pool import PoolStats
+
+# The phases of the file currently being checked, if they're being recorded
+_timings: Optional[Dict[str, float]] = None
+
+
+class _Phase:
+    """ Adds the time spent within it to a phase of the file being checked """
+
+    __slots__ = ("name", "timings", "start")
+
+    def __init__(self, name: str, timings: Dict[str, float]):
+        self.name = name
+        self.timings = timings
+        self.start = 0.0
+
+    def __enter__(self) -> None:
+        self.start = time.perf_counter()
+
+    def __exit__(self, *args: object) -> None:
+        elapsed = time.perf_counter() - self.start
+        self.timings[self.name] = self.timings.get(self.name, 0.0) + elapsed
+
+
+class _NoPhase:
+    __slots__ = ()
+
+    def __enter__(self) -> None:
+        pass
+
+    def __exit__(self, *args: object) -> None:
+        pass
+
+
+_NO_PHASE = _NoPhase()
+
+
+def phase(name: str) -> ContextManager[None]:
+    """ Time a phase of checking a file, if timings are being recorded """
+    if _timings is None:
+        return _NO_PHASE
+    return _Phase(name, _timings)
+
+
+def rename_phase(name: str, new_name: str) -> None:
+    """ Move the time recorded for a phase of the file being checked to another phase """
+    if _timings is not None and name in _timings:
+        _timings[new_name] = _timings.get(new_name, 0.0) + _timings.pop(name)
+
+
+@contextmanager
+def record() -> Iterator[Dict[str, float]]:
+    """ Record the time spent in each phase within this context, in seconds """
+    global _timings
+
+    previous, _timings = _timings, {}
+    try:
+        yield _timings
+    finally:
+        _timings = previous
+
+
+@contextmanager
+def cprofiled(path: Optional[str]) -> Iterator[None]:
+    """ Run the code within this context under cProfile, and write its stats to a path """
+    if path is None:
+        yield
+        return
+
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        profiler.dump_stats(path)
+
+
+@dataclass
+class Profile:
+    """ The time spent in each phase of checking each file, and how busy workers were """
+
+    files: List[Tuple[str, Dict[str, float]]] = field(default_factory=list)
+    pool: "Optional[PoolStats]" = None
+
+    def add(self, path: str, timings: Dict[str, float]) -> None:
+        self.files.append((path, timings))
+
+    def totals(self) -> Dict[str, float]:
+        """ Return the total time spent in each phase, slowest first """
+        totals: Dict[str, float] = {}
+        for _, timings in self.files:
+            for name, seconds in timings.items():
+                totals[name] = totals.get(name, 0.0) + seconds
+        return dict(sorted(totals.items(), key=lambda x: -x[1]))
+
+    def slowest(self, count: int) -> List[Tuple[str, Dict[str, float]]]:
+        """ Return the files which took the longest to check """
+        return sorted(self.files, key=lambda x: -sum(x[1].values()))[:count]
+
+    def format(self, count: int) -> List[str]:
+        """ Return a report of the slowest files, and the total time for each phase """
+        lines = [
+            f"⏱️  Slowest {min(count, len(self.files))} of {len(self.files)} files:"
+        ]
+        for path, timings in self.slowest(count):
+            phases = ", ".join(
+                f"{name} {seconds:.3f}s"
+                for name, seconds in sorted(timings.items(), key=lambda x: -x[1])
+            )
+            lines.append(f"  {sum(timings.values()):8.3f}s  {path}  ({phases})")
+
+        totals = self.totals()
+        overall = sum(totals.values())
+        # The number of files with each phase, e.g. those parsed by each parser
+        counts: Dict[str, int] = {}
+        for _, timings in self.files:
+            for name in timings:
+                counts[name] = counts.get(name, 0) + 1
+        lines.append(f"⏱️  Total time in each phase:")
+        for name, seconds in totals.items():
+            share = seconds / overall if overall else 0.0
+            files = (
+                f"  ({counts[name]} files)" if counts[name] < len(self.files) else ""
+            )
+            lines.append(f"  {seconds:8.3f}s  {share:4.0%}  {name}{files}")
+
+        if self.pool is not None:
+            lines.append(f"⏱️  Worker utilization: {self.pool.format()}")
+            lines.append(f"⏱️  Peak memory per worker: {self.pool.format_memory()}")
+        return lines
@@ -0,0 +1,57 @@
+from dataclasses import dataclass
+from typing import Any, Tuple
+
+
+class BaseWarning:
+    # Warnings are small and numerous, so they have no __dict__
+    __slots__ = ()
+
+
+class BaseRefWarning(BaseWarning):
+    __slots__ = ()
+
+
+@dataclass(frozen=True)
+class RefWarning(BaseRefWarning):
+    """ A warning of a potentially undefined reference at a specific location """
+
+    __slots__ = ("line", "column", "reference")
+
+    line: int
+    column: int
+    reference: str
+
+    def __str__(self) -> str:
+        return f"Warning on line {self.line:2d}, column {self.column:2d}: reference to potentially undefined `{self.reference}`"
+
+    def __reduce__(self) -> Tuple[Any, ...]:
+        # Frozen instances with slots can't be unpickled by setting their attributes
+        return (RefWarning, (self.line, self.column, self.reference))
+
+
+@dataclass(frozen=True)
+class NoLocationRefWarning(BaseRefWarning):
+    """ A warning of a potentially undefined reference (at an unknown location, because bugs) """
+
+    __slots__ = ("reference",)
+
+    reference: str
+
+    def __str__(self) -> str:
+        return f"Warning: reference to potentially undefined `{self.reference}`"
+
+    def __reduce__(self) -> Tuple[Any, ...]:
+        return (NoLocationRefWarning, (self.reference,))
+
+
+@dataclass(frozen=True)
+class ImportStarWarning(BaseWarning):
+    """ A warning of the precense of import * """
+
+    __slots__ = ()
+
+    def __str__(self) -> str:
+        return f"Unable to check file, import * detected"
+
+    def __reduce__(self) -> Tuple[Any, ...]:
+        return (ImportStarWarning, ())
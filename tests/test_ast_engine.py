@@ -0,0 +1,151 @@
+import sys
+
+import pytest
+
+from pyrefchecker import NoLocationRefWarning, RefWarning, check
+from pyrefchecker.differential import compare_engines
+
+SNIPPETS = [
+    """
+import os
+import sys as system
+from os import path as p, sep
+
+if os.environ:
+    a = 1
+elif system.argv:
+    b = 2
+else:
+    raise SystemExit(1)
+print(a, b, p, sep, undefined)
+""",
+    """
+def f(x, *args, y=z, **kwargs) -> Q:
+    def g():
+        nonlocal x
+        x = 1
+    global h
+    h = lambda q: q + x + w
+    return [i * j for i in args for j in range(i) if k]
+
+class C(Base, metaclass=M):
+    attr = 1
+    def method(self):
+        return attr
+""",
+    """
+from typing import TYPE_CHECKING, List, Literal, cast
+if TYPE_CHECKING:
+    from foo import Bar
+
+x: "List[Bar]" = cast("List[Bar]", [])
+y: Literal["not a name"] = "not a name"
+print(f"{x!r:>{width}} {y}")
+""",
+    """
+import sys
+from typing import NoReturn
+
+def die() -> NoReturn:
+    sys.exit(1)
+
+def bail():
+    die()
+
+try:
+    import json
+except ImportError:
+    bail()
+else:
+    value = json.loads("1")
+finally:
+    done = True
+
+for item in []:
+    found = item
+else:
+    found = None
+print(json, value, done, found, item)
+""",
+    pytest.param(
+        """
+while (n := 10) > m:
+    with open(n) as f, open(m) as g:
+        pass
+    try:
+        pass
+    except (ValueError, KeyError) as e:
+        print(e, f, g, m.attr.chain)
+    except Exception:
+        c = 1
+print(e, c, n)
+""",
+        marks=pytest.mark.skipif(
+            sys.version_info < (3, 8), reason="Assignment expressions need Python 3.8"
+        ),
+    ),
+    """
+if True: raise Exception()
+else: a = 1
+print(a)  # ref: ignore
+print(a)
+""",
+]
+
+
+@pytest.mark.parametrize("code", SNIPPETS)
+def test_engines_agree(code: str) -> None:
+    assert compare_engines(code) is None
+
+
+def test_ast_engine_warnings() -> None:
+    code = """
+if True:
+    a = "hello"
+print(a)
+"""
+    assert check(code, engine="ast") == [RefWarning(line=4, column=6, reference="a")]
+
+
+def test_ast_engine_unicode_columns() -> None:
+    code = 'x = "ö"; print(y)\n'
+    assert check(code, engine="ast") == [RefWarning(line=1, column=15, reference="y")]
+
+
+def test_ast_engine_string_annotation() -> None:
+    code = """
+from typing import Set
+
+def wrap_req(func: Set["A"]):
+    pass
+"""
+    assert check(code, engine="ast") == [NoLocationRefWarning(reference="A")]
+
+
+@pytest.mark.skipif(
+    sys.version_info < (3, 10), reason="match statements need Python 3.10"
+)
+def test_ast_engine_match_captures() -> None:
+    code = """
+match command:
+    case [action, *rest] if action:
+        print(action, rest)
+    case {"key": value, **others}:
+        print(value, others)
+"""
+    assert check(code, engine="ast") == [
+        RefWarning(line=2, column=6, reference="command")
+    ]
+
+
+def test_unknown_engine() -> None:
+    with pytest.raises(ValueError):
+        check("", engine="nope")
+
+
+def test_compare_engines_divergence() -> None:
+    code = 'from typing import Set\ndef f(x: Set["A"]): pass\n'
+
+    divergence = compare_engines(code)
+    assert divergence is not None
+    assert divergence.unexpected == [repr(NoLocationRefWarning(reference="A"))]
@@ -0,0 +1,42 @@
+import pickle
+
+import pytest
+
+from pyrefchecker import ImportStarWarning, NoLocationRefWarning, RefWarning
+from pyrefchecker.batch import WarningBatch
+
+WARNINGS = [
+    NoLocationRefWarning("x"),
+    RefWarning(1, 6, "a"),
+    RefWarning(2, 0, "b"),
+    ImportStarWarning(),
+    RefWarning(3, 4, "a"),
+]
+
+
+def test_batch() -> None:
+    batch = WarningBatch(WARNINGS)
+
+    assert list(batch) == WARNINGS
+    assert batch == WARNINGS
+    assert len(batch) == len(WARNINGS)
+    assert [batch[i] for i in range(-len(WARNINGS), len(WARNINGS))] == WARNINGS * 2
+    assert batch[1:3] == WARNINGS[1:3]
+    with pytest.raises(IndexError):
+        batch[len(WARNINGS)]
+
+    assert batch.failures(allow_import_star=True) == 4
+    assert batch.failures(allow_import_star=False) == 5
+    assert not WarningBatch()
+
+
+def test_batch_pickle() -> None:
+    batch = WarningBatch(WARNINGS)
+    assert pickle.loads(pickle.dumps(batch)) == WARNINGS
+    for warning in WARNINGS:
+        assert pickle.loads(pickle.dumps(warning)) == warning
+
+
+def test_warnings_are_slotted() -> None:
+    for warning in WARNINGS:
+        assert not hasattr(warning, "__dict__")
@@ -0,0 +1,47 @@
+import ast
+from pathlib import Path
+
+import pytest
+
+from benchmarks.corpora import GENERATORS, Corpus
+from benchmarks.harness import Regression, Results, benchmark_corpus, find_regressions
+from pyrefchecker.parsers import available_parsers
+
+
+@pytest.mark.parametrize("name", sorted(GENERATORS))
+def test_corpora_parse(name: str) -> None:
+    corpus = GENERATORS[name](2)
+    assert corpus.name == name
+    for code in corpus.files.values():
+        ast.parse(code)
+
+
+def test_benchmark_corpus(tmp_path: Path) -> None:
+    corpus = Corpus(name="small", files={"a.py": "print(a)\n", "b/c.py": "b = 1\n"})
+    timings = benchmark_corpus(corpus, tmp_path, engines=["ast"], repeat=1, workers=0)
+    assert sorted(timings) == ["small.check.ast", "small.find_files", "small.run.ast"]
+    assert (tmp_path / "small" / "b" / "c.py").read_text() == "b = 1\n"
+
+
+def test_benchmark_corpus_parsers(tmp_path: Path) -> None:
+    corpus = Corpus(name="small", files={"a.py": "a = 1\n"})
+    timings = benchmark_corpus(
+        corpus, tmp_path, engines=["libcst"], repeat=1, workers=0
+    )
+    assert {f"small.parse.{x}" for x in available_parsers()} <= set(timings)
+
+
+def test_find_regressions(tmp_path: Path) -> None:
+    baseline = Results(
+        commit=None, python="", scale=1, timings={"a": 1.0, "b": 1.0, "c": 0.0001}
+    )
+    baseline.dump(tmp_path / "baseline.json")
+    current = Results(
+        commit=None, python="", scale=1, timings={"a": 1.05, "b": 1.5, "c": 1.0}
+    )
+
+    regressions = find_regressions(
+        Results.load(tmp_path / "baseline.json"), current, threshold=0.1
+    )
+    assert regressions == [Regression(key="b", before=1.0, after=1.5)]
+    assert str(regressions[0]) == "b: 1000.0ms -> 1500.0ms (+50%)"
@@ -0,0 +1,122 @@
+from pathlib import Path
+from typing import Sequence
+
+import pytest
+
+from pyrefchecker import BaseWarning
+from pyrefchecker.bin.bin import run
+from pyrefchecker.bin.cache import ResultCache
+from pyrefchecker.bin.history import FailureHistory
+
+
+@pytest.fixture
+def files(tmp_path: Path) -> Path:
+    (tmp_path / "bad.py").write_text("if x:\n    a = 1\nprint(a)\n")
+    (tmp_path / "copy.py").write_text("if x:\n    a = 1\nprint(a)\n")
+    (tmp_path / "good.py").write_text("a = 1\nprint(a)\n")
+    return tmp_path
+
+
+def test_run(files: Path, capsys: pytest.CaptureFixture) -> None:
+    paths = sorted(files.glob("*.py"))
+
+    assert not run(paths, timeout=5, allow_import_star=True, show_successes=True)
+
+    out = capsys.readouterr().out
+    assert f"{files / 'bad.py'}: Warning on line  3, column  6" in out
+    assert f"{files / 'copy.py'}: Warning on line  3, column  6" in out
+    assert f"✅ {files / 'good.py'}" in out
+
+
+def test_run_utilization(files: Path, capsys: pytest.CaptureFixture) -> None:
+    paths = sorted(files.glob("*.py"))
+
+    run(paths, timeout=5, allow_import_star=True, show_successes=False, workers=1)
+    assert "Worker utilization: " in capsys.readouterr().err
+
+
+def test_run_cached(files: Path, capsys: pytest.CaptureFixture) -> None:
+    cache: ResultCache[Sequence[BaseWarning]] = ResultCache(
+        files / "cache", max_size=1024 * 1024
+    )
+    paths = sorted(files.glob("*.py"))
+
+    assert not run(
+        paths, timeout=5, allow_import_star=True, show_successes=True, cache=cache
+    )
+    first = capsys.readouterr().out
+    assert len(list((files / "cache").glob("*/*.pickle"))) == 2
+
+    assert not run(
+        paths, timeout=5, allow_import_star=True, show_successes=True, cache=cache
+    )
+    assert sorted(capsys.readouterr().out.splitlines()) == sorted(first.splitlines())
+
+
+def test_run_cached_keyed_on_exits_called(
+    files: Path, capsys: pytest.CaptureFixture
+) -> None:
+    cache: ResultCache[Sequence[BaseWarning]] = ResultCache(
+        files / "cache", max_size=1024 * 1024
+    )
+    (files / "view.py").write_text("from app import fail\nfail()\n")
+    paths = sorted(files.glob("*.py"))
+
+    run(paths, timeout=5, allow_import_star=True, show_successes=True, cache=cache)
+    assert len(list((files / "cache").glob("*/*.pickle"))) == 3
+
+    # Only the file which may call it is checked again
+    for exits in [{"app.fail"}, {"app.fail", "app.other.abort"}]:
+        run(
+            paths,
+            timeout=5,
+            allow_import_star=True,
+            show_successes=True,
+            cache=cache,
+            exits=frozenset(exits),
+        )
+        assert len(list((files / "cache").glob("*/*.pickle"))) == 4
+    capsys.readouterr()
+
+
+def test_run_max_warnings(tmp_path: Path, capsys: pytest.CaptureFixture) -> None:
+    paths = []
+    for i in range(5):
+        path = tmp_path / f"{i}.py"
+        path.write_text(f"print(a{i})\n")
+        paths.append(path)
+
+    assert not run(
+        paths, timeout=5, allow_import_star=True, show_successes=True, max_warnings=2
+    )
+    captured = capsys.readouterr()
+    assert len(captured.out.splitlines()) == 2
+    assert "Stopped after 2 failing warnings" in captured.err
+
+
+def test_run_history_checks_failures_first(
+    tmp_path: Path, capsys: pytest.CaptureFixture
+) -> None:
+    paths = []
+    for i in range(5):
+        path = tmp_path / f"{i}.py"
+        path.write_text("a = 1\nprint(a)\n")
+        paths.append(path)
+    paths[3].write_text("print(a)\n")
+
+    history = FailureHistory(tmp_path / "history.json")
+    assert not run(paths, 5, True, True, workers=0, history=history)
+    assert list(history.scores) == [str(paths[3])]
+    capsys.readouterr()
+
+    history = FailureHistory(tmp_path / "history.json")
+    assert not run(paths, 5, True, True, workers=0, history=history, max_warnings=1)
+    assert capsys.readouterr().out.splitlines() == [
+        f"⚠️  {paths[3]}: Warning on line  1, column  6: reference to potentially undefined `a`"
+    ]
+
+    # Files which pass are eventually forgotten
+    paths[3].write_text("a = 1\nprint(a)\n")
+    for _ in range(4):
+        run(paths, 5, True, True, workers=0, history=history)
+    assert history.scores == {}
@@ -0,0 +1,92 @@
+import os
+import time
+from pathlib import Path
+from typing import Sequence
+
+from pyrefchecker import BaseWarning, RefWarning
+from pyrefchecker.bin.cache import STALE_TMP_AGE, ResultCache
+
+
+def test_cache_roundtrip(tmp_path: Path) -> None:
+    cache: ResultCache[Sequence[BaseWarning]] = ResultCache(
+        tmp_path, max_size=1024 * 1024
+    )
+    key = cache.key(b"print(a)\n")
+
+    assert cache.get(key) is None
+    cache.set(key, [RefWarning(line=1, column=6, reference="a")])
+    assert cache.get(key) == [RefWarning(line=1, column=6, reference="a")]
+
+
+def test_cache_key_depends_on_options(tmp_path: Path) -> None:
+    a: ResultCache[Sequence[BaseWarning]] = ResultCache(
+        tmp_path, max_size=1024, options={"engine": "a"}
+    )
+    b: ResultCache[Sequence[BaseWarning]] = ResultCache(
+        tmp_path, max_size=1024, options={"engine": "b"}
+    )
+
+    assert a.key(b"x = 1") == a.key(b"x = 1")
+    assert a.key(b"x = 1") != a.key(b"x = 2")
+    assert a.key(b"x = 1") != b.key(b"x = 1")
+
+
+def test_cache_corrupt_entry(tmp_path: Path) -> None:
+    cache: ResultCache[Sequence[BaseWarning]] = ResultCache(tmp_path, max_size=1024)
+    key = cache.key(b"")
+    cache.set(key, [])
+    for path in tmp_path.glob("*/*.pickle"):
+        path.write_bytes(b"garbage")
+
+    assert cache.get(key) is None
+    assert not list(tmp_path.glob("*/*.pickle"))
+
+
+def test_cache_prune_evicts_least_recently_used(tmp_path: Path) -> None:
+    cache: ResultCache[Sequence[BaseWarning]] = ResultCache(tmp_path, max_size=0)
+    keys = [cache.key(bytes([i])) for i in range(3)]
+    for key in keys:
+        cache.set(key, [])
+
+    entry_size = next(tmp_path.glob("*/*.pickle")).stat().st_size
+    cache.max_size = entry_size * 2
+
+    # Make the first entry the oldest, then use it so that it's the newest
+    for age, key in enumerate(keys):
+        path = cache._path(key)
+        mtime = path.stat().st_mtime - 100 + age
+        os.utime(path, (mtime, mtime))
+    assert cache.get(keys[0]) == []
+
+    cache.prune()
+
+    assert cache.get(keys[0]) == []
+    assert cache.get(keys[1]) is None
+    assert cache.get(keys[2]) == []
+
+
+def test_cache_ignored_by_git(tmp_path: Path) -> None:
+    cache: ResultCache[Sequence[BaseWarning]] = ResultCache(
+        tmp_path / "cache", max_size=1024
+    )
+    cache.set(cache.key(b""), [])
+
+    assert (tmp_path / "cache" / ".gitignore").read_text() == "*\n"
+
+
+def test_cache_prune_removes_stale_temporary_files(tmp_path: Path) -> None:
+    cache: ResultCache[Sequence[BaseWarning]] = ResultCache(
+        tmp_path, max_size=1024 * 1024
+    )
+    cache.set(cache.key(b""), [])
+    directory = next(x for x in tmp_path.iterdir() if x.is_dir())
+    stale, fresh = directory / "stale.tmp", directory / "fresh.tmp"
+    stale.write_bytes(b"")
+    fresh.write_bytes(b"")
+    mtime = time.time() - STALE_TMP_AGE - 1
+    os.utime(stale, (mtime, mtime))
+
+    cache.prune()
+
+    assert not stale.exists()
+    assert fresh.exists()
@@ -0,0 +1,75 @@
+import pytest
+
+from pyrefchecker import Checker, ImportStarWarning, RefWarning, check_many
+from pyrefchecker.block_scope_provider import find_qualified_name_for_non_import, sp
+
+SOURCES = [
+    ("bad.py", "print(a)\n"),
+    ("good.py", "a = 1\nprint(a)\n"),
+    ("slow.py", "import time\ntime.sleep(10)\n"),
+]
+
+
+def test_checker_patches_for_its_lifetime() -> None:
+    name = "find_qualified_name_for_non_import"
+    # Other tests may have patched this process for its lifetime, as workers do
+    before = getattr(sp._NameUtil, name, None)
+    with Checker() as checker:
+        assert checker.check("print(a)\n") == [
+            RefWarning(line=1, column=6, reference="a")
+        ]
+        assert getattr(sp._NameUtil, name) is find_qualified_name_for_non_import
+    assert getattr(sp._NameUtil, name, None) is before
+
+
+def test_checker_rejects_unknown_engine() -> None:
+    with pytest.raises(ValueError):
+        Checker(engine="nope")
+
+
+@pytest.mark.parametrize("workers", [0, 2])
+def test_check_many(workers: int) -> None:
+    results = {
+        x.name: x for x in check_many(SOURCES[:2], engine="ast", workers=workers)
+    }
+    assert results["bad.py"].warnings == [RefWarning(line=1, column=6, reference="a")]
+    assert results["good.py"].ok and results["good.py"].warnings == []
+
+
+def test_check_many_timeout(monkeypatch: pytest.MonkeyPatch) -> None:
+    # Make one item take too long, in a way that survives forking into workers
+    def slow_check(code: str, engine: str) -> list:
+        if "sleep" in code:
+            import time
+
+            time.sleep(10)
+        return []
+
+    monkeypatch.setattr("pyrefchecker.checker.check", slow_check)
+    with Checker(engine="ast", workers=1, timeout=0.5) as checker:
+        results = {x.name: x for x in checker.check_many(iter(SOURCES))}
+        assert results["slow.py"].timed_out and not results["slow.py"].ok
+        assert results["good.py"].ok
+
+        # The pool is reused, and replaces the worker which timed out
+        assert [x.name for x in checker.check_many([SOURCES[1]])] == ["good.py"]
+
+
+def test_checker_with_index() -> None:
+    code = """
+from app.errors import abort
+from app.names import *
+
+if name:
+    a = 1
+else:
+    abort(1)
+print(a)
+"""
+    exits = {"app.errors.abort"}
+    exports = {"app.names": ["name"]}
+    with Checker(engine="ast", workers=1, exits=exits, exports=exports) as checker:
+        assert checker.check(code) == []
+        assert [x.warnings for x in checker.check_many([("a.py", code)])] == [[]]
+
+    assert Checker(engine="ast").check(code) == [ImportStarWarning()]
@@ -0,0 +1,104 @@
+import threading
+from pathlib import Path
+from typing import Any, Dict, Iterator, List
+
+import pytest
+
+from pyrefchecker.bin.daemon import DaemonNotRunning, request, status
+from pyrefchecker.bin.daemon_server import DaemonServer
+
+
+@pytest.fixture
+def socket_path(tmp_path: Path) -> Iterator[str]:
+    path = str(tmp_path / "daemon.sock")
+    server = DaemonServer(path, engine="ast", workers=0)
+    thread = threading.Thread(target=server.serve)
+    thread.start()
+    while status(path) is None:
+        pass
+    yield path
+    list(request(path, {"command": "stop"}))
+    thread.join()
+
+
+def check(socket_path: str, cwd: Path, **options: Any) -> List[Dict[str, Any]]:
+    message = {
+        "command": "check",
+        "cwd": str(cwd),
+        "paths": [],
+        "show_successes": None,
+        "allow_import_star": None,
+        **options,
+    }
+    return list(request(socket_path, message))
+
+
+def test_daemon_checks_changed_files(socket_path: str, tmp_path: Path) -> None:
+    (tmp_path / "good.py").write_text("x = 1\nprint(x)\n")
+    (tmp_path / "copy.py").write_text("x = 1\nprint(x)\n")
+    (tmp_path / "bad.py").write_text("print(x)\n")
+
+    assert check(socket_path, tmp_path, show_successes=True) == [
+        {
+            "out": "⚠️  bad.py: Warning on line  1, column  6: reference to potentially undefined `x`"
+        },
+        {"out": "✅ copy.py"},
+        {"out": "✅ good.py"},
+        {"exit": 1},
+    ]
+    # Identical files are only checked once
+    assert status(socket_path)["checked"] == 2  # type: ignore
+
+    # Unchanged files aren't checked again
+    (tmp_path / "bad.py").write_text("x = 1\nprint(x)\n")
+    assert check(socket_path, tmp_path, paths=["bad.py", "good.py"]) == [
+        {"out": "✨ all good!"},
+        {"exit": 0},
+    ]
+    assert status(socket_path)["checked"] == 2  # type: ignore
+    assert status(socket_path)["files"] == 3  # type: ignore
+
+    (tmp_path / "good.py").write_text("print(y)\n")
+    assert check(socket_path, tmp_path, paths=["good.py"])[-1] == {"exit": 1}
+    assert status(socket_path)["checked"] == 3  # type: ignore
+
+
+def test_no_daemon(tmp_path: Path) -> None:
+    path = str(tmp_path / "missing.sock")
+    assert status(path) is None
+    with pytest.raises(DaemonNotRunning):
+        list(request(path, {"command": "status"}))
+
+
+def test_daemon_reindexes(socket_path: str, tmp_path: Path) -> None:
+    app = tmp_path / "app"
+    app.mkdir()
+    (app / "__init__.py").write_text("")
+    (app / "names.py").write_text("name = 1\n")
+    (app / "user.py").write_text("from app.names import *\nprint(name)\n")
+
+    assert check(socket_path, tmp_path) == [{"out": "✨ all good!"}, {"exit": 0}]
+
+    # The user is checked again with the new exports, though it hasn't changed
+    (app / "names.py").write_text("other = 1\n")
+    assert check(socket_path, tmp_path) == [
+        {
+            "out": "⚠️  app/user.py: Warning on line  2, column  6: reference to potentially undefined `name`"
+        },
+        {"exit": 1},
+    ]
+
+
+def test_daemon_keys_on_resolved_imports(socket_path: str, tmp_path: Path) -> None:
+    for package, name in [("a", "x"), ("b", "y")]:
+        (tmp_path / package).mkdir()
+        (tmp_path / package / "__init__.py").write_text("from .m import *\nprint(x)\n")
+        (tmp_path / package / "m.py").write_text(f"{name} = 1\n")
+
+    # The same contents import different names in each package
+    assert check(socket_path, tmp_path) == [
+        {
+            "out": "⚠️  b/__init__.py: Warning on line  2, column  6: reference to potentially undefined `x`"
+        },
+        {"exit": 1},
+    ]
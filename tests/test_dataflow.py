@@ -0,0 +1,188 @@
+import sys
+
+import pytest
+
+from pyrefchecker import NoLocationRefWarning, RefWarning, check
+
+
+def test_assigned_in_every_branch() -> None:
+    code = """
+from random import random as a, random as c
+
+if a():
+    b = 1
+elif c():
+    b = 2
+else:
+    b = 3
+print(b)
+
+if a():
+    d = 1
+elif c():
+    pass
+else:
+    d = 3
+print(d)
+"""
+    assert check(code, engine="dataflow") == [
+        RefWarning(line=18, column=6, reference="d")
+    ]
+
+
+def test_loops() -> None:
+    code = """
+from os import listdir as y
+
+for x in y():
+    pass
+else:
+    a = 1
+print(a, x)
+
+while True:
+    b = 1
+    if b:
+        break
+print(b)
+
+while y():
+    c = 1
+print(c)
+
+for x in y():
+    if x:
+        break
+else:
+    d = 1
+print(d)
+"""
+    assert check(code, engine="dataflow") == [
+        RefWarning(line=18, column=6, reference="c"),
+        RefWarning(line=25, column=6, reference="d"),
+    ]
+
+
+def test_try_finally() -> None:
+    code = """
+try:
+    a = 1
+    b = 1
+except ValueError:
+    a = 2
+else:
+    print(b)
+finally:
+    c = 1
+    print(a)
+print(a, b, c)
+"""
+    assert check(code, engine="dataflow") == [
+        RefWarning(line=11, column=10, reference="a"),
+        RefWarning(line=12, column=9, reference="b"),
+    ]
+
+
+def test_deeply_nested_try() -> None:
+    depth = 50
+    code = ""
+    for i in range(depth):
+        code += "    " * i + f"try:\n" + "    " * (i + 1) + f"x{i} = 1\n"
+    code += "    " * depth + "pass\n"
+    for i in reversed(range(depth)):
+        indent = "    " * i
+        code += f"{indent}except ValueError:\n{indent}    pass\n"
+        code += f"{indent}else:\n{indent}    print(x{i})\n"
+
+    assert check(code, engine="dataflow") == []
+
+
+def test_function_locals() -> None:
+    code = """
+a = 1
+
+def f(b):
+    if b:
+        a = 2
+    print(a, b, c)
+
+def g():
+    return c
+
+c = 1
+"""
+    assert check(code, engine="dataflow") == [
+        RefWarning(line=7, column=10, reference="a")
+    ]
+
+
+def test_terminal_functions() -> None:
+    code = """
+import sys
+
+def fail():
+    log()
+    sys.exit(1)
+
+def log():
+    fail()
+
+def retry():
+    if sys.argv:
+        return
+    raise ValueError()
+
+try:
+    import a
+except ImportError:
+    log()
+
+try:
+    import b
+except ImportError:
+    retry()
+
+print(a, b)
+"""
+    assert check(code, engine="dataflow") == [
+        RefWarning(line=26, column=9, reference="b")
+    ]
+
+
+@pytest.mark.skipif(
+    sys.version_info < (3, 10), reason="match statements need Python 3.10"
+)
+def test_conditional_expressions() -> None:
+    code = """
+from random import random as f
+
+if (a := f()) or (b := f()):
+    pass
+print(a, b)
+
+match a:
+    case [c]:
+        pass
+    case _:
+        c = None
+print(c)
+"""
+    assert check(code, engine="dataflow") == [
+        RefWarning(line=6, column=9, reference="b")
+    ]
+
+
+def test_string_annotations() -> None:
+    code = """
+from typing import List
+
+def f(x: "A", y: List["B"]) -> "C":
+    pass
+
+class B:
+    pass
+"""
+    assert check(code, engine="dataflow") == [
+        NoLocationRefWarning(reference="A"),
+        NoLocationRefWarning(reference="C"),
+    ]
@@ -0,0 +1,137 @@
+from pathlib import Path
+from typing import Iterator
+
+import pytest
+
+from pyrefchecker import ENGINES, check
+from pyrefchecker.ast_compat import parse
+from pyrefchecker.bin.cache import ResultCache
+from pyrefchecker.bin.project_index import ModuleIndex, index_project
+from pyrefchecker.exits import (
+    key_content,
+    set_project_exits,
+    summarize_exits,
+    terminal_functions,
+)
+from pyrefchecker.modules import imported_modules, module_name, parent_modules
+
+ERRORS = """
+from typing import NoReturn
+
+def abort(code: int) -> NoReturn:
+    raise SystemExit(code)
+"""
+
+HELPERS = """
+import sys
+from .errors import abort
+
+def fail():
+    abort(1)
+
+def quit():
+    sys.exit(0)
+
+def maybe(x):
+    if x:
+        abort(1)
+"""
+
+VIEWS = """
+from app import fail
+
+def view(x):
+    if x:
+        y = 1
+    else:
+        fail()
+    return y
+"""
+
+
+@pytest.fixture
+def project(tmp_path: Path) -> Iterator[Path]:
+    app = tmp_path / "app"
+    app.mkdir()
+    (app / "__init__.py").write_text("from .helpers import fail\n")
+    (app / "errors.py").write_text(ERRORS)
+    (app / "helpers.py").write_text(HELPERS)
+    (app / "views.py").write_text(VIEWS)
+    yield app
+    set_project_exits(())
+
+
+def test_module_name(project: Path) -> None:
+    assert module_name(project / "errors.py") == "app.errors"
+    assert module_name(project / "__init__.py") == "app"
+
+
+def test_terminal_functions() -> None:
+    summaries = [
+        summarize_exits(parse(ERRORS), "app.errors"),
+        summarize_exits(parse(HELPERS), "app.helpers"),
+        summarize_exits(parse("from .helpers import fail\n"), "app", True),
+    ]
+    assert terminal_functions(summaries) == {
+        "app.errors.abort",
+        "app.helpers.abort",
+        "app.helpers.fail",
+        "app.helpers.quit",
+        "app.fail",
+    }
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_project_exits(project: Path, engine: str) -> None:
+    views = (project / "views.py").read_text()
+    assert len(check(views, engine=engine)) == 1
+
+    set_project_exits(index_project(sorted(project.glob("*.py"))).exits)
+    assert check(views, engine=engine) == []
+
+
+def test_index_project_cached(project: Path) -> None:
+    cache: ResultCache[ModuleIndex] = ResultCache(
+        project / "cache", max_size=1024 * 1024
+    )
+    paths = sorted(project.glob("*.py"))
+
+    index = index_project(paths, cache=cache)
+    assert len(list((project / "cache").glob("*/*.pickle"))) == len(paths)
+    assert index_project(paths, cache=cache) == index
+
+
+def test_imported_modules() -> None:
+    assert imported_modules(parse(HELPERS), "app.helpers") == [
+        "sys",
+        "app.errors",
+        "app.errors.abort",
+    ]
+    assert imported_modules(parse("from . import helpers"), "app", True) == [
+        "app",
+        "app.helpers",
+    ]
+    assert list(parent_modules("app.errors.abort")) == [
+        "app.errors.abort",
+        "app.errors",
+        "app",
+    ]
+
+
+def test_index_project_reachable(project: Path) -> None:
+    (project / "other.py").write_text(ERRORS)
+    paths = sorted(project.glob("*.py"))
+
+    index = index_project(paths, reachable_from=[project / "views.py"])
+    assert "app.fail" in index.exits
+    assert "app.other.abort" not in index.exits
+    assert "app.other.abort" in index_project(paths).exits
+
+
+def test_key_content() -> None:
+    exits = {"app.fail", "app.errors.abort"}
+    assert key_content(VIEWS.encode(), exits) == b'["app.fail"]\n' + VIEWS.encode()
+    assert key_content(VIEWS.encode(), exits) == key_content(
+        VIEWS.encode(), exits | {"app.other.abort"}
+    )
+    assert key_content(b"[]\n", set()) != key_content(b"", set())
@@ -0,0 +1,100 @@
+from pathlib import Path
+
+import pytest
+
+from pyrefchecker import ImportStarWarning, RefWarning, check
+from pyrefchecker.ast_compat import parse
+from pyrefchecker.bin.bin import run
+from pyrefchecker.bin.project_index import index_project
+from pyrefchecker.exports import (
+    ExportSummary,
+    expand_import_star,
+    module_exports,
+    summarize_exports,
+)
+
+
+def summarize(code: str) -> ExportSummary:
+    return summarize_exports(parse(code), "pkg.mod")
+
+
+def test_summarize_exports() -> None:
+    assert summarize("import os.path\nA = 1\n_b = 2\ndef f(): pass\n") == ExportSummary(
+        names=["os", "A", "f"]
+    )
+    assert summarize(
+        "__all__ = ['A']\n__all__ += ['B']\n__all__.append('C')\nD = 1\n"
+    ) == ExportSummary(names=["A", "B", "C"])
+    assert summarize(
+        "from .base import *\ntry:\n    import x\nexcept:\n    x = None\n"
+    ) == ExportSummary(names=["x"], stars=["pkg.base"])
+    assert summarize("__all__ = names()\n") == ExportSummary(names=None)
+
+
+def test_module_exports() -> None:
+    exports = module_exports(
+        {
+            "a": ExportSummary(names=["A"], stars=["b"]),
+            "b": ExportSummary(names=["B"], stars=["a"]),
+            "c": ExportSummary(names=["C"], stars=["tkinter"]),
+        }
+    )
+    assert exports == {"a": ["A", "B"], "b": ["B", "A"]}
+
+
+def test_expand_import_star(tmp_path: Path) -> None:
+    code = "from a import *  # comment\nfrom b import *\nfrom a import *; print(A)\n"
+    assert expand_import_star(code, tmp_path / "x.py", {"a": ["A", "B"], "b": []}) == (
+        "from a import A, B  # comment\npass\nfrom a import *; print(A)\n"
+    )
+
+
+def test_import_star_in_package_binds_submodule(tmp_path: Path) -> None:
+    (tmp_path / "pkg").mkdir()
+    init = tmp_path / "pkg" / "__init__.py"
+    init.write_text("")
+    code = "from .events import *\nfrom .empty import *\nprint(events, empty, run)\n"
+
+    exports = {"pkg.events": ["run"], "pkg.empty": []}
+    assert expand_import_star(code, init, exports) == (
+        "from .events import run, events\nfrom .empty import empty\n"
+        "print(events, empty, run)\n"
+    )
+    # Not in a module of the package
+    assert expand_import_star(code, tmp_path / "pkg" / "mod.py", exports) == (
+        "from .events import run\npass\nprint(events, empty, run)\n"
+    )
+
+    assert summarize_exports(
+        parse("from .events import *\nfrom . import util\n"), "pkg", True
+    ) == ExportSummary(names=["events", "util"], stars=["pkg.events"])
+
+
+def test_check_with_exports(tmp_path: Path) -> None:
+    (tmp_path / "pkg").mkdir()
+    (tmp_path / "pkg" / "__init__.py").write_text("")
+    (tmp_path / "pkg" / "base.py").write_text("__all__ = ['A']\nA = B = 1\n")
+    path = tmp_path / "pkg" / "user.py"
+    path.write_text("from .base import *\nprint(A, B)\n")
+
+    exports = index_project(sorted((tmp_path / "pkg").glob("*.py"))).exports
+    assert exports["pkg.base"] == ["A"]
+    code = expand_import_star(path.read_text(), path, exports)
+    assert check(path.read_text()) == [ImportStarWarning()]
+    assert check(code) == [RefWarning(line=2, column=9, reference="B")]
+
+
+def test_run_with_exports(tmp_path: Path, capsys: pytest.CaptureFixture) -> None:
+    (tmp_path / "base.py").write_text("A = 1\n")
+    (tmp_path / "user.py").write_text("from base import *\nprint(A, B)\n")
+    paths = sorted(tmp_path.glob("*.py"))
+
+    assert not run(
+        paths,
+        timeout=5,
+        allow_import_star=True,
+        show_successes=False,
+        workers=0,
+        exports=index_project(paths).exports,
+    )
+    assert "undefined `B`" in capsys.readouterr().out
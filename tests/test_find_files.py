@@ -0,0 +1,75 @@
+import os
+import re
+import subprocess
+from pathlib import Path
+from typing import Any
+
+import pytest
+
+from pyrefchecker.bin.find_files import find_files, select_files
+from pyrefchecker.bin.git import changed_files
+
+
+@pytest.fixture
+def tree(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Path:
+    for name in ["pkg/a.py", "pkg/b.pyi", "pkg/c.txt", "pkg/build/d.py", "e.py"]:
+        path = tmp_path / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text("a = 1\n")
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+def test_select_files(tree: Path) -> None:
+    candidates = {tree / x for x in ["pkg/a.py", "pkg/c.txt", "pkg/build/d.py", "e.py"]}
+
+    result = select_files(
+        candidates, ["pkg", "e.py"], re.compile(r"\.pyi?$"), [re.compile("build")]
+    )
+
+    assert result == {Path("pkg/a.py"), Path("e.py")}
+
+
+def test_changed_files(tree: Path) -> None:
+    def git(*args: str) -> None:
+        subprocess.run(["git", *args], check=True, stdout=subprocess.DEVNULL)
+
+    git("init", "-q")
+    git("add", "pkg")
+    git("-c", "user.name=a", "-c", "user.email=a@b", "commit", "-qm", "initial")
+    (tree / "pkg/a.py").write_text("a = 2\n")
+    (tree / "pkg/b.pyi").unlink()
+
+    assert changed_files("HEAD") == {
+        tree.resolve() / "pkg/a.py",
+        tree.resolve() / "e.py",
+    }
+
+
+def test_find_files(tree: Path) -> None:
+    result = list(find_files(["."], re.compile(r"\.pyi?$"), [re.compile("build")]))
+
+    assert result == [Path("e.py"), Path("pkg/a.py"), Path("pkg/b.pyi")]
+
+
+def test_find_files_prunes_excluded_directories(
+    tree: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    scanned = []
+    scandir = os.scandir
+
+    def spy(path: str) -> Any:
+        scanned.append(path)
+        return scandir(path)
+
+    monkeypatch.setattr(os, "scandir", spy)
+    result = list(
+        find_files(
+            ["pkg", "pkg/a.py", "e.py"],
+            re.compile(r"\.py$"),
+            [re.compile("build$"), re.compile("nothing")],
+        )
+    )
+
+    assert result == [Path("pkg/a.py"), Path("e.py")]
+    assert os.path.join("pkg", "build") not in scanned
@@ -0,0 +1,129 @@
+import io
+import json
+from pathlib import Path
+
+import pytest
+
+import pyrefchecker.bin.bin
+from pyrefchecker import RefWarning
+from pyrefchecker.bin.bin import run
+from pyrefchecker.bin.formats import (
+    JsonLinesReporter,
+    ReorderBuffer,
+    SarifReporter,
+    TextReporter,
+)
+from pyrefchecker.pool import Outcome
+
+
+@pytest.fixture
+def files(tmp_path: Path) -> Path:
+    (tmp_path / "bad.py").write_text("import x\nif x:\n    a = 1\nprint(a)\n")
+    (tmp_path / "good.py").write_text("a = 1\nprint(a)\n")
+    (tmp_path / "star.py").write_text("from os import *\n")
+    return tmp_path
+
+
+def test_jsonl(files: Path) -> None:
+    stream = io.StringIO()
+    reporter = JsonLinesReporter(
+        allow_import_star=True, show_successes=False, stream=stream
+    )
+    paths = sorted(files.glob("*.py"))
+
+    assert not run(paths, 5, True, False, workers=0, reporter=reporter, sort=True)
+
+    records = [json.loads(x) for x in stream.getvalue().splitlines()]
+    assert records == [
+        {
+            "path": str(files / "bad.py"),
+            "status": "warnings",
+            "warnings": [
+                {
+                    "type": "RefWarning",
+                    "line": 4,
+                    "column": 6,
+                    "reference": "a",
+                    "message": "Warning on line  4, column  6: reference to potentially undefined `a`",
+                }
+            ],
+            "failed": True,
+        },
+        {
+            "path": str(files / "star.py"),
+            "status": "warnings",
+            "warnings": [
+                {
+                    "type": "ImportStarWarning",
+                    "message": "Unable to check file, import * detected",
+                }
+            ],
+            "failed": False,
+        },
+    ]
+
+
+def test_jsonl_streams_each_record() -> None:
+    stream = io.StringIO()
+    reporter = JsonLinesReporter(
+        allow_import_star=True, show_successes=False, stream=stream
+    )
+
+    warnings = [RefWarning(line=1, column=6, reference="a")]
+    assert not reporter.report("a.py", Outcome(value=warnings))
+    # Written before any other file is reported, or the run finishes
+    assert json.loads(stream.getvalue())["path"] == "a.py"
+
+
+def test_sarif(files: Path) -> None:
+    stream = io.StringIO()
+    reporter = SarifReporter(
+        allow_import_star=False, show_successes=False, stream=stream
+    )
+
+    assert not run(
+        sorted(files.glob("*.py")), 5, False, False, workers=0, reporter=reporter
+    )
+
+    log = json.loads(stream.getvalue())
+    assert log["version"] == "2.1.0"
+    results = sorted(log["runs"][0]["results"], key=lambda x: x["ruleId"])
+    assert [(x["ruleId"], x["level"]) for x in results] == [
+        ("import-star", "error"),
+        ("undefined-reference", "error"),
+    ]
+    assert results[1]["locations"][0]["physicalLocation"]["region"] == {
+        "startLine": 4,
+        "startColumn": 7,
+        "endColumn": 8,
+    }
+
+
+def test_sorted_windows(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(pyrefchecker.bin.bin, "SORT_WINDOW", 3)
+    paths = []
+    for i in range(10):
+        path = tmp_path / f"{i}.py"
+        # Duplicates are only checked once, but still reported in order
+        path.write_text(f"print(a{i % 4})\n")
+        paths.append(path)
+
+    stream = io.StringIO()
+    reporter = TextReporter(allow_import_star=True, show_successes=False, stream=stream)
+    assert not run(
+        reversed(paths), 5, True, False, workers=2, reporter=reporter, sort=True
+    )
+
+    assert [x.split(":")[0] for x in stream.getvalue().splitlines()] == [
+        f"⚠️  {x}" for x in reversed(paths)
+    ]
+
+
+def test_reorder_buffer() -> None:
+    buffer: ReorderBuffer[str] = ReorderBuffer()
+    assert buffer.add(1, "b") == []
+    assert buffer.add(2, "c") == []
+    assert len(buffer) == 2
+    assert buffer.add(0, "a") == ["a", "b", "c"]
+    assert buffer.add(3, "d") == ["d"]
+    assert len(buffer) == 0
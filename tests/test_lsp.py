@@ -0,0 +1,227 @@
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from functools import partial
+from pathlib import Path
+from typing import Any, BinaryIO, Dict, Iterator, List, Optional, Tuple
+
+import pytest
+
+from pyrefchecker import RefWarning, check
+from pyrefchecker.bin.lsp import LanguageServer, to_diagnostics
+
+URI = "file:///example.py"
+
+
+class Client:
+    def __init__(self, writer: BinaryIO, reader: BinaryIO):
+        self.writer = writer
+        self.reader = reader
+
+    def send(self, method: str, params: Any, id: Any = None) -> None:
+        message = {"jsonrpc": "2.0", "method": method, "params": params}
+        if id is not None:
+            message["id"] = id
+        body = json.dumps(message).encode()
+        self.writer.write(b"Content-Length: %d\r\n\r\n" % len(body) + body)
+        self.writer.flush()
+
+    def receive(self) -> Dict[str, Any]:
+        length = int(self.reader.readline().split(b":")[1])
+        self.reader.readline()
+        return json.loads(self.reader.read(length))
+
+    def open(self, text: str) -> None:
+        self.send(
+            "textDocument/didOpen",
+            {
+                "textDocument": {
+                    "uri": URI,
+                    "languageId": "python",
+                    "version": 1,
+                    "text": text,
+                }
+            },
+        )
+
+    def change(self, version: int, text: str) -> None:
+        self.send(
+            "textDocument/didChange",
+            {
+                "textDocument": {"uri": URI, "version": version},
+                "contentChanges": [{"text": text}],
+            },
+        )
+
+
+def _pipe() -> Tuple[BinaryIO, BinaryIO]:
+    read, write = os.pipe()
+    return os.fdopen(read, "rb"), os.fdopen(write, "wb")
+
+
+def analyse(text: str, started: Optional[Path] = None) -> List[Any]:
+    if text == "slow":
+        assert started is not None
+        started.write_text("")
+        time.sleep(60)
+        # Only reached if the analysis wasn't interrupted
+        started.write_text("finished")
+    # Slow enough for edits to arrive during an analysis
+    time.sleep(0.05)
+    return check(text, engine="ast")
+
+
+@pytest.fixture
+def connection(tmp_path: Path) -> Iterator[Tuple[Client, LanguageServer]]:
+    with _serve(
+        {"capabilities": {}},
+        debounce=0.05,
+        analyse=partial(analyse, started=tmp_path / "started"),
+        workers=1,
+    ) as connected:
+        yield connected
+
+
+@contextmanager
+def _serve(
+    initialize: Dict[str, Any], **options: Any
+) -> Iterator[Tuple[Client, LanguageServer]]:
+    server_in, client_out = _pipe()
+    client_in, server_out = _pipe()
+
+    server = LanguageServer(server_in, server_out, **options)
+    thread = threading.Thread(target=server.serve)
+    thread.start()
+    client = Client(client_out, client_in)
+
+    client.send("initialize", initialize, id=1)
+    assert client.receive()["result"]["serverInfo"]["name"] == "pyrefchecker"
+    client.send("initialized", {})
+    try:
+        yield client, server
+        client.send("shutdown", None, id=2)
+        assert client.receive() == {"jsonrpc": "2.0", "id": 2, "result": None}
+    finally:
+        client.send("exit", None)
+        thread.join()
+
+
+def test_diagnostics(connection: Tuple[Client, LanguageServer]) -> None:
+    client, server = connection
+    client.send(
+        "textDocument/didOpen",
+        {
+            "textDocument": {
+                "uri": URI,
+                "languageId": "python",
+                "version": 1,
+                "text": "print(a)\nprint(b)  # ref: ignore\n",
+            }
+        },
+    )
+    published = client.receive()
+    assert published["method"] == "textDocument/publishDiagnostics"
+    assert published["params"]["version"] == 1
+    assert [x["range"] for x in published["params"]["diagnostics"]] == [
+        {"start": {"line": 0, "character": 6}, "end": {"line": 0, "character": 7}}
+    ]
+
+    # Only the last of a burst of edits is published, even if some were analysed
+    for version in range(2, 10):
+        client.change(version, "print(a)\n" * version)
+        time.sleep(0.02)
+    client.change(10, "a = 1\nprint(a)\n")
+    published = client.receive()
+    assert published["params"] == {"uri": URI, "version": 10, "diagnostics": []}
+    assert server.analyses < 9
+
+    # Unchanged documents aren't analysed again
+    analyses = server.analyses
+    client.change(11, "a = 1\nprint(a)\n")
+    time.sleep(0.2)
+    client.send("textDocument/didClose", {"textDocument": {"uri": URI}})
+    assert client.receive()["params"] == {"uri": URI, "diagnostics": []}
+    assert server.analyses == analyses
+
+
+def test_superseded_analysis_interrupted(
+    connection: Tuple[Client, LanguageServer], tmp_path: Path
+) -> None:
+    client, server = connection
+    client.open("slow")
+    while not (tmp_path / "started").exists():
+        time.sleep(0.01)
+
+    # With a single worker, this would wait for the slow analysis if it weren't killed
+    start = time.monotonic()
+    client.change(2, "print(a)\n")
+    published = client.receive()
+    assert published["params"]["version"] == 2
+    assert time.monotonic() - start < 10
+    assert (tmp_path / "started").read_text() == ""
+
+
+def test_invalid_params(connection: Tuple[Client, LanguageServer]) -> None:
+    client, server = connection
+    client.send("textDocument/didOpen", {"textDocument": {"uri": URI}})
+    client.send("textDocument/didChange", {"textDocument": None, "contentChanges": []})
+    client.send("textDocument/didClose", {}, id=3)
+    error = client.receive()
+    assert error["id"] == 3
+    assert error["error"]["code"] == -32602
+
+    # The server carries on
+    client.open("print(a)\n")
+    assert client.receive()["params"]["version"] == 1
+
+
+def test_workspace_index(tmp_path: Path) -> None:
+    app = tmp_path / "app"
+    app.mkdir()
+    (app / "__init__.py").write_text("")
+    (app / "names.py").write_text("name = 1\n")
+    user = app / "user.py"
+    user.write_text("from app.names import *\nprint(name)\n")
+
+    with _serve(
+        {"capabilities": {}, "rootUri": tmp_path.as_uri()},
+        debounce=0.05,
+        analyse=partial(check, engine="ast"),
+        workers=1,
+        resolve_import_star=True,
+    ) as (client, server):
+        client.send(
+            "textDocument/didOpen",
+            {
+                "textDocument": {
+                    "uri": user.as_uri(),
+                    "languageId": "python",
+                    "version": 1,
+                    "text": user.read_text(),
+                }
+            },
+        )
+        # Nothing is published for a new document without warnings
+        while not server.analyses:
+            time.sleep(0.01)
+        assert server.documents[user.as_uri()].diagnostics == []
+
+        # Analysed again once the module it imports * from is saved
+        (app / "names.py").write_text("other = 1\n")
+        client.send("textDocument/didSave", {"textDocument": {"uri": user.as_uri()}})
+        published = client.receive()
+        assert [x["message"] for x in published["params"]["diagnostics"]] == [
+            "reference to potentially undefined `name`"
+        ]
+
+
+def test_to_diagnostics() -> None:
+    text = "x = '🐍'; print(y)\n"
+    diagnostics = to_diagnostics(text, [RefWarning(line=1, column=15, reference="y")])
+    # The snake is two UTF-16 code units
+    assert diagnostics[0]["range"] == {
+        "start": {"line": 0, "character": 16},
+        "end": {"line": 0, "character": 17},
+    }
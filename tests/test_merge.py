@@ -0,0 +1,84 @@
+from pathlib import Path
+from typing import List, TextIO
+
+import click
+import pytest
+
+from pyrefchecker.bin.bin import run
+from pyrefchecker.bin.formats import JsonLinesReporter
+from pyrefchecker.bin.merge import merge, read_shards
+from pyrefchecker.bin.scheduling import ShardSelection
+
+
+def run_shards(tmp_path: Path, shards: List[List[Path]], name: str = "") -> List[Path]:
+    """ Check each shard, and return the paths of their results """
+    results = []
+    paths = [path for shard in shards for path in shard]
+    for index, shard in enumerate(shards, 1):
+        result = tmp_path / f"{name}{index}.jsonl"
+        with result.open("w") as stream:
+            selection = ShardSelection.of(shard, paths, index, len(shards))
+            reporter = JsonLinesReporter(True, False, stream=stream, shard=selection)
+            run(shard, 5, True, False, workers=0, reporter=reporter)
+        results.append(result)
+    return results
+
+
+def read(paths: List[Path]) -> List[TextIO]:
+    return [path.open() for path in paths]
+
+
+def test_merge(tmp_path: Path) -> None:
+    bad = tmp_path / "bad.py"
+    bad.write_text("print(a)\n")
+    good = tmp_path / "good.py"
+    good.write_text("a = 1\nprint(a)\n")
+
+    results = run_shards(tmp_path, [[good], [bad], []])
+    records, summaries = read_shards(read(results))
+    assert [x["path"] for x in records] == [str(bad)]
+    assert [(x["shard"], x["files"], x["failed"]) for x in summaries] == [
+        (1, 1, False),
+        (2, 1, True),
+        (3, 0, False),
+    ]
+
+    with pytest.raises(click.ClickException, match="Missing shard 2 of 3"):
+        read_shards(read([results[0], results[2]]))
+
+    # A shard which didn't finish has no summary
+    results[1].write_text(results[1].read_text().splitlines()[0])
+    with pytest.raises(click.ClickException, match="didn't finish"):
+        read_shards(read(results))
+
+
+def test_merge_different_files(tmp_path: Path) -> None:
+    paths = []
+    for name in "abc":
+        paths.append(tmp_path / f"{name}.py")
+        paths[-1].write_text("")
+
+    # As if the machines found different files
+    first = run_shards(tmp_path, [[paths[0]], [paths[1]]], "first")
+    second = run_shards(tmp_path, [[paths[0]], [paths[1], paths[2]]], "second")
+    with pytest.raises(click.ClickException, match="over different files"):
+        read_shards(read([first[0], second[1]]))
+
+    # As if the machines selected their shards differently
+    first = run_shards(tmp_path, [[paths[0], paths[1]], [paths[2]]], "first")
+    second = run_shards(tmp_path, [[paths[0]], [paths[1], paths[2]]], "second")
+    with pytest.raises(click.ClickException, match="exactly once"):
+        read_shards(read([first[0], second[1]]))
+
+
+def test_merge_cli(tmp_path: Path, capsys: pytest.CaptureFixture) -> None:
+    (tmp_path / "bad.py").write_text("print(a)\n")
+    results = run_shards(tmp_path, [[tmp_path / "bad.py"], []])
+    capsys.readouterr()
+
+    with pytest.raises(SystemExit) as e:
+        merge([str(x) for x in results])
+    assert e.value.code == 1
+    captured = capsys.readouterr()
+    assert "reference to potentially undefined `a`" in captured.out
+    assert "Merged 2 shards, of 1 files" in captured.err
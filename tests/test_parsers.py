@@ -0,0 +1,57 @@
+from typing import Iterator
+
+import libcst as cst
+import pytest
+
+from pyrefchecker import parsers
+from pyrefchecker.parsers import available_parsers, parse_module, set_parser
+from pyrefchecker.profiling import record
+
+MATCH = "match x:\n    case 1:\n        pass\n"
+
+
+@pytest.fixture(autouse=True)
+def reset_parser() -> Iterator[None]:
+    yield
+    set_parser("auto")
+
+
+@pytest.mark.parametrize("parser", available_parsers())
+def test_parse_module(parser: str) -> None:
+    set_parser(parser)
+    with record() as timings:
+        module = parse_module("a = 1\n")
+    assert module.code == "a = 1\n"
+    assert list(timings) == [f"parse ({parser})"]
+
+
+def test_fallback(monkeypatch: pytest.MonkeyPatch) -> None:
+    parse_with = parsers.parse_with
+
+    def failing(backend: str, code: str) -> cst.Module:
+        if backend != "pure":
+            raise cst.ParserSyntaxError("", lines=[""], raw_line=1, raw_column=0)
+        return parse_with(backend, code)
+
+    monkeypatch.setattr(parsers, "parse_with", failing)
+    monkeypatch.setattr(parsers, "available_parsers", lambda: ("native", "pure"))
+    with record() as timings:
+        assert parse_module("a = 1\n").code == "a = 1\n"
+    assert sorted(timings) == ["parse (native, failed)", "parse (pure)"]
+
+
+@pytest.mark.skipif(
+    "native" not in available_parsers(), reason="Needs libCST's native parser"
+)
+def test_syntax_only_native_parses() -> None:
+    set_parser("pure")
+    with pytest.raises(cst.ParserSyntaxError):
+        parse_module(MATCH)
+
+    set_parser("auto")
+    assert parse_module(MATCH).code == MATCH
+
+
+def test_unknown_parser() -> None:
+    with pytest.raises(ValueError):
+        set_parser("fast")
@@ -0,0 +1,109 @@
+import os
+import time
+from typing import List
+
+import pytest
+
+from pyrefchecker.pool import WorkerPool
+
+MB = 1024 * 1024
+
+_leaked: List[bytes] = []
+
+
+def handle(item: str) -> str:
+    if item == "slow":
+        time.sleep(60)
+    elif item == "pid":
+        return str(os.getpid())
+    elif item == "leak":
+        _leaked.append(b"x" * 100 * MB)
+    elif item == "huge":
+        data = b"x" * 400 * MB
+        time.sleep(60)
+    elif item == "crash":
+        os._exit(3)
+    elif item == "error":
+        raise ValueError("Oops")
+    return item.upper()
+
+
+@pytest.mark.parametrize("workers", [0, 2])
+def test_pool(workers: int) -> None:
+    with WorkerPool(handle, workers=workers) as pool:
+        results = dict(pool.imap([["a", "b"], ["c"], [], ["error"]]))
+
+    assert {k: v.value for k, v in results.items()} == {
+        "a": "A",
+        "b": "B",
+        "c": "C",
+        "error": None,
+    }
+    assert "ValueError: Oops" in str(results["error"].error)
+    assert all(x.duration is not None for x in results.values())
+    assert pool.stats.elapsed > 0
+    assert 0 < pool.stats.utilization <= 1
+
+
+def test_pool_timeout() -> None:
+    start = time.monotonic()
+    with WorkerPool(handle, workers=2, timeout=0.5) as pool:
+        results = dict(pool.imap([["a", "slow", "b"], ["c"], ["d"]]))
+
+    assert time.monotonic() - start < 10
+    assert results["slow"].timed_out
+    assert [results[x].value for x in "abcd"] == ["A", "B", "C", "D"]
+
+
+def test_pool_cancel() -> None:
+    start = time.monotonic()
+    with WorkerPool(handle, workers=1) as pool:
+        # Cancelled once it has started, rather than before
+        cancelled = lambda item: item == "slow" and time.monotonic() > start + 0.5
+        results = dict(pool.imap([["slow"], ["a"]], cancelled=cancelled))
+
+    assert time.monotonic() - start < 10
+    assert {k: v.value for k, v in results.items()} == {"a": "A"}
+
+
+def test_pool_crash() -> None:
+    with WorkerPool(handle, workers=1) as pool:
+        first: List = list(pool.imap([["a", "crash", "b"]]))
+        # The pool can still be used afterwards
+        second = list(pool.imap([["c"]]))
+
+    results = dict(first)
+    assert "exit code 3" in str(results["crash"].error)
+    assert results["b"].value == "B"
+    assert second[0][1].value == "C"
+
+
+def test_pool_abandon() -> None:
+    with WorkerPool(handle, workers=1) as pool:
+        for item, outcome in pool.imap([["a"], ["slow"]]):
+            break
+        assert [x.value for _, x in pool.imap([["b"]])] == ["B"]
+
+
+def test_pool_max_tasks() -> None:
+    with WorkerPool(handle, workers=1, max_tasks=2) as pool:
+        pids = [x.value for _, x in pool.imap([["pid"] * 5])]
+
+    assert pids[0] == pids[1] != pids[2] == pids[3] != pids[4]
+    assert pool.stats.recycled == 2
+
+
+@pytest.mark.skipif(not os.path.exists("/proc/self/statm"), reason="Linux only")
+def test_pool_max_memory() -> None:
+    items = ["pid", "leak", "leak", "pid", "huge", "pid"]
+    with WorkerPool(handle, workers=1, timeout=30, max_memory=150 * MB) as pool:
+        results = dict(zip(range(len(items)), pool.imap([items])))
+
+    outcomes = [x for _, x in results.values()]
+    assert [x for x, _ in results.values()] == items
+    # The second leak goes over the limit, so the worker is replaced, and 'huge' is
+    # too large even for a fresh worker
+    assert all(x.ok for i, x in enumerate(outcomes) if items[i] != "huge")
+    assert outcomes[0].value != outcomes[3].value != outcomes[5].value
+    assert outcomes[4].too_large and not outcomes[4].ok
+    assert pool.stats.peak_memory[0] > 150 * MB
@@ -0,0 +1,69 @@
+import libcst as cst
+import libcst.metadata as meta
+import pytest
+
+from pyrefchecker import positions
+from pyrefchecker.positions import Position, find_positions
+
+CODE = """\
+def f(a, b=(c)):
+    return [a + x for x in "ö" + b]
+
+class C(
+    D,
+):
+    e = f'{g!r}'
+
+h = lambda: i
+"""
+
+
+def test_find_positions_match_position_provider() -> None:
+    module = cst.parse_module(CODE)
+    wrapper = cst.MetadataWrapper(module, unsafe_skip_copy=True)
+    ranges = wrapper.resolve(meta.PositionProvider)
+
+    names = [x for x in ranges if isinstance(x, cst.Name)]
+
+    assert find_positions(module, names) == {
+        x: Position(ranges[x].start.line, ranges[x].start.column) for x in names
+    }
+
+
+def test_find_positions_omits_foreign_nodes() -> None:
+    module = cst.parse_module(CODE)
+    target = cst.ensure_type(module.body[0], cst.FunctionDef).name
+    foreign = cst.Name("f")
+
+    assert find_positions(module, [target, foreign]) == {target: Position(1, 4)}
+    assert find_positions(module, []) == {}
+
+
+def test_find_positions_without_codegen_state(monkeypatch: pytest.MonkeyPatch) -> None:
+    module = cst.parse_module(CODE)
+    names = [
+        x
+        for x in cst.MetadataWrapper(module, unsafe_skip_copy=True).resolve(
+            meta.PositionProvider
+        )
+        if isinstance(x, cst.Name)
+    ]
+    expected = find_positions(module, names)
+
+    # As if libCST's private CodegenState had moved
+    monkeypatch.setattr(positions, "CodegenState", object)
+    monkeypatch.setattr(positions, "_find_positions", None)
+    assert find_positions(module, names) == expected
+    assert find_positions(module, [cst.Name("f")]) == {}
+
+
+def test_find_positions_codegen_changed(monkeypatch: pytest.MonkeyPatch) -> None:
+    module = cst.parse_module(CODE)
+    target = cst.ensure_type(module.body[0], cst.FunctionDef).name
+
+    def changed(*args: object) -> None:
+        raise AttributeError("_codegen")
+
+    # As if libCST's private code generation methods had changed
+    monkeypatch.setattr(positions, "_find_positions", changed)
+    assert find_positions(module, [target]) == {target: Position(1, 4)}
@@ -0,0 +1,29 @@
+from pyrefchecker.prescan import Prescan, prescan
+
+
+def test_prescan() -> None:
+    code = """\
+# ref: ignore
+from os import (  # ref: ignore
+    path,
+)
+x = "from os import *"  # not an import
+print(x)  # ref: ignore
+"""
+    assert prescan(code) == Prescan(import_star=False, ignored_lines={1, 2, 6})
+
+
+def test_prescan_import_star() -> None:
+    code = """\
+def f():
+    pass
+from os import *
+"""
+    assert prescan(code).import_star
+
+
+def test_prescan_untokenizable() -> None:
+    # The parser reports the error
+    assert prescan("x = (  # ref: ignore\n") == Prescan(
+        import_star=False, ignored_lines={1}
+    )
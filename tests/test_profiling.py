@@ -0,0 +1,65 @@
+from pathlib import Path
+
+import pytest
+
+from pyrefchecker.bin.bin import run
+from pyrefchecker.parsers import available_parsers
+from pyrefchecker.profiling import Profile, phase, record
+
+
+def test_phases_only_recorded_within_record() -> None:
+    with phase("ignored"):
+        pass
+
+    with record() as timings:
+        with phase("parse"):
+            pass
+        with phase("parse"):
+            pass
+        with phase("scopes"):
+            pass
+
+    assert sorted(timings) == ["parse", "scopes"]
+    with phase("ignored"):
+        pass
+    assert sorted(timings) == ["parse", "scopes"]
+
+
+def test_profile_report() -> None:
+    profile = Profile()
+    profile.add("fast.py", {"parse": 1.0, "scopes": 1.0})
+    profile.add("slow.py", {"parse": 1.0, "scopes": 5.0})
+
+    assert profile.totals() == {"scopes": 6.0, "parse": 2.0}
+    assert profile.format(1) == [
+        "⏱️  Slowest 1 of 2 files:",
+        "     6.000s  slow.py  (scopes 5.000s, parse 1.000s)",
+        "⏱️  Total time in each phase:",
+        "     6.000s   75%  scopes",
+        "     2.000s   25%  parse",
+    ]
+
+
+@pytest.mark.parametrize("engine", ["libcst", "ast", "dataflow"])
+def test_run_profile(tmp_path: Path, engine: str) -> None:
+    (tmp_path / "a.py").write_text("if x:\n    a = 1\nprint(a)\n")
+    (tmp_path / "b.py").write_text("b = 1\n")
+
+    profile = Profile()
+    run(
+        sorted(tmp_path.glob("*.py")),
+        timeout=5,
+        allow_import_star=True,
+        show_successes=False,
+        workers=0,
+        engine=engine,
+        profile=profile,
+    )
+
+    assert [x for x, _ in profile.files] == [
+        str(tmp_path / "a.py"),
+        str(tmp_path / "b.py"),
+    ]
+    # libCST's parse is named after the parser which parsed the file
+    parse = "parse" if engine != "libcst" else f"parse ({available_parsers()[0]})"
+    assert {"read", parse} <= set(profile.files[0][1])
@@ -363,3 +363,68 @@ print(a)
 """
     result = check(code)
     assert not result
+
+
+@pytest.mark.parametrize("engine", ["libcst", "ast"])
+def test_recursive_called_functions(engine: str) -> None:
+    code = """
+import sys
+
+def retry():
+    retry()
+
+def fail():
+    log()
+    sys.exit(1)
+
+def log():
+    fail()
+
+try:
+    import a
+except ImportError:
+    retry()
+
+try:
+    import b
+except ImportError:
+    fail()
+
+try:
+    import c
+except ImportError:
+    log()
+
+print(a, b, c)
+"""
+    result = check(code, engine=engine)
+    assert result == [RefWarning(line=29, column=6, reference="a")]
+
+
+@pytest.mark.parametrize("engine", ["libcst", "ast"])
+def test_called_function_after_scope_changes(engine: str) -> None:
+    # 'retry' isn't terminal when first called, before 'fail' is defined, but is when
+    # called again afterwards
+    code = """
+import sys
+
+def retry():
+    fail()
+
+try:
+    import a
+except ImportError:
+    retry()
+
+def fail():
+    sys.exit(1)
+
+try:
+    import b
+except ImportError:
+    retry()
+
+print(a, b)
+"""
+    result = check(code, engine=engine)
+    assert result == [RefWarning(line=20, column=6, reference="a")]
@@ -0,0 +1,92 @@
+from pathlib import Path
+
+import pytest
+
+from pyrefchecker.bin.scheduling import (
+    MAX_CHUNK_BYTES,
+    MAX_CHUNK_FILES,
+    Durations,
+    Job,
+    add_fingerprints,
+    fingerprint,
+    longest_first,
+    make_chunks,
+    select_shard,
+)
+
+
+def test_make_chunks_small_files() -> None:
+    jobs = [Job(key=str(i), path=f"{i}.py", size=10) for i in range(1000)]
+
+    chunks = list(make_chunks(jobs, workers=4))
+
+    assert [job for chunk in chunks for job in chunk] == jobs
+    assert all(len(chunk) <= MAX_CHUNK_FILES for chunk in chunks)
+    assert len(chunks) < len(jobs) / 100
+
+
+def test_make_chunks_large_files() -> None:
+    jobs = [Job(key=str(i), path=f"{i}.py", size=MAX_CHUNK_BYTES) for i in range(3)]
+
+    chunks = list(make_chunks(jobs, workers=4))
+
+    assert chunks == [[job] for job in jobs]
+
+
+def test_longest_first(tmp_path: Path) -> None:
+    paths = [tmp_path / name for name in ["small.py", "large.py", "slow.py"]]
+    for path in paths:
+        path.write_text("")
+    small, large, slow = [
+        Job(key=str(path), path=path, size=size)
+        for path, size in zip(paths, [100, 10000, 1000])
+    ]
+
+    jobs = [small, large, slow]
+    longest_first(jobs)
+    assert jobs == [large, slow, small]
+
+    durations = Durations(tmp_path / "durations.json")
+    durations.record(large, 0.1)
+    durations.record(slow, 1.0)
+    durations.save()
+
+    durations = Durations(tmp_path / "durations.json")
+    longest_first(jobs, durations.estimate)
+    assert jobs == [slow, large, small]
+    # The small file is estimated at the rate of those which were timed
+    assert durations.estimate(small) == pytest.approx(0.01)
+
+    paths[2].unlink()
+    durations.save()
+    assert set(Durations(tmp_path / "durations.json").files) == {str(paths[1])}
+
+
+def test_durations_corrupt(tmp_path: Path) -> None:
+    path = tmp_path / "durations.json"
+    path.write_text("{")
+    assert Durations(path).files == {}
+
+
+def test_select_shard() -> None:
+    sizes = {f"{i}.py": (i * 7919) % 1000 for i in range(100)}
+    shards = [select_shard(sizes, i, 3, weight=sizes.__getitem__) for i in [1, 2, 3]]
+
+    assert sorted(path for shard in shards for path in shard) == sorted(sizes)
+    totals = [sum(sizes[path] for path in shard) for shard in shards]
+    assert max(totals) - min(totals) <= max(sizes.values())
+    # The order the paths are given in doesn't matter
+    assert select_shard(reversed(list(sizes)), 2, 3, sizes.__getitem__) == shards[1]
+
+
+def test_fingerprint() -> None:
+    paths = [Path(f"{i}.py") for i in range(10)]
+
+    assert fingerprint(paths) == fingerprint(reversed(paths))
+    assert fingerprint(paths) == add_fingerprints(
+        [fingerprint(paths[:3]), fingerprint(paths[3:])]
+    )
+    assert fingerprint(paths) != add_fingerprints(
+        [fingerprint(paths[:4]), fingerprint(paths[3:])]
+    )
+    assert fingerprint(paths) != fingerprint(paths[1:])
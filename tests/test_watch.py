@@ -0,0 +1,180 @@
+import re
+import sys
+from pathlib import Path
+from typing import Callable, List, Optional, Set
+
+import pytest
+
+from pyrefchecker.bin.bin import run_watch
+from pyrefchecker.bin.watch import InotifyWatcher, PollingWatcher, Watcher
+
+
+class ScriptedWatcher(Watcher):
+    """ Makes some changes each time it's waited on, then interrupts the watch """
+
+    def __init__(self, steps: List[Callable[[], Set[Path]]]):
+        super().__init__([], None, None)
+        self.steps = steps
+
+    def wait(self, timeout: Optional[float]) -> Set[Path]:
+        if timeout is not None:
+            # Debouncing
+            return set()
+        if not self.steps:
+            raise KeyboardInterrupt
+        return self.steps.pop(0)()
+
+
+def test_run_watch(tmp_path: Path, capsys: pytest.CaptureFixture) -> None:
+    good = tmp_path / "good.py"
+    bad = tmp_path / "bad.py"
+    good.write_text("a = 1\nprint(a)\n")
+    bad.write_text("print(a)\n")
+
+    def break_good() -> Set[Path]:
+        good.write_text("a = 1\nprint(a, b)\n")
+        return {good}
+
+    def fix_bad() -> Set[Path]:
+        bad.write_text("a = 1\nprint(a)\n")
+        return {bad}
+
+    def delete_good() -> Set[Path]:
+        good.unlink()
+        return {good}
+
+    watcher = ScriptedWatcher([break_good, fix_bad, delete_good])
+    run_watch(
+        [tmp_path],
+        timeout=5,
+        allow_import_star=True,
+        show_successes=False,
+        include=None,
+        excludes=[],
+        workers=0,
+        watcher=watcher,
+    )
+
+    assert capsys.readouterr().out.splitlines() == [
+        f"⚠️  {bad}: Warning on line  1, column  6: reference to potentially undefined `a`",
+        "👀 1 of 2 files have warnings, watching for changes...",
+        # Only the new warning is shown
+        f"⚠️  {good}: Warning on line  2, column  9: reference to potentially undefined `b`",
+        "👀 2 of 2 files have warnings, watching for changes...",
+        f"✅ {bad}: Fixed: Warning on line  1, column  6: reference to potentially undefined `a`",
+        "👀 1 of 2 files have warnings, watching for changes...",
+        "👀 all good, watching for changes...",
+    ]
+
+
+def test_run_watch_directory_removed(
+    tmp_path: Path, capsys: pytest.CaptureFixture
+) -> None:
+    package = tmp_path / "package"
+    package.mkdir()
+    (package / "bad.py").write_text("print(a)\n")
+    (tmp_path / "good.py").write_text("")
+
+    def remove_package() -> Set[Path]:
+        (package / "bad.py").unlink()
+        package.rmdir()
+        # As reported by inotify when a directory is moved away
+        return {package}
+
+    run_watch(
+        [tmp_path],
+        timeout=5,
+        allow_import_star=True,
+        show_successes=False,
+        include=None,
+        excludes=[],
+        workers=0,
+        watcher=ScriptedWatcher([remove_package]),
+    )
+
+    assert capsys.readouterr().out.splitlines()[-2:] == [
+        "👀 1 of 2 files have warnings, watching for changes...",
+        "👀 all good, watching for changes...",
+    ]
+
+
+@pytest.mark.parametrize(
+    "watcher_type",
+    [
+        PollingWatcher,
+        pytest.param(
+            InotifyWatcher,
+            marks=pytest.mark.skipif(
+                not sys.platform.startswith("linux"), reason="inotify is Linux only"
+            ),
+        ),
+    ],
+)
+def test_watchers(tmp_path: Path, watcher_type: type) -> None:
+    (tmp_path / "build").mkdir()
+    (tmp_path / "a.py").write_text("")
+    extra = tmp_path / "extra.txt"
+    extra.write_text("")
+
+    with watcher_type(
+        [tmp_path, extra], re.compile(r"\.py$"), [re.compile("build")]
+    ) as watcher:
+        assert watcher.wait(0.01) == set()
+
+        (tmp_path / "a.py").write_text("a = 1\n")
+        (tmp_path / "b.txt").write_text("")
+        (tmp_path / "build" / "c.py").write_text("")
+        extra.write_text("b = 1\n")
+        assert watcher.wait(2) == {tmp_path / "a.py", extra}
+
+        (tmp_path / "new").mkdir()
+        (tmp_path / "new" / "d.py").write_text("")
+        assert _wait_for(watcher, tmp_path / "new" / "d.py")
+
+        # Moved away, so there are no events for the files in it
+        (tmp_path / "new").rename(tmp_path.parent / f"{tmp_path.name}-moved")
+        assert _wait_for(watcher, tmp_path / "new", tmp_path / "new" / "d.py")
+
+
+def _wait_for(watcher: Watcher, *paths: Path) -> bool:
+    # A new directory is reported once it's watched, and again if its files change
+    for _ in range(3):
+        if watcher.wait(2) & set(paths):
+            return True
+    return False
+
+
+def test_run_watch_reindexes(tmp_path: Path, capsys: pytest.CaptureFixture) -> None:
+    app = tmp_path / "app"
+    app.mkdir()
+    (app / "__init__.py").write_text("")
+    errors = app / "errors.py"
+    errors.write_text("import sys\n\ndef abort():\n    sys.exit(1)\n")
+    views = app / "views.py"
+    views.write_text(
+        "import os\nfrom app.errors import abort\n\nif os.name:\n    a = 1\nelse:\n"
+        "    abort()\nprint(a)\n"
+    )
+
+    def abort_returns() -> Set[Path]:
+        errors.write_text("def abort():\n    pass\n")
+        return {errors}
+
+    run_watch(
+        [tmp_path],
+        timeout=5,
+        allow_import_star=True,
+        show_successes=False,
+        include=None,
+        excludes=[],
+        workers=0,
+        watcher=ScriptedWatcher([abort_returns]),
+        index_exits=True,
+    )
+
+    # The views are checked again, though they haven't changed
+    assert capsys.readouterr().out.splitlines() == [
+        "👀 all good, watching for changes...",
+        f"⚠️  {views}: Warning on line  8, column  6: reference to potentially undefined `a`",
+        "👀 1 of 3 files have warnings, watching for changes...",
+    ]